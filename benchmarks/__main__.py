@@ -0,0 +1,102 @@
+"""
+Run the benchmark suite.
+
+    python -m benchmarks [--quick] [--only parse,proxy] [--json results.json] [--baseline old.json]
+
+Runs every benchmark module and writes all results to one JSON file. With
+--baseline, each result is compared with the same entry of an earlier run
+and anything slower by more than --threshold is reported; the exit status
+is then 1, so the suite can gate a change.
+"""
+import sys
+import json
+import argparse
+import datetime
+import platform
+
+from benchmarks import bench_error_manager, bench_extension, bench_parse, bench_proxy, bench_records
+
+# name -> (full run, quick run)
+SUITE = {
+    "error_manager": (
+        lambda: bench_error_manager.run(),
+        lambda: bench_error_manager.run(sizes=(1000, 100_000), number=1000),
+    ),
+    "extension": (
+        lambda: bench_extension.run(),
+        lambda: bench_extension.run(number=2000),
+    ),
+    "parse": (
+        lambda: bench_parse.run(),
+        lambda: bench_parse.run(number=10),
+    ),
+    "proxy": (
+        lambda: bench_proxy.run(),
+        lambda: bench_proxy.run(requests=500, number=2000),
+    ),
+    "records": (
+        lambda: bench_records.run(),
+        lambda: bench_records.run(entries=10_000, number=10_000),
+    ),
+}
+
+
+def compare(baseline, current, threshold):
+    """Yield ``(benchmark, label, old, new, ratio)`` for results slower than `threshold` x the baseline."""
+    for name, results in current["benchmarks"].items():
+        old_results = baseline.get("benchmarks", {}).get(name, {})
+        for label, result in results.items():
+            old = old_results.get(label, {}).get("seconds_per_call")
+            new = result.get("seconds_per_call")
+            # Differences (e.g. routing overhead) can be zero or negative and have no meaningful ratio.
+            if not old or not new or old <= 0 or new <= 0:
+                continue
+            ratio = new / old
+            if ratio > threshold:
+                yield name, label, old, new, ratio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer iterations")
+    parser.add_argument("--only", help="comma-separated benchmarks to run: " + ", ".join(SUITE))
+    parser.add_argument("--json", dest="json_path", help="write all results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default 1.25)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(SUITE)
+    unknown = [name for name in names if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    current = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    for name in names:
+        full, quick = SUITE[name]
+        current["benchmarks"][name] = quick() if args.quick else full()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = list(compare(baseline, current, args.threshold))
+        for name, label, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {label}: {old * 1e6:.2f} -> {new * 1e6:.2f} us/call ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.2f}x against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
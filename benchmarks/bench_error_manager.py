@@ -0,0 +1,128 @@
+"""
+Write throughput of ErrorManager.
+
+    python -m benchmarks.bench_error_manager [--sizes 1000,100000,1000000] [--json results.json]
+
+`log_error` is measured against stores that already hold 1k, 100k and 1M
+entries, for the JSONL and SQLite backends, written synchronously and
+through the background writer. A flat rate across sizes is the point: it
+catches a return of the read-the-whole-log-per-error behaviour.
+`log_signal` is measured with the synchronous and the batching handler.
+"""
+import os
+import json
+import argparse
+import tempfile
+
+from benchmarks.common import measure, measure_batch, report, reset_signal_logger
+from logs.error_handler import ErrorManager
+from logs.error_store import ErrorStore
+from logs.sqlite_store import SqliteErrorStore
+
+SIZES = (1000, 100_000, 1_000_000)
+PREFILL_BATCH = 10_000
+
+ENTRY = {
+    "error_category": "Crawling Error",
+    "error_subcategory": "RequestFailed - Network Error",
+    "error_code": 1003,
+    "error_message": "Request failed: https://www.amazon.com/s?k=mop&page=3, Error: TimeoutError",
+    "spider": "error",
+    "url": "https://www.amazon.com/s?k=mop&page=3",
+    "timestamp": 1735732800000,
+}
+
+
+def prefill(backend, path, size):
+    """Create a store at `path` holding `size` entries."""
+    if backend == "jsonl":
+        line = json.dumps(ENTRY, ensure_ascii=False) + "\n"
+        with open(path, "w", encoding="utf-8") as f:
+            for start in range(0, size, PREFILL_BATCH):
+                f.write(line * min(PREFILL_BATCH, size - start))
+        return
+    store = SqliteErrorStore(path)
+    try:
+        for start in range(0, size, PREFILL_BATCH):
+            store.append_many([ENTRY] * min(PREFILL_BATCH, size - start))
+    finally:
+        store.close()
+
+
+def make_manager(tmp, backend, path, async_writes):
+    reset_signal_logger()
+    store = SqliteErrorStore(path) if backend == "sqlite" else ErrorStore(path)
+    return ErrorManager(
+        log_file=path,
+        signal_log_file=os.path.join(tmp, "signals.log"),
+        legacy_log_file=os.path.join(tmp, "errors.json"),
+        event_log_file=os.path.join(tmp, "events.jsonl"),
+        async_writes=async_writes,
+        writer_options={"max_queue": 100_000, "batch_size": 500, "flush_interval": 1.0},
+        store=store,
+    )
+
+
+def log_error_cases(tmp, sizes, number):
+    results = {}
+    for backend in ("jsonl", "sqlite"):
+        for size in sizes:
+            path = os.path.join(tmp, f"errors-{size}.{'db' if backend == 'sqlite' else 'jsonl'}")
+            prefill(backend, path, size)
+            for async_writes in (False, True):
+                manager = make_manager(tmp, backend, path, async_writes)
+
+                def log_error():
+                    manager.log_error(ENTRY["error_category"], ENTRY["error_subcategory"], ENTRY["error_code"],
+                                      ENTRY["error_message"], "error", ENTRY["url"])
+
+                def log_and_flush():
+                    # Async writes only count once they are on disk.
+                    for _ in range(number):
+                        log_error()
+                    manager.flush()
+
+                mode = "async" if async_writes else "sync"
+                label = f"log_error {backend} {mode} @{size:,}"
+                if async_writes:
+                    results[label] = measure_batch(log_and_flush, number)
+                else:
+                    results[label] = measure(log_error, number, repeat=3)
+                manager.close()
+            os.remove(path)
+    return results
+
+
+def log_signal_cases(tmp, number):
+    results = {}
+    path = os.path.join(tmp, "errors.jsonl")
+    for async_writes in (False, True):
+        manager = make_manager(tmp, "jsonl", path, async_writes)
+
+        def log_signals():
+            for _ in range(number):
+                manager.log_signal("Response received (200) from https://www.amazon.com/s?k=mop&page=2")
+            manager.flush()
+
+        results[f"log_signal {'batching' if async_writes else 'sync'}"] = measure_batch(log_signals, number)
+        manager.close()
+    reset_signal_logger()
+    return results
+
+
+def run(sizes=SIZES, number=5000, json_path=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        results = log_error_cases(tmp, sizes, number)
+        results.update(log_signal_cases(tmp, number))
+    report("error_manager", results, json_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated numbers of existing entries")
+    parser.add_argument("--number", type=int, default=5000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+    run([int(size) for size in args.sizes.split(",")], args.number, args.json_path)
@@ -0,0 +1,93 @@
+"""
+Per-response overhead of ErrorLoggingExtension.
+
+    python -m benchmarks.bench_extension [--json results.json]
+
+Times the handlers that run for every response (request_scheduled,
+response_received, item_scraped) under three signal log policies: log
+everything, the project's SIGNAL_LOG_POLICIES and logging off, so the cost
+of the metrics bookkeeping and of the log lines can be told apart. The
+last case sends response_received through the crawler's signal manager,
+which is how Scrapy calls the extension, against a crawler without it.
+"""
+import os
+import logging
+import argparse
+import tempfile
+
+from scrapy import Spider, signals
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from benchmarks.common import measure, report, reset_signal_logger
+from errors import settings as project_settings
+from errors.extension import ErrorLoggingExtension
+
+POLICIES = {
+    "all": {},
+    "project": project_settings.SIGNAL_LOG_POLICIES,
+    "off": {"item_scraped": "off", "response_received": "off"},
+}
+
+
+def make_crawler(tmp, policies):
+    return get_crawler(Spider, {
+        "ERROR_LOGGING_ENABLED": True,
+        "ERROR_LOG_ASYNC": True,
+        "ERROR_LOG_FILE": os.path.join(tmp, "errors.jsonl"),
+        "ERROR_LOG_LEGACY_FILE": os.path.join(tmp, "errors.json"),
+        "SIGNAL_LOG_FILE": os.path.join(tmp, "signals.log"),
+        "EVENT_LOG_FILE": os.path.join(tmp, "events.jsonl"),
+        "METRICS_SNAPSHOT_FILE": "",
+        "SIGNAL_LOG_POLICIES": policies,
+    })
+
+
+def run(number=20000, json_path=None):
+    results = {}
+    url = "https://www.amazon.com/s?k=mop&page=2"
+    request = Request(url)
+    response = HtmlResponse(url, body=b"<html></html>", request=request)
+    item = {"name": "mop"}
+    # Spider loggers are silenced so the numbers measure the extension, not console output.
+    logging.getLogger("bench").setLevel(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, policies in POLICIES.items():
+            reset_signal_logger()
+            crawler = make_crawler(tmp, policies)
+            spider = Spider("bench")
+            extension = ErrorLoggingExtension(crawler)
+
+            def per_response():
+                extension.request_scheduled_handler(request, spider)
+                extension.response_received_handler(response, request, spider)
+                extension.item_scraped_handler(item, response, spider)
+
+            results[f"handlers, {label} policies"] = measure(per_response, number)
+            extension.error_handler.close()
+
+        for label, connect in (("signal dispatch, without extension", False),
+                               ("signal dispatch, with extension", True)):
+            reset_signal_logger()
+            crawler = make_crawler(tmp, POLICIES["project"])
+            spider = Spider("bench")
+            extension = ErrorLoggingExtension(crawler) if connect else None
+
+            def dispatch():
+                crawler.signals.send_catch_log(signals.response_received, response=response,
+                                               request=request, spider=spider)
+
+            results[label] = measure(dispatch, number)
+            if extension is not None:
+                extension.error_handler.close()
+        reset_signal_logger()
+    report("extension", results, json_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+    run(args.number, args.json_path)
@@ -0,0 +1,65 @@
+"""
+Parse throughput of ErrorSpider on saved search result pages.
+
+    python -m benchmarks.bench_parse [--json results.json]
+
+Compares the previous per-card `sel.css(...)` extraction with the
+precompiled, single-walk `CardExtractor`, checks that both return the same fields, and
+measures end-to-end `ErrorSpider.parse` items/sec.
+"""
+import argparse
+import tempfile
+
+from benchmarks.common import load_response, measure, report
+from errors.items import ErrorsItem
+from errors.spiders.error import PRODUCT_CARDS, ErrorSpider
+from logs.error_handler import ErrorManager
+
+FIXTURES = ("search_page.html", "search_page_last.html")
+
+
+def css_per_card(response):
+    """The extraction ErrorSpider.parse used before CardExtractor, kept as the baseline."""
+    cards = []
+    for sel in response.css(".puis-card-border"):
+        cards.append({
+            "name": sel.css(".a-color-base.a-text-normal>span::text").get(),
+            "price": sel.css(".a-price-whole::text").get(),
+            "stars": sel.css(".a-icon-star-small .a-icon-alt::text").get(),
+            "No_of_reviews": sel.css(".a-size-base.s-underline-text::text").get(),
+        })
+    return cards
+
+
+def compiled(response):
+    return list(PRODUCT_CARDS.extract(response))
+
+
+def run(number=50, json_path=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        spider = ErrorSpider(error_manager=ErrorManager(
+            log_file=f"{tmp}/errors.jsonl", signal_log_file=f"{tmp}/signals.log", legacy_log_file=f"{tmp}/errors.json",
+        ))
+        for fixture in FIXTURES:
+            response = load_response(fixture)
+            expected = css_per_card(response)
+            if compiled(response) != expected:
+                raise AssertionError(f"CardExtractor output differs from sel.css() on {fixture}")
+            cards = len(expected)
+            items = sum(1 for result in spider.parse(response) if isinstance(result, ErrorsItem))
+            results[f"{fixture} css per card"] = measure(lambda: css_per_card(response), number, units_per_call=cards)
+            results[f"{fixture} CardExtractor"] = measure(lambda: compiled(response), number, units_per_call=cards)
+            results[f"{fixture} ErrorSpider.parse"] = measure(lambda: list(spider.parse(response)), number,
+                                                               units_per_call=items)
+        spider.error_manager.close()
+    report("parse", results, json_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+    run(args.number, args.json_path)
@@ -0,0 +1,93 @@
+"""
+Memory and serialization cost of one buffered error.
+
+    python -m benchmarks.bench_records [--entries 100000] [--json results.json]
+
+Compares error entries built as dicts (what ErrorManager.error_entry
+returned before) with `logs.records.ErrorRecord`: the time and the memory
+(traced with tracemalloc) to buffer `entries` errors, as the aggregator
+and the item pipeline's reject batch do, and the time to serialize one
+entry to a JSON line with json.dumps, with orjson and with the stdlib
+fallback used when orjson isn't installed.
+"""
+import gc
+import json
+import argparse
+import tracemalloc
+
+from benchmarks.common import measure, measure_batch, report
+from logs import records
+from logs.error_handler import now_timestamp
+from logs.records import ErrorRecord, dumps_entry
+
+SPIDER = "error"
+
+
+def dict_entry(i):
+    # Subcategories and messages come from exception classes and f-strings,
+    # so each error carries its own copies unless they are interned.
+    return {
+        "error_category": "Crawling Error",
+        "error_subcategory": "".join(("Request ", "Failure")),
+        "error_code": 1001,
+        "error_message": f"TimeoutError: getting https://shop.test/p/{i} took longer than 180.0 seconds.",
+        "spider": SPIDER,
+        "url": f"https://shop.test/p/{i}",
+        "timestamp": now_timestamp(),
+    }
+
+
+def record_entry(i):
+    return ErrorRecord(
+        "Crawling Error",
+        "".join(("Request ", "Failure")),
+        1001,
+        f"TimeoutError: getting https://shop.test/p/{i} took longer than 180.0 seconds.",
+        SPIDER,
+        f"https://shop.test/p/{i}",
+        now_timestamp(),
+    )
+
+
+def buffered_bytes(build, entries):
+    """Bytes allocated per entry while `entries` entries are held in a list."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    buffer = [build(i) for i in range(entries)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del buffer
+    return size / entries
+
+
+def run(entries=100_000, number=100_000, json_path=None):
+    results = {}
+    memory = {}
+    for label, build in (("dict", dict_entry), ("ErrorRecord", record_entry)):
+        result = measure_batch(lambda: [build(i) for i in range(entries)], entries)
+        result["bytes_per_entry"] = memory[label] = buffered_bytes(build, entries)
+        results[f"buffer {entries:,} entries, {label}"] = result
+
+    entry, record = dict_entry(0), record_entry(0)
+    results["serialize, json.dumps(dict)"] = measure(lambda: json.dumps(entry, ensure_ascii=False), number)
+    results["serialize, ErrorRecord"] = measure(lambda: dumps_entry(record), number)
+    orjson, records.orjson = records.orjson, None
+    try:
+        results["serialize, ErrorRecord without orjson"] = measure(lambda: dumps_entry(record), number)
+    finally:
+        records.orjson = orjson
+
+    report("records", results, json_path)
+    print(f"  bytes per buffered error: dict {memory['dict']:.0f}, ErrorRecord {memory['ErrorRecord']:.0f}"
+          f" ({memory['dict'] / memory['ErrorRecord']:.1f}x less)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--number", type=int, default=100_000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+    run(args.entries, args.number, args.json_path)
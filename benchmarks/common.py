@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import logging
+import timeit
+import platform
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES_DIR, name)
+
+
+def load_response(name, url="https://www.amazon.com/s?k=mop&page=2"):
+    """A Scrapy HtmlResponse built from a saved HTML fixture."""
+    from scrapy.http import HtmlResponse, Request
+
+    with open(fixture_path(name), "rb") as f:
+        body = f.read()
+    return HtmlResponse(url=url, body=body, encoding="utf-8", request=Request(url))
+
+
+def reset_signal_logger():
+    """ErrorManager shares the ``signals.log`` logger; start each case without its handlers."""
+    signal_logger = logging.getLogger("signals.log")
+    for handler in list(signal_logger.handlers):
+        signal_logger.removeHandler(handler)
+        handler.close()
+
+
+def measure(func, number, repeat=5, units_per_call=1):
+    """
+    Time `func` with timeit, keeping the best of `repeat` runs of `number`
+    calls. Returns seconds per call and units (items, entries...) per second.
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    per_call = best / number
+    return {
+        "calls": number,
+        "repeat": repeat,
+        "seconds_per_call": per_call,
+        "units_per_sec": units_per_call / per_call if per_call else None,
+    }
+
+
+def measure_batch(func, calls, repeat=3):
+    """
+    Time `func`, which performs `calls` operations per invocation (for
+    example a burst of writes followed by a flush), as per-operation figures.
+    """
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    per_call = best / calls
+    return {
+        "calls": calls,
+        "repeat": repeat,
+        "seconds_per_call": per_call,
+        "units_per_sec": 1 / per_call if per_call else None,
+    }
+
+
+def report(name, results, json_path=None, out=sys.stdout):
+    """Print results as a table and optionally write them as JSON for comparison between runs."""
+    out.write(f"{name}\n")
+    for label, result in results.items():
+        rate = result.get("units_per_sec")
+        out.write(f"  {label:<40} {result['seconds_per_call'] * 1e6:>12.2f} us/call"
+                  + (f" {rate:>14,.0f} /s" if rate else "") + "\n")
+    if json_path:
+        payload = {
+            "benchmark": name,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import logging
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+PENDING, DONE, FAILED = 0, 1, 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    state INTEGER NOT NULL,
+    pagination INTEGER NOT NULL DEFAULT 0,
+    error_code INTEGER,
+    status INTEGER,
+    retryable INTEGER NOT NULL DEFAULT 0,
+    failed_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+# A later state replaces an earlier one, except that queuing a URL again
+# (a resumed page linking to a page that was re-queued too) changes nothing.
+# The pagination flag is kept from the first write.
+UPSERT = f"""
+INSERT INTO urls (url, state, pagination, error_code, status, retryable, failed_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    state = excluded.state, error_code = excluded.error_code,
+    status = excluded.status, retryable = excluded.retryable, failed_at = excluded.failed_at
+WHERE excluded.state != {PENDING}
+"""
+
+# Codes of failures recorded without one: HTTP errors by status, anything else a request failure.
+REQUEST_FAILURE_CODE, RESPONSE_ERROR_CODE = 1001, 1002
+
+
+class CrawlCheckpoint:
+    """
+    Crash-safe record of a crawl's URLs in one SQLite table: each URL the
+    spider requested with its state (pending, done or failed), so the set
+    of seen URLs, the pagination frontier and the failed URLs survive the
+    process.
+
+    State changes are buffered and written in one transaction every
+    `batch_size` changes or `flush_interval` seconds; a crash loses at most
+    that much, which only means a few pages are fetched again.
+
+    A crawl that ends with reason ``finished`` marks the checkpoint
+    complete, and the next crawl starts a new one; until then its failed
+    URLs stay readable with `read_failed_urls`. Otherwise the next crawl
+    resumes: `resume_urls` gives the pending URLs and the retryable
+    failures (network errors and RETRY_HTTP_CODES statuses), and `seen`
+    lets start URLs handled already be skipped.
+
+    `on_flush`, if set, is called before each write, so output derived
+    from the recorded pages (the item export) can be made durable first;
+    it can store its own position with `set_meta`.
+    """
+
+    def __init__(self, path, batch_size=1000, flush_interval=5.0, retry_http_codes=(), clock=time.monotonic):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_http_codes = frozenset(int(code) for code in retry_http_codes)
+        self.clock = clock
+        # url -> [state, pagination, error_code, status, retryable, failed_at], not yet written.
+        self.changes = {}
+        self.last_flush = clock()
+        self.on_flush = None
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if "failed_at" not in {row[1] for row in self.conn.execute("PRAGMA table_info(urls)")}:
+            self.conn.execute("ALTER TABLE urls ADD COLUMN failed_at REAL")
+        self.resuming = self._open()
+
+    @classmethod
+    def from_settings(cls, settings, path_setting="CRAWL_CHECKPOINT_FILE"):
+        """A checkpoint at the `path_setting` file, or None when that is empty."""
+        path = settings.get(path_setting)
+        if not path:
+            return None
+        return cls(
+            path,
+            batch_size=settings.getint("CRAWL_CHECKPOINT_BATCH_SIZE", 1000),
+            flush_interval=settings.getfloat("CRAWL_CHECKPOINT_FLUSH_INTERVAL", 5.0),
+            retry_http_codes=settings.getlist("CRAWL_CHECKPOINT_RETRY_HTTP_CODES", [408, 429, 500, 502, 503, 504, 522, 524]),
+        )
+
+    def _open(self):
+        """Start over after a finished crawl; returns True when resuming an unfinished one."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'finished'").fetchone()
+        with self.conn:
+            if row is not None and row[0] == "1":
+                self.conn.execute("DELETE FROM urls")
+                self.conn.execute("DELETE FROM meta")
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('finished', '0')")
+        counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall())
+        if not counts:
+            return False
+        logger.info("Resuming crawl from %s: %d URLs done, %d pending, %d failed", self.path,
+                    counts.get(DONE, 0), counts.get(PENDING, 0), counts.get(FAILED, 0))
+        return True
+
+    def _change(self, url, state, pagination=False, error_code=None, status=None, retryable=False, failed_at=None):
+        change = self.changes.get(url)
+        if change is not None:
+            if state == PENDING:
+                return
+            pagination = change[1]
+        self.changes[url] = [state, int(pagination), error_code, status, int(retryable), failed_at]
+        if len(self.changes) >= self.batch_size or self.clock() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def queued(self, url, pagination=False):
+        self._change(url, PENDING, pagination)
+
+    def done(self, url):
+        self._change(url, DONE)
+
+    def failed(self, url, error_code=None, status=None):
+        """Record a failure; it is retried on resume unless it is an HTTP status outside the retry codes."""
+        retryable = status is None or status in self.retry_http_codes
+        self._change(url, FAILED, error_code=error_code, status=status, retryable=retryable, failed_at=time.time())
+
+    def seen(self, url):
+        if url in self.changes:
+            return True
+        return self.conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def resume_urls(self):
+        """``(url, pagination)`` for each pending URL and retryable failure of the interrupted crawl."""
+        self.flush()
+        cursor = self.conn.execute(
+            f"SELECT url, pagination FROM urls WHERE state = {PENDING} OR (state = {FAILED} AND retryable)"
+        )
+        # Fetched up front: the spider writes to the table while it re-queues them.
+        return [(url, bool(pagination)) for url, pagination in cursor.fetchall()]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def flush(self):
+        if self.on_flush is not None:
+            self.on_flush()
+        if self.changes:
+            with self.conn:
+                self.conn.executemany(UPSERT, [(url, *change) for url, change in self.changes.items()])
+            self.changes = {}
+        self.last_flush = self.clock()
+
+    def close(self, reason=None):
+        """Write pending changes; a ``finished`` crawl marks the checkpoint complete."""
+        self.flush()
+        if reason == "finished":
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('finished', '1')")
+        self.conn.close()
+
+
+def read_failed_urls(path, codes=None, spider=None, since=None, until=None):
+    """
+    ``(url, error_code, status)`` for each failed URL of the crawl
+    checkpoint at `path`, read without changing it. `codes` filters by error
+    code, `since`/`until` (epoch seconds) by the time of the failure, and
+    `spider` by the spider that wrote the checkpoint.
+    """
+    if not os.path.exists(path):
+        logger.warning("No crawl checkpoint at %s, nothing to replay", path)
+        return
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'spider'").fetchone()
+        if spider is not None and row is not None and row[0] != spider:
+            logger.info("The crawl checkpoint %s belongs to spider %r, not %r", path, row[0], spider)
+            return
+        codes = set(codes) if codes else None
+        query = f"SELECT url, error_code, status FROM urls WHERE state = {FAILED}"
+        params = []
+        if since is not None:
+            query += " AND failed_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND failed_at < ?"
+            params.append(until)
+        for url, error_code, status in conn.execute(query, params):
+            if error_code is None:
+                error_code = RESPONSE_ERROR_CODE if status is not None else REQUEST_FAILURE_CODE
+            if codes is None or error_code in codes:
+                yield url, error_code, status
+    finally:
+        conn.close()
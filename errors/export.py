@@ -0,0 +1,215 @@
+import os
+import gzip
+import logging
+
+try:
+    import pyarrow # type: ignore
+    import pyarrow.parquet # type: ignore
+except ImportError:
+    pyarrow = None
+
+from logs.records import dumps_entry
+
+logger = logging.getLogger(__name__)
+
+# Python field types (the `type` field metadata) to Parquet column types.
+ARROW_TYPES = {
+    str: "string",
+    float: "float64",
+    int: "int64",
+    bool: "bool_",
+}
+
+
+def export_format(path):
+    """``parquet``, ``jsonl.gz`` or ``jsonl``, from the file name."""
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".gz"):
+        return "jsonl.gz"
+    return "jsonl"
+
+
+def check_export_path(path):
+    """Fail early when the format of `path` needs a library that isn't installed."""
+    if export_format(path) == "parquet" and pyarrow is None:
+        raise RuntimeError(f"pyarrow is required to export {path}")
+
+
+class JsonLinesBatchWriter:
+    """
+    Writes batches of rows as JSON lines, one write per batch. With
+    `compress` each batch is a gzip member of its own (gzip readers see one
+    stream), so the file can be appended to, or cut back to the end of any
+    batch, like an uncompressed one.
+    """
+
+    def __init__(self, path, compress=False, compresslevel=6, append=False):
+        self.compress = compress
+        self.compresslevel = compresslevel
+        self.file = open(path, "ab" if append else "wb")
+
+    def write_batch(self, rows):
+        data = "".join(dumps_entry(row) + "\n" for row in rows).encode("utf-8")
+        if self.compress:
+            data = gzip.compress(data, compresslevel=self.compresslevel)
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def tell(self):
+        """Bytes written so far, always at the end of a batch."""
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetBatchWriter:
+    """
+    Writes each batch as one Parquet row group. The schema comes from
+    `fields` (name -> Python type) when given, else from the first batch.
+
+    A Parquet file can't be reopened for appending, so to continue an
+    export the row groups of the `previous` file are copied over first. A
+    file left without its footer by a killed process can't be read, and its
+    rows are lost.
+    """
+
+    def __init__(self, path, fields=None, compression="snappy", previous=None):
+        if pyarrow is None:
+            raise RuntimeError(f"pyarrow is required to export {path}")
+        self.path = path
+        self.compression = compression
+        self.schema = None
+        if fields:
+            self.schema = pyarrow.schema([
+                (name, getattr(pyarrow, ARROW_TYPES.get(field_type, "string"))())
+                for name, field_type in fields.items()
+            ])
+        self.writer = None
+        self.rows = 0
+        if previous is not None:
+            self.copy_row_groups(previous)
+
+    def copy_row_groups(self, previous):
+        try:
+            source = pyarrow.parquet.ParquetFile(previous)
+        except (OSError, pyarrow.ArrowException) as e:
+            logger.warning("Could not read the interrupted export %s, its items are lost: %s", previous, e)
+            return
+        if self.schema is None:
+            self.schema = source.schema_arrow
+        for index in range(source.num_row_groups):
+            self.write_table(source.read_row_group(index))
+
+    def write_table(self, table):
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def write_batch(self, rows):
+        self.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        """Rows written so far; the file is only readable once closed."""
+        return self.rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class BatchExporter:
+    """
+    Streams rows to `path` in batches of `batch_size`, so memory stays
+    constant however many rows are exported. The file is written as
+    ``<path>.part`` and renamed by `publish()`, so readers never see a
+    partial export.
+
+    An export interrupted with its crawl is continued by an exporter with
+    `resume_at`, the `position()` recorded when the interrupted crawl's
+    state was last saved: the rows of ``<path>.part`` up to there are
+    kept (JSON lines are cut back to that byte, Parquet row groups are
+    copied) and new rows are added after them.
+    """
+
+    def __init__(self, path, fields=None, batch_size=1000, parquet_compression="snappy", resume_at=None):
+        self.path = path
+        self.part_path = path + ".part"
+        self.fields = fields
+        self.batch_size = max(1, batch_size)
+        self.parquet_compression = parquet_compression
+        self.resume_at = resume_at
+        check_export_path(path)
+        self.format = export_format(path)
+        self.batch = []
+        self.rows = 0
+        self.writer = None
+
+    def _open(self):
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        resume = self.resume_at is not None and os.path.exists(self.part_path)
+        if self.format == "parquet":
+            if not resume:
+                return ParquetBatchWriter(self.part_path, self.fields, self.parquet_compression)
+            previous = self.part_path + ".prev"
+            os.replace(self.part_path, previous)
+            try:
+                return ParquetBatchWriter(self.part_path, self.fields, self.parquet_compression, previous=previous)
+            finally:
+                os.remove(previous)
+        if resume:
+            # Rows past the recorded position belong to pages that will be fetched again.
+            with open(self.part_path, "r+b") as f:
+                f.truncate(int(self.resume_at))
+        return JsonLinesBatchWriter(self.part_path, compress=self.format == "jsonl.gz", append=resume)
+
+    def add(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        if self.writer is None:
+            self.writer = self._open()
+        self.writer.write_batch(self.batch)
+        self.writer.flush()
+        self.rows += len(self.batch)
+        self.batch = []
+
+    def position(self):
+        """Write out the current batch and return where the export ends, for `resume_at`."""
+        self.flush()
+        if self.writer is None:
+            return self.resume_at or 0
+        return self.writer.tell()
+
+    def close(self):
+        """Write out the last batch and close ``<path>.part``."""
+        self.flush()
+        if self.writer is None and self.resume_at is not None and os.path.exists(self.part_path):
+            # Nothing new, but the part file is still cut back to the recorded position.
+            self.writer = self._open()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def publish(self):
+        """Rename the closed ``<path>.part`` to `path`."""
+        if os.path.exists(self.part_path):
+            os.replace(self.part_path, self.path)
+            if self.resume_at is None:
+                logger.info("Exported %d items to %s", self.rows, self.path)
+            else:
+                logger.info("Exported %s, with %d items from the resumed crawl", self.path, self.rows)
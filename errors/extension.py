@@ -1,6 +1,10 @@
 from scrapy import signals
 from scrapy.exceptions import NotConfigured
 from scrapy.signalmanager import SignalManager
+from twisted.internet import task
+from errors.metrics import CrawlMetrics, write_snapshot
+from errors.log_policy import SignalLogPolicies
+from errors.pipelines import RejectedItem
 from logs.error_handler import ErrorManager
 
 class ErrorLoggingExtension:
@@ -8,7 +12,16 @@ class ErrorLoggingExtension:
 
     def __init__(self, crawler):
         self.crawler = crawler
-        self.error_handler = ErrorManager()
+        self.error_handler = ErrorManager.from_settings(crawler.settings)
+
+        # Structured timings and counters, published to stats and to a snapshot file
+        self.metrics = CrawlMetrics()
+        self.snapshot_file = crawler.settings.get('METRICS_SNAPSHOT_FILE', 'logs/metrics.json')
+        self.snapshot_interval = crawler.settings.getfloat('METRICS_SNAPSHOT_INTERVAL', 10.0)
+        self.snapshot_task = None
+
+        # Sampling / rate limiting for high-volume signals; errors are never sampled
+        self.log_policies = SignalLogPolicies.from_settings(crawler.settings)
 
         # Connect the signals dynamically
         self.connect_signals()
@@ -31,13 +44,14 @@ class ErrorLoggingExtension:
 
         # Error handling signals
         signal_manager.connect(self.handle_spider_error, signal=signals.spider_error)
-        signal_manager.connect(self.handle_request_failed, signal=signals.request_dropped)
+        signal_manager.connect(self.handle_request_dropped, signal=signals.request_dropped)
 
         # Item processing signals
         signal_manager.connect(self.item_scraped_handler, signal=signals.item_scraped)
         signal_manager.connect(self.item_dropped_handler, signal=signals.item_dropped)
 
-        # Response signals
+        # Request / response signals
+        signal_manager.connect(self.request_scheduled_handler, signal=signals.request_scheduled)
         signal_manager.connect(self.response_received_handler, signal=signals.response_received)
 
         # Other optional signals
@@ -52,59 +66,90 @@ class ErrorLoggingExtension:
         message = f"Spider '{spider.name}' started."
         spider.logger.info(message)
         self.error_handler.log_signal(message)
+        if self.snapshot_file and self.snapshot_interval > 0:
+            self.snapshot_task = task.LoopingCall(self.write_metrics_snapshot)
+            self.snapshot_task.start(self.snapshot_interval, now=False)
 
     def spider_closed_handler(self, spider, reason):
         """Triggered when the spider finishes execution."""
+        for summary in self.log_policies.flush():
+            spider.logger.info(summary)
+            self.error_handler.log_signal(summary)
         message = f"Spider '{spider.name}' closed. Reason: {reason}"
         spider.logger.info(message)
         self.error_handler.log_signal(message)
+        self.error_handler.flush()
+        if self.snapshot_task is not None and self.snapshot_task.running:
+            self.snapshot_task.stop()
+        self.write_metrics_snapshot()
+
+    def log_sampled_signal(self, signal_name, spider, build_message):
+        """Logs a high-volume signal according to its configured policy."""
+        message = self.log_policies[signal_name].check(build_message)
+        if message:
+            spider.logger.info(message)
+            self.error_handler.log_signal(message)
+
+    def write_metrics_snapshot(self):
+        """Publish current metrics to Scrapy stats and the snapshot file."""
+        self.metrics.to_stats(self.crawler.stats)
+        if self.snapshot_file:
+            write_snapshot(self.snapshot_file, self.metrics.snapshot())
 
 
 
     
-    def handle_request_failed(self, failure, request, spider):
-        """Handles request failures (e.g., timeouts, connection errors)."""
-        message = f"Request failed: {request.url}, Error: {failure}"
-        spider.logger.warning(message)
-        self.error_handler.log_error("Crawling Error", "RequestFailed - Network Error", 1003, message, spider.name, request.url)
+    def handle_request_dropped(self, request, spider):
+        """Handles requests the scheduler rejected (request_dropped only sends the request and spider)."""
+        entry = self.error_handler.error_type_entry("network_error", spider.name, request.url,
+                                                    reason="request dropped by the scheduler")
+        spider.logger.warning(entry.error_message)
+        self.error_handler.log_errors((entry,))
 
     def handle_spider_error(self, failure, spider):
         """Handles unexpected spider errors."""
-        message = f"Spider error in '{spider.name}': {failure}"
-        spider.logger.error(message)
-        self.error_handler.log_error("System Failure", "SpiderError - Runtime Error", 3002, message, spider.name, url="N/A")    
+        entry = self.error_handler.error_type_entry("spider_error", spider.name, url="N/A", reason=failure)
+        spider.logger.error(entry.error_message)
+        self.error_handler.log_errors((entry,))    
 
 
    
     def item_dropped_handler(self, item, response, exception, spider):
         """Handles dropped items (e.g., missing fields, validation issues)."""
-        message = f"Item dropped: {exception}. URL: {response.url}"
-        spider.logger.warning(message)
-        self.error_handler.log_error("System Failure", "ItemDropped - Validation Error", 3003, message, spider.name, response.url)
+        if isinstance(exception, RejectedItem):
+            # ErrorsPipeline writes its rejects to the error store in batches.
+            return
+        entry = self.error_handler.error_type_entry("item_dropped", spider.name, response.url, reason=exception)
+        spider.logger.warning(entry.error_message)
+        self.error_handler.log_errors((entry,))
 
 
 
 
     def item_scraped_handler(self, item, response, spider):
         """Logs when an item is successfully scraped."""
-        message = f"Item scraped from {response.url}"
-        spider.logger.info(message)
-        self.error_handler.log_signal(message)
+        self.metrics.record_item()
+        self.log_sampled_signal('item_scraped', spider, lambda: f"Item scraped from {response.url}")
 
 
    
 
+    def request_scheduled_handler(self, request, spider):
+        """Stamps the request with its scheduling time."""
+        self.metrics.record_scheduled(request)
+
     def response_received_handler(self, response, request, spider):
         """Logs when a response is received."""
-        message = f"Response received ({response.status}) from {request.url}"
-        spider.logger.info(message)
-        self.error_handler.log_signal(message)
+        self.metrics.record_response(request, response)
+        self.log_sampled_signal(
+            'response_received', spider, lambda: f"Response received ({response.status}) from {request.url}"
+        )
 
     def response_received_headers_handler(self, headers, request, spider):
         """Logs when response headers are received."""
-        message = f"Headers received from {request.url}: {headers}"
-        spider.logger.info(message)
-        self.error_handler.log_signal(message)
+        self.log_sampled_signal(
+            'response_received_headers', spider, lambda: f"Headers received from {request.url}: {headers}"
+        )
 
    
     def engine_started_handler(self):
@@ -116,3 +161,4 @@ class ErrorLoggingExtension:
         """Logs when the Scrapy engine stops."""
         message = "Scrapy engine stopped."
         self.error_handler.log_signal(message)
+        self.error_handler.close()
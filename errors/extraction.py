@@ -0,0 +1,233 @@
+import re
+
+from lxml import etree
+from parsel.csstranslator import HTMLTranslator
+
+_translator = HTMLTranslator()
+
+_COMPOUND_RE = re.compile(
+    r"""(?P<tag>[a-zA-Z][\w-]*)
+      | \.(?P<cls>-?[_a-zA-Z][\w-]*)
+      | \[\s*(?P<attr>[\w-]+)\s*(?:=\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<bare>-?[_a-zA-Z][\w-]*))\s*)?\]""",
+    re.VERBOSE,
+)
+_PSEUDO_RE = re.compile(r"::(?:(?P<text>text)|attr\((?P<attr>[\w-]+)\))$")
+
+
+def compile_css(css):
+    """
+    Compile a CSS selector (parsel dialect, including ``::text`` and
+    ``::attr()``) into a reusable lxml XPath evaluator. The translation is
+    the one `Selector.css()` performs, so results match `sel.css(css)`.
+    """
+    return etree.XPath(_translator.css_to_xpath(css), smart_strings=False)
+
+
+def first(results):
+    """Like `SelectorList.get()`: the first string result, or None."""
+    for result in results:
+        if isinstance(result, str):
+            return result
+        return etree.tostring(result, method="html", encoding="unicode", with_tail=False)
+    return None
+
+
+class _Compound:
+    """One compound selector (tag, classes, attributes) such as ``span.a-price[data-x='1']``."""
+
+    __slots__ = ("tag", "classes", "attrs")
+
+    def __init__(self, tag, classes, attrs):
+        self.tag = tag
+        self.classes = classes
+        self.attrs = attrs
+
+    def matches(self, node):
+        element, tag, cls = node
+        if self.tag is not None and tag != self.tag:
+            return False
+        if self.classes and not (cls and self.classes.issubset(cls.split())):
+            return False
+        for name, value in self.attrs:
+            actual = element.get(name)
+            if actual is None or (value is not None and actual != value):
+                return False
+        return True
+
+
+class WalkSelector:
+    """
+    A CSS selector matched against the ancestor stack of a tree walk.
+
+    Supports the subset used for card fields: tag, class and attribute
+    compounds joined by descendant (`` ``) or child (``>``) combinators,
+    ending in an optional ``::text`` or ``::attr(name)`` attached to the
+    last compound. `parse` raises ValueError for anything else, including
+    descendant pseudo-elements such as ``div ::text``.
+    """
+
+    def __init__(self, compounds, combinators, text, attr):
+        self.compounds = compounds
+        self.combinators = combinators
+        self.text = text
+        self.attr = attr
+        # A class the matched element itself must carry, used to skip most elements cheaply.
+        last = compounds[-1].classes
+        self.key_class = min(last) if last else None
+
+    @classmethod
+    def parse(cls, css):
+        css = css.strip()
+        text, attr = False, None
+        pseudo = _PSEUDO_RE.search(css)
+        if pseudo:
+            text, attr = bool(pseudo.group("text")), pseudo.group("attr")
+            css = css[:pseudo.start()]
+            if not css or css[-1].isspace() or css[-1] == ">":
+                raise ValueError(f"Unsupported selector: {css + pseudo.group()!r}")
+        compounds, combinators = [], []
+        for part in re.split(r"\s*(>)\s*|\s+", css.strip()):
+            if part is None:
+                continue
+            if part == ">":
+                if not compounds or len(combinators) == len(compounds):
+                    raise ValueError(f"Unsupported selector: {css!r}")
+                combinators.append(">")
+                continue
+            if not part:
+                continue
+            if len(combinators) < len(compounds):
+                combinators.append(" ")
+            compounds.append(cls._parse_compound(part, css))
+        if not compounds or len(combinators) != len(compounds) - 1:
+            raise ValueError(f"Unsupported selector: {css!r}")
+        return cls(compounds, combinators, text, attr)
+
+    @staticmethod
+    def _parse_compound(part, css):
+        tag, classes, attrs, pos = None, set(), [], 0
+        while pos < len(part):
+            match = _COMPOUND_RE.match(part, pos)
+            if not match or (match.group("tag") and pos):
+                raise ValueError(f"Unsupported selector: {css!r}")
+            if match.group("tag"):
+                tag = match.group("tag").lower()
+            elif match.group("cls"):
+                classes.add(match.group("cls"))
+            else:
+                value = next((v for v in match.group("sq", "dq", "bare") if v is not None), None)
+                attrs.append((match.group("attr"), value))
+            pos = match.end()
+        return _Compound(tag, frozenset(classes), tuple(attrs))
+
+    def matches(self, stack, index=None, pos=None):
+        """Whether the node on top of `stack` matches, given its ancestors below it."""
+        if index is None:
+            index, pos = len(self.compounds) - 1, len(stack) - 1
+        if not self.compounds[index].matches(stack[pos]):
+            return False
+        if index == 0:
+            return True
+        if self.combinators[index - 1] == ">":
+            return pos > 0 and self.matches(stack, index - 1, pos - 1)
+        return any(self.matches(stack, index - 1, ancestor) for ancestor in range(pos - 1, -1, -1))
+
+
+class CardExtractor:
+    """
+    Extracts a fixed set of fields from every repeated "card" on a page.
+
+    Selectors are declared once and compiled once. Cards are found with a
+    precompiled XPath; each card's subtree is then walked a single time,
+    matching every field at once against the ancestor stack and stopping
+    as soon as all fields have a value. Results are the same as
+    ``sel.css(field_css).get()`` on each card: the first matching text
+    node or attribute in document order. Fields whose selector is outside
+    the supported subset are evaluated with their compiled XPath instead.
+    """
+
+    def __init__(self, card_css, fields):
+        self.card_css = card_css
+        self.fields = dict(fields)
+        self._cards = compile_css(card_css)
+        self._walk_fields = []
+        self._xpath_fields = []
+        for name, css in self.fields.items():
+            try:
+                self._walk_fields.append((name, WalkSelector.parse(css)))
+            except ValueError:
+                self._xpath_fields.append((name, compile_css(css)))
+
+    def extract(self, root):
+        """
+        Yield one ``{field: value or None}`` dict per card. `root` is an
+        lxml element, a parsel `Selector` or a Scrapy response.
+        """
+        root = getattr(root, "selector", root)
+        root = getattr(root, "root", root)
+        for card in self._cards(root):
+            values = dict.fromkeys(self.fields)
+            if self._walk_fields:
+                self._walk(card, values)
+            for name, xpath in self._xpath_fields:
+                values[name] = first(xpath(card))
+            yield values
+
+    def _walk(self, card, values):
+        pending = list(self._walk_fields)
+        stack = []
+        matched_stack = []
+        for event, element in etree.iterwalk(card, events=("start", "end", "comment", "pi")):
+            if event == "start":
+                tag = element.tag
+                cls = element.get("class") if isinstance(tag, str) else None
+                node = (element, tag, cls)
+                stack.append(node)
+                matched = None
+                classes = cls.split() if cls else ()
+                for field in pending:
+                    key = field[1].key_class
+                    if (key is None or key in classes) and field[1].matches(stack):
+                        if matched is None:
+                            matched = []
+                        matched.append(field)
+                matched_stack.append(matched)
+                if matched is None:
+                    continue
+                for field in matched:
+                    name, selector = field
+                    if selector.attr is not None:
+                        value = element.get(selector.attr)
+                    elif selector.text:
+                        value = element.text or None
+                    else:
+                        value = etree.tostring(element, method="html", encoding="unicode", with_tail=False)
+                    if value is not None:
+                        values[name] = value
+                        pending.remove(field)
+            else:
+                # Comments and processing instructions have no end event, but may have a tail.
+                if event == "end":
+                    stack.pop()
+                    matched_stack.pop()
+                # The tail follows the node's subtree and is a text node of its parent.
+                if element.tail and matched_stack and matched_stack[-1]:
+                    for field in matched_stack[-1]:
+                        if field in pending and field[1].text:
+                            values[field[0]] = element.tail
+                            pending.remove(field)
+            if not pending:
+                return
+
+
+class PageExtractor:
+    """Single-value page-level fields (pagination links and the like), compiled once."""
+
+    def __init__(self, fields):
+        self.fields = dict(fields)
+        self._fields = {name: compile_css(css) for name, css in self.fields.items()}
+
+    def get(self, root, name):
+        root = getattr(root, "selector", root)
+        root = getattr(root, "root", root)
+        return first(self._fields[name](root))
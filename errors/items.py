@@ -3,13 +3,57 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+import re
+
 import scrapy
 
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_MULTIPLIERS = {"k": 1_000, "m": 1_000_000}
+
+
+def clean_text(value):
+    """Collapse runs of whitespace."""
+    return " ".join(str(value).split())
+
+
+def parse_price(value):
+    """'$1,299.99' or '24' -> float."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    if match is None:
+        raise ValueError("no number")
+    return float(match.group().replace(",", ""))
+
+
+def parse_stars(value):
+    """'4.5 out of 5 stars' -> 4.5."""
+    stars = parse_price(value)
+    if not 0 <= stars <= 5:
+        raise ValueError("rating out of range")
+    return stars
+
+
+def parse_count(value):
+    """'1,234', '(2.1K)' -> int."""
+    if isinstance(value, int):
+        return value
+    text = str(value).strip().lower()
+    match = _NUMBER.search(text)
+    if match is None:
+        raise ValueError("no number")
+    number = float(match.group().replace(",", ""))
+    suffix = text[match.end():match.end() + 1]
+    return int(round(number * _MULTIPLIERS.get(suffix, 1)))
+
 
 class ErrorsItem(scrapy.Item):
-    # define the fields for your item here like:
-    name = scrapy.Field()
-    price = scrapy.Field()
-    stars = scrapy.Field()
-    No_of_reviews = scrapy.Field()
-    
+    # Field metadata drives ErrorsPipeline: `normalize` converts the scraped
+    # text (raising ValueError when it can't), `required` rejects items
+    # without a value and `type` is the exported column type.
+    name = scrapy.Field(normalize=clean_text, required=True, type=str)
+    price = scrapy.Field(normalize=parse_price, required=True, type=float)
+    stars = scrapy.Field(normalize=parse_stars, required=True, type=float)
+    No_of_reviews = scrapy.Field(normalize=parse_count, type=int)
+    # The search page the product was found on.
+    url = scrapy.Field(type=str)
@@ -0,0 +1,140 @@
+import time
+
+# Human-readable names used in aggregate summaries.
+SIGNAL_LABELS = {
+    "item_scraped": "items scraped",
+    "response_received": "responses received",
+    "response_received_headers": "response headers received",
+    "spider_opened": "spiders opened",
+    "spider_closed": "spiders closed",
+    "engine_started": "engine starts",
+    "engine_stopped": "engine stops",
+}
+
+
+class LogPolicy:
+    """
+    Decides whether a signal's log line is written.
+
+    `check(build_message)` returns the line to log, or None to skip it.
+    `build_message` is only called when the event is actually logged, so
+    dropped events never pay for message formatting.
+    """
+
+    def check(self, build_message):
+        return build_message()
+
+    def flush(self):
+        """Return any pending summary line (used at shutdown)."""
+        return None
+
+
+class DisabledPolicy(LogPolicy):
+    def check(self, build_message):
+        return None
+
+
+class EveryNthPolicy(LogPolicy):
+    """Log the first event and then every `n`-th one."""
+
+    def __init__(self, n):
+        self.n = max(1, n)
+        self.seen = 0
+
+    def check(self, build_message):
+        self.seen += 1
+        if (self.seen - 1) % self.n:
+            return None
+        return build_message()
+
+
+class TokenBucketPolicy(LogPolicy):
+    """Log at most `rate` events per second, allowing bursts of `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated_at = clock()
+
+    def check(self, build_message):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return None
+        self.tokens -= 1
+        return build_message()
+
+
+class AggregatePolicy(LogPolicy):
+    """Replace individual lines with one count per interval, e.g. "1,243 items scraped in last 10s"."""
+
+    def __init__(self, interval, label="events", clock=time.monotonic):
+        self.interval = interval
+        self.label = label
+        self.clock = clock
+        self.count = 0
+        self.window_start = clock()
+
+    def check(self, build_message):
+        self.count += 1
+        if self.clock() - self.window_start >= self.interval:
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self.count:
+            return None
+        message = f"{self.count:,} {self.label} in last {self.clock() - self.window_start:.0f}s"
+        self.count = 0
+        self.window_start = self.clock()
+        return message
+
+
+def build_policy(spec, signal_name=""):
+    """
+    Build a policy from a spec string:
+
+    - ``all``: log every event
+    - ``off``: log nothing
+    - ``every:N``: log every N-th event
+    - ``rate:R`` or ``rate:R:BURST``: token bucket of R events per second
+    - ``aggregate:S``: one summary line every S seconds
+    """
+    name, _, args = str(spec).strip().lower().partition(":")
+    params = [float(arg) for arg in args.split(":")] if args else []
+    if name in ("all", "on"):
+        return LogPolicy()
+    if name in ("off", "disabled", "none"):
+        return DisabledPolicy()
+    if name == "every" and params:
+        return EveryNthPolicy(int(params[0]))
+    if name == "rate" and params:
+        return TokenBucketPolicy(params[0], params[1] if len(params) > 1 else None)
+    if name == "aggregate" and params:
+        return AggregatePolicy(params[0], SIGNAL_LABELS.get(signal_name, signal_name or "events"))
+    raise ValueError(f"Invalid signal log policy {spec!r} for {signal_name!r}")
+
+
+class SignalLogPolicies:
+    """Per-signal policies from the SIGNAL_LOG_POLICIES setting; unlisted signals are always logged."""
+
+    def __init__(self, specs=None):
+        self.policies = {name: build_policy(spec, name) for name, spec in (specs or {}).items()}
+        self.default = LogPolicy()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.getdict("SIGNAL_LOG_POLICIES"))
+
+    def __getitem__(self, signal_name):
+        return self.policies.get(signal_name, self.default)
+
+    def flush(self):
+        """Yield pending summary lines from all policies."""
+        for policy in self.policies.values():
+            message = policy.flush()
+            if message:
+                yield message
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from scrapy.utils.httpobj import urlparse_cached
+
+# Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: O(1) memory and recording, approximate percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """Upper bound of the bucket holding the given percentile (capped at the observed max)."""
+        if not self.count:
+            return None
+        threshold = percentile / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def merge(self, other):
+        """Add the samples of another histogram with the same buckets."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "counts": list(self.counts),
+        }
+
+    @classmethod
+    def from_dict(cls, data, buckets=LATENCY_BUCKETS):
+        """Rebuild a histogram from `to_dict()` output, e.g. to merge snapshots of several processes."""
+        histogram = cls(buckets)
+        histogram.counts = list(data.get("counts") or histogram.counts)
+        histogram.count = data.get("count", 0)
+        histogram.total = (data.get("mean") or 0.0) * histogram.count
+        histogram.max = data.get("max", 0.0)
+        return histogram
+
+
+class CrawlMetrics:
+    """
+    In-memory crawl instrumentation: download latency per domain and per
+    proxy provider, time from scheduling to response, status code counts
+    and item throughput.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started_at = clock()
+        self.latency_by_domain = defaultdict(LatencyHistogram)
+        self.latency_by_provider = defaultdict(LatencyHistogram)
+        self.scheduled_to_response = LatencyHistogram()
+        self.status_counts = Counter()
+        self.requests_scheduled = 0
+        self.responses = 0
+        self.items = 0
+        self._last_snapshot_at = self.started_at
+        self._last_snapshot_items = 0
+        self._last_snapshot_responses = 0
+
+    def record_scheduled(self, request):
+        self.requests_scheduled += 1
+        request.meta.setdefault("metrics_scheduled_at", self.clock())
+
+    def record_response(self, request, response):
+        self.responses += 1
+        self.status_counts[response.status] += 1
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.latency_by_domain[urlparse_cached(request).hostname or "unknown"].record(latency)
+            self.latency_by_provider[request.meta.get("proxy_provider", "direct")].record(latency)
+        scheduled_at = request.meta.get("metrics_scheduled_at")
+        if scheduled_at is not None:
+            self.scheduled_to_response.record(self.clock() - scheduled_at)
+
+    def record_item(self):
+        self.items += 1
+
+    def snapshot(self):
+        """Current metrics as a JSON-serializable dict, with rates since the previous snapshot."""
+        now = self.clock()
+        elapsed = max(now - self.started_at, 1e-9)
+        interval = max(now - self._last_snapshot_at, 1e-9)
+        snapshot = {
+            "timestamp": time.time(),
+            "elapsed": round(elapsed, 3),
+            "requests_scheduled": self.requests_scheduled,
+            "responses": self.responses,
+            "items": self.items,
+            "items_per_sec": round(self.items / elapsed, 3),
+            "responses_per_sec": round(self.responses / elapsed, 3),
+            "interval_items_per_sec": round((self.items - self._last_snapshot_items) / interval, 3),
+            "interval_responses_per_sec": round((self.responses - self._last_snapshot_responses) / interval, 3),
+            "status_counts": {str(status): count for status, count in sorted(self.status_counts.items())},
+            "scheduled_to_response": self.scheduled_to_response.to_dict(),
+            "latency_by_domain": {key: h.to_dict() for key, h in self.latency_by_domain.items()},
+            "latency_by_provider": {key: h.to_dict() for key, h in self.latency_by_provider.items()},
+        }
+        self._last_snapshot_at = now
+        self._last_snapshot_items = self.items
+        self._last_snapshot_responses = self.responses
+        return snapshot
+
+    def to_stats(self, stats, prefix="metrics"):
+        """Publish the headline numbers into Scrapy's stats collector."""
+        elapsed = max(self.clock() - self.started_at, 1e-9)
+        stats.set_value(f"{prefix}/items_per_sec", round(self.items / elapsed, 3))
+        stats.set_value(f"{prefix}/responses_per_sec", round(self.responses / elapsed, 3))
+        for status, count in self.status_counts.items():
+            stats.set_value(f"{prefix}/status_count/{status}", count)
+        for group, histograms in (("domain", self.latency_by_domain), ("provider", self.latency_by_provider)):
+            for key, histogram in histograms.items():
+                stats.set_value(f"{prefix}/latency/{group}/{key}/p50", histogram.percentile(50))
+                stats.set_value(f"{prefix}/latency/{group}/{key}/p95", histogram.percentile(95))
+
+
+def write_snapshot(path, snapshot):
+    """Atomically replace `path` with the JSON snapshot so readers never see a partial file."""
+    dir_name = os.path.dirname(path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
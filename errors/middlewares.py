@@ -3,10 +3,20 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
-from errors.proxy_manager import ProxyManager, should_switch
 import logging
 
+from scrapy import signals
+from scrapy.downloadermiddlewares.httpproxy import HttpProxyMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+
+from errors.log_policy import build_policy
+from errors.proxy_manager import ProxyRouter
+
+logger = logging.getLogger(__name__)
+
+# Parsed proxy URLs kept by ProxyDownloaderMiddleware before the cache is reset.
+PROXY_CACHE_SIZE = 1024
+
 # useful for handling different item types with a single interface
 
 
@@ -15,27 +25,6 @@ class ErrorsSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the spider middleware does not modify the
     # passed objects.
-    def __init__(self):
-        self.proxy_manager = ProxyManager()
-
-    def process_request(self, request, spider):
-        """
-        Modify the request to route traffic through a proxy.
-        
-        :param request: The Scrapy request object
-        :param spider: The Scrapy spider instance
-        """
-        proxy_name = "scraperapi" if not should_switch() else "scrapeops"
-
-        # Generate proxy URL
-        proxy_url = self.proxy_manager.get_proxy_url(request.url, proxy_name)
-
-        if proxy_url:
-            request.meta["proxy"] = proxy_url  # Assign proxy to request
-            logging.info(f"Using proxy: {proxy_url}")
-        else:
-            
-            logging.error(f"Failed to set proxy for {request.url}")
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -124,3 +113,91 @@ class ErrorsDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ProxyDownloaderMiddleware(HttpProxyMiddleware):
+    """
+    Routes every request through a provider picked by `ProxyRouter` and
+    feeds the outcome back into the provider's health score. Replaces
+    Scrapy's HttpProxyMiddleware, whose handling of explicit ``proxy`` meta,
+    environment proxies and Proxy-Authorization it keeps.
+
+    Provider proxy URLs are formatted once by the router and parsed into a
+    credential-less URL and an auth header the first time they are used, so
+    a request only costs a provider lookup and a few dict operations. Debug
+    lines are sampled by PROXY_DEBUG_LOG_POLICY (see `build_policy`).
+
+    Requests that already carry a ``proxy`` not chosen by the router (set
+    by the spider) are left alone. ``proxy_exclude`` in meta lists providers
+    not to use, e.g. after a ban; if every provider is excluded the
+    exclusion is ignored, and a request no provider can take is dropped
+    with IgnoreRequest. ``proxy_prefer`` lists providers to use when one
+    of them is available, e.g. for replayed failures (see `errors.replay`).
+    """
+
+    def __init__(self, router, auth_encoding="latin-1", log_policy=None):
+        # HttpProxyMiddleware.__init__ parses the environment proxies through _get_proxy.
+        self._proxy_cache = {}
+        super().__init__(auth_encoding)
+        self.router = router
+        self.log_policy = log_policy or build_policy("off")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("HTTPPROXY_ENABLED"):
+            raise NotConfigured
+        router = ProxyRouter.from_settings(settings)
+        if not router.providers:
+            logger.info("No PROXY_PROVIDERS configured, requests are not routed through a provider")
+        middleware = cls(
+            router,
+            auth_encoding=settings.get("HTTPPROXY_AUTH_ENCODING"),
+            log_policy=build_policy(settings.get("PROXY_DEBUG_LOG_POLICY", "every:1000"), "proxy"),
+        )
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _get_proxy(self, url, orig_type):
+        key = (url, orig_type)
+        parsed = self._proxy_cache.get(key)
+        if parsed is None:
+            if len(self._proxy_cache) >= PROXY_CACHE_SIZE:
+                self._proxy_cache.clear()
+            parsed = self._proxy_cache[key] = super()._get_proxy(url, orig_type)
+        return parsed
+
+    def process_request(self, request, spider):
+        meta = request.meta
+        if self.router.providers and ("proxy" not in meta or "proxy_provider" in meta):
+            exclude = meta.get("proxy_exclude", ())
+            prefer = meta.get("proxy_prefer", ())
+            provider = self.router.choose(exclude=exclude, prefer=prefer)
+            if provider is None and exclude:
+                provider = self.router.choose(prefer=prefer)
+            if provider is None:
+                # Not sent from the crawler's own address instead; the errback records the failure.
+                logger.warning("No proxy provider available for %s, dropping the request", request.url)
+                raise IgnoreRequest(f"No proxy provider available for {request.url}")
+            meta["proxy"] = provider.proxy_url
+            meta["proxy_provider"] = provider.name
+            if logger.isEnabledFor(logging.DEBUG):
+                message = self.log_policy.check(lambda: f"Using proxy provider {provider.name} for {request.url}")
+                if message:
+                    logger.debug(message)
+        return super().process_request(request, spider)
+
+    def process_response(self, request, response, spider):
+        provider = request.meta.get("proxy_provider")
+        if provider:
+            self.router.record_response(provider, response.status, request.meta.get("download_latency"))
+        return response
+
+    def process_exception(self, request, exception, spider):
+        provider = request.meta.get("proxy_provider")
+        if provider:
+            self.router.record(provider, False)
+
+    def spider_closed(self, spider):
+        if self.router.providers:
+            logger.info("Proxy provider stats: %s", self.router.stats())
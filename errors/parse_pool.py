@@ -0,0 +1,83 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from twisted.internet.defer import Deferred, DeferredSemaphore
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """
+    Runs CPU-heavy parse functions in worker processes so the reactor thread
+    stays free for downloads and callbacks.
+
+    `submit(func, *args)` returns a Deferred that fires in the reactor thread
+    with ``func(*args)``. `func` and its arguments must be picklable (a
+    module-level function called with strings or bytes). At most
+    `max_pending` calls are handed to the workers at once; further calls wait
+    in the pool. Because a spider callback that returns such a Deferred keeps
+    its response in Scrapy's scraper slot, a backlog here also throttles new
+    downloads through SCRAPER_SLOT_MAX_ACTIVE_SIZE.
+    """
+
+    def __init__(self, workers=None, max_pending=None, start_method="spawn"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self.start_method = start_method
+        self.submitted = 0
+        self.failed = 0
+        self._semaphore = DeferredSemaphore(self.max_pending)
+        self._executor = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """A pool configured by the PARSE_* settings, or None if offloading is disabled."""
+        if not settings.getbool("PARSE_OFFLOAD_ENABLED", False):
+            return None
+        return cls(
+            workers=settings.getint("PARSE_WORKERS", 0) or None,
+            max_pending=settings.getint("PARSE_MAX_PENDING", 0) or None,
+            start_method=settings.get("PARSE_START_METHOD", "spawn"),
+        )
+
+    def _get_executor(self):
+        if self._executor is None:
+            # The crawler process runs threads (reactor, log writers), so workers are not forked from it.
+            context = multiprocessing.get_context(self.start_method)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            logger.info("Started %d parse worker processes", self.workers)
+        return self._executor
+
+    @property
+    def pending(self):
+        """Calls running in a worker or waiting for one."""
+        return self.max_pending - self._semaphore.tokens + len(self._semaphore.waiting)
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        return self._semaphore.run(self._run, func, *args)
+
+    def _run(self, func, *args):
+        from twisted.internet import reactor
+
+        d = Deferred()
+        future = self._get_executor().submit(func, *args)
+        future.add_done_callback(lambda done: reactor.callFromThread(self._fire, d, done))
+        return d
+
+    def _fire(self, d, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            self.failed += 1
+            d.errback(e)
+        else:
+            d.callback(result)
+
+    def close(self, wait=True):
+        """Stop the worker processes, waiting for submitted calls if `wait`."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
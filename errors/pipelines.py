@@ -3,26 +3,200 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import logging
 
-# useful for handling different item types with a single interface
-# from itemadapter import ItemAdapter
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
 
+from errors.export import BatchExporter, check_export_path
+from logs.error_handler import ErrorManager
 
-from itemadapter import ItemAdapter
-from logs.error_handler import ErrorHandler
-from scrapy.exceptions import DropItem
+logger = logging.getLogger(__name__)
+
+class RejectedItem(DropItem):
+    """An item dropped by ErrorsPipeline; the reason is already on its way to the error store."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
 
-error_handler = ErrorHandler()
 
 class ErrorsPipeline:
+    """
+    Validates and normalizes items from their field metadata (see
+    `errors.items.ErrorsItem`): each field's `normalize` callable converts
+    the scraped text, and items with a `required` field left empty or a
+    value that can't be normalized are dropped.
+
+    Rejects are written to the error store in batches of
+    ITEM_REJECT_BATCH_SIZE rather than one write per item, and counted in
+    the crawl stats under ``item_pipeline/``.
+    """
+
+    def __init__(self, stats=None, error_manager=None, reject_batch_size=100, settings=None):
+        self.stats = stats
+        self.error_manager = error_manager
+        self.own_error_manager = None
+        self.reject_batch_size = reject_batch_size
+        self.settings = settings
+        self.rejects = []
+        self._rules = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            stats=crawler.stats,
+            reject_batch_size=crawler.settings.getint("ITEM_REJECT_BATCH_SIZE", 100),
+            settings=crawler.settings,
+        )
+
+    def open_spider(self, spider):
+        if self.error_manager is None:
+            self.error_manager = getattr(spider, "error_manager", None)
+        if self.error_manager is None:
+            self.error_manager = self.own_error_manager = ErrorManager.from_settings(self.settings)
+
+    def close_spider(self, spider):
+        self.flush_rejects()
+        if self.own_error_manager is not None:
+            self.own_error_manager.close()
+
+    def rules(self, item):
+        """``(field, normalize, required)`` for each field of the item's class, computed once per class."""
+        item_class = type(item)
+        rules = self._rules.get(item_class)
+        if rules is None:
+            rules = []
+            for name in ItemAdapter.get_field_names_from_class(item_class) or ():
+                meta = ItemAdapter.get_field_meta_from_class(item_class, name)
+                if meta.get("normalize") or meta.get("required"):
+                    rules.append((name, meta.get("normalize"), meta.get("required", False)))
+            self._rules[item_class] = rules
+        return rules
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        for name, normalize, required in self.rules(item):
+            value = adapter.get(name)
+            if value is None or value == "":
+                if required:
+                    self.reject(item, spider, "missing_required_data", f"Missing {name}")
+                continue
+            if normalize is not None:
+                try:
+                    adapter[name] = normalize(value)
+                except (TypeError, ValueError) as e:
+                    self.reject(item, spider, "invalid_item_data", f"Invalid {name} {value!r}: {e}")
+        if self.stats is not None:
+            self.stats.inc_value("item_pipeline/accepted")
+        return item
+
+    def reject(self, item, spider, error_type, reason):
+        adapter = ItemAdapter(item)
+        label = adapter.get("name") or "unnamed item"
+        message = f"{reason} ({label!r:.120})"
+        # The page the item was scraped from, if the item carries it.
+        entry = self.error_manager.error_type_entry(error_type, spider.name, url=adapter.get("url"),
+                                                    message=message, reason=reason)
+        code = int(entry.error_code)
+        self.rejects.append(entry)
+        if len(self.rejects) >= self.reject_batch_size:
+            self.flush_rejects()
+        if self.stats is not None:
+            self.stats.inc_value("item_pipeline/rejected")
+            self.stats.inc_value(f"item_pipeline/rejected/{code}")
+        raise RejectedItem(message, code)
+
+    def flush_rejects(self):
+        if self.rejects:
+            self.error_manager.log_errors(self.rejects)
+            self.rejects = []
+
+
+class ItemExportPipeline:
+    """
+    Streams items to ITEM_EXPORT_FILE as JSON lines (``.jsonl``), gzipped
+    JSON lines (``.jsonl.gz``) or Parquet (``.parquet``, needs pyarrow), in
+    batches of ITEM_EXPORT_BATCH_SIZE. Unlike a JSON array feed, memory
+    stays constant and the output can be read line by line or by row group.
+    Parquet column types come from the items' `type` field metadata.
+
+    With the spider's crawl checkpoint (errors.checkpoint), the export is
+    written out and its position recorded before every checkpoint write,
+    and it is only published once the crawl finishes: an interrupted crawl
+    leaves ``<ITEM_EXPORT_FILE>.part``, which the resumed crawl continues
+    from that position, so the items of pages it doesn't fetch again are
+    kept.
+    """
+
+    def __init__(self, path, batch_size=1000, parquet_compression="snappy"):
+        self.path = path
+        self.batch_size = batch_size
+        self.parquet_compression = parquet_compression
+        self.exporter = None
+        self.checkpoint = None
+        self.resume_at = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get("ITEM_EXPORT_FILE")
+        if not path:
+            raise NotConfigured
+        check_export_path(path)
+        pipeline = cls(
+            path,
+            batch_size=settings.getint("ITEM_EXPORT_BATCH_SIZE", 1000),
+            parquet_compression=settings.get("ITEM_EXPORT_PARQUET_COMPRESSION", "snappy"),
+        )
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    @staticmethod
+    def field_types(item):
+        item_class = type(item)
+        names = ItemAdapter.get_field_names_from_class(item_class)
+        if not names:
+            return None
+        return {name: ItemAdapter.get_field_meta_from_class(item_class, name).get("type") for name in names}
+
+    def open_spider(self, spider):
+        self.checkpoint = getattr(spider, "checkpoint", None)
+        if self.checkpoint is None:
+            return
+        if self.checkpoint.resuming:
+            self.resume_at = int(self.checkpoint.get_meta("export_position", 0))
+        self.checkpoint.on_flush = self.save_position
+
+    def save_position(self):
+        if self.exporter is not None:
+            self.checkpoint.set_meta("export_position", self.exporter.position())
+
+    def make_exporter(self, fields=None):
+        return BatchExporter(self.path, fields, self.batch_size, self.parquet_compression, resume_at=self.resume_at)
+
     def process_item(self, item, spider):
-        """Process items and simulate errors."""
-        if not item.get("url"):
-            error_handler.log_error("DropItem", "Missing URL in item!", spider.name)
-            raise DropItem("Missing URL in item!")
-        
-        if item.get("status") != 200:
-            error_handler.log_error("Non-200 Status", f"Non-200 status code for URL: {item['url']}", spider.name)
-        
+        if self.exporter is None:
+            self.exporter = self.make_exporter(self.field_types(item))
+        self.exporter.add(ItemAdapter(item).asdict())
         return item
 
+    def close_spider(self, spider):
+        if self.checkpoint is not None:
+            self.save_position()
+            self.checkpoint.on_flush = None
+        if self.exporter is None and self.resume_at is not None:
+            # No new items, but the interrupted crawl's export is still to be finished.
+            self.exporter = self.make_exporter()
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def spider_closed(self, spider, reason):
+        """Publish the export, unless the crawl is interrupted and will be resumed."""
+        if self.exporter is None:
+            return
+        if self.checkpoint is None or reason == "finished":
+            self.exporter.publish()
+        else:
+            logger.info("Crawl %s; keeping %s for the resumed crawl", reason, self.exporter.part_path)
@@ -1,5 +1,16 @@
 import os
+import json
+import time
+import random
 import requests
+import threading
+from collections import deque
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from twisted.internet import defer
+from twisted.internet.task import deferLater
+from twisted.web.client import Agent, HTTPConnectionPool, readBody
+from twisted.web.http_headers import Headers
 
 
 import logging
@@ -10,58 +21,531 @@ load_dotenv()
 # Load your keys from the .env file (assuming you're using python-dotenv to load them)
 SCRAPER_API_KEY = os.getenv("SCRAPER_API_KEY")
 SCRAPER_OPS_KEY = os.getenv("SCRAPER_OPS_KEY")
+SCRAPEOPS_API_KEY = os.getenv("SCRAPEOPS_API_KEY") or SCRAPER_OPS_KEY
+SCRAPER_API_ACCOUNT_URL = "http://api.scraperapi.com/account"
+
+# Account API client defaults: keep-alive pool, strict timeouts, bounded retries.
+ACCOUNT_POOL_SIZE = 4
+ACCOUNT_CONNECT_TIMEOUT = 3.05
+ACCOUNT_READ_TIMEOUT = 10.0
+ACCOUNT_RETRIES = 3
+ACCOUNT_BACKOFF_FACTOR = 0.5
+ACCOUNT_BACKOFF_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def backoff_delay(attempt, factor=ACCOUNT_BACKOFF_FACTOR, jitter=ACCOUNT_BACKOFF_JITTER):
+    """Exponential backoff for the given (zero-based) retry attempt, plus random jitter."""
+    return factor * (2 ** attempt) + random.uniform(0, jitter)
+
+
+class AccountClient:
+    """
+    Blocking client for provider account endpoints.
+
+    Wraps one `requests.Session` so DNS lookups, TCP connections and TLS
+    sessions are reused between calls, with a bounded connection pool,
+    (connect, read) timeouts on every request and urllib3 retries with
+    jittered exponential backoff.
+    """
+
+    def __init__(self, pool_size=ACCOUNT_POOL_SIZE, connect_timeout=ACCOUNT_CONNECT_TIMEOUT,
+                 read_timeout=ACCOUNT_READ_TIMEOUT, retries=ACCOUNT_RETRIES,
+                 backoff_factor=ACCOUNT_BACKOFF_FACTOR, backoff_jitter=ACCOUNT_BACKOFF_JITTER):
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**account_client_options(settings))
+
+    def get_json(self, url, params=None):
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncAccountClient:
+    """
+    Non-blocking counterpart of `AccountClient` built on Twisted's `Agent`.
+
+    Runs on whichever reactor is installed, including the asyncio reactor
+    set by TWISTED_REACTOR. Connections are kept alive in an
+    `HTTPConnectionPool`; every attempt is bounded by the connect and read
+    timeouts and retried with jittered backoff. `get_json` returns a
+    Deferred; from a coroutine, wrap it with
+    `scrapy.utils.defer.maybe_deferred_to_future`.
+    """
+
+    def __init__(self, reactor=None, pool_size=ACCOUNT_POOL_SIZE, connect_timeout=ACCOUNT_CONNECT_TIMEOUT,
+                 read_timeout=ACCOUNT_READ_TIMEOUT, retries=ACCOUNT_RETRIES,
+                 backoff_factor=ACCOUNT_BACKOFF_FACTOR, backoff_jitter=ACCOUNT_BACKOFF_JITTER):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_jitter = backoff_jitter
+        self.pool = HTTPConnectionPool(reactor, persistent=True)
+        self.pool.maxPersistentPerHost = pool_size
+        self.agent = Agent(reactor, connectTimeout=connect_timeout, pool=self.pool)
+
+    @classmethod
+    def from_settings(cls, settings, reactor=None):
+        return cls(reactor=reactor, **account_client_options(settings))
+
+    @defer.inlineCallbacks
+    def get_json(self, url, params=None):
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url
+        for attempt in range(self.retries + 1):
+            try:
+                d = self.agent.request(b"GET", url.encode(), Headers({b"Accept": [b"application/json"]}))
+                d.addTimeout(self.read_timeout, self.reactor)
+                response = yield d
+                d = readBody(response)
+                d.addTimeout(self.read_timeout, self.reactor)
+                body = yield d
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.code not in RETRY_STATUSES or attempt >= self.retries:
+                    if response.code >= 400:
+                        raise requests.HTTPError(f"{response.code} response from {url}")
+                    return json.loads(body)
+            yield deferLater(self.reactor, backoff_delay(attempt, self.backoff_factor, self.backoff_jitter), lambda: None)
+
+    def close(self):
+        return self.pool.closeCachedConnections()
+
+
+def account_client_options(settings):
+    """Read account client options from Scrapy settings."""
+    return {
+        "pool_size": settings.getint("PROXY_ACCOUNT_POOL_SIZE", ACCOUNT_POOL_SIZE),
+        "connect_timeout": settings.getfloat("PROXY_ACCOUNT_CONNECT_TIMEOUT", ACCOUNT_CONNECT_TIMEOUT),
+        "read_timeout": settings.getfloat("PROXY_ACCOUNT_READ_TIMEOUT", ACCOUNT_READ_TIMEOUT),
+        "retries": settings.getint("PROXY_ACCOUNT_RETRIES", ACCOUNT_RETRIES),
+        "backoff_factor": settings.getfloat("PROXY_ACCOUNT_BACKOFF_FACTOR", ACCOUNT_BACKOFF_FACTOR),
+        "backoff_jitter": settings.getfloat("PROXY_ACCOUNT_BACKOFF_JITTER", ACCOUNT_BACKOFF_JITTER),
+    }
+
+
+account_client = AccountClient()
+
+
+def parse_api_usage(data):
+    request_count = data.get("requestCount", 0)
+    request_limit = data.get("requestLimit", 0)
+    message = (f"API Usage: {request_count}/{request_limit}")
+    logging.info(message)
+    return request_count, request_limit
 
 # Function to fetch current usage stats from Scraper API
-def get_api_usage():
-    url = f"http://api.scraperapi.com/account?api_key={SCRAPER_API_KEY}"
+def get_api_usage(api_key=None, account_url=SCRAPER_API_ACCOUNT_URL, client=None):
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Check for errors in the response
-        data = response.json()
-        
-        request_count = data.get("requestCount", 0)
-        request_limit = data.get("requestLimit", 0)
-        message = (f"API Usage: {request_count}/{request_limit}")
-        logging.info(message)
-        # self.error_handler.log_signal(message)
-        return request_count, request_limit
+        data = (client or account_client).get_json(account_url, params={"api_key": api_key or SCRAPER_API_KEY})
+        return parse_api_usage(data)
         
     except Exception as e:
-        print(f"Error fetching API usage: {e}")
+        logging.warning(f"Error fetching API usage: {e}")
         return None, None
 
-# Function to decide whether to switch to Scraper Ops
-def should_switch():
-    request_count, request_limit = get_api_usage()
+# Same as get_api_usage, but returns a Deferred and never blocks the reactor
+def get_api_usage_async(client, api_key=None, account_url=SCRAPER_API_ACCOUNT_URL):
+    def failed(failure):
+        logging.warning(f"Error fetching API usage: {failure.getErrorMessage()}")
+        return None, None
 
-    if request_count is None or request_limit is None:
-        print("Unable to retrieve usage data.")
-        return False
+    d = client.get_json(account_url, params={"api_key": api_key or SCRAPER_API_KEY})
+    d.addCallbacks(parse_api_usage, failed)
+    return d
+
+class ScraperApiAccountBackend:
+    """Quota backend that reads usage from a ScraperAPI-compatible /account endpoint."""
+
+    is_async = False
+
+    def __init__(self, api_key=None, account_url=SCRAPER_API_ACCOUNT_URL, client=None):
+        self.api_key = api_key
+        self.account_url = account_url
+        self.client = client
+
+    def __call__(self):
+        return get_api_usage(self.api_key, self.account_url, self.client)
+
+
+class AsyncScraperApiAccountBackend(ScraperApiAccountBackend):
+    """Quota backend whose fetch returns a Deferred; it must be called from the reactor thread."""
+
+    is_async = True
+
+    def __call__(self):
+        return get_api_usage_async(self.client, self.api_key, self.account_url)
+
+
+class QuotaTracker:
+    """
+    Cached view of a proxy provider's request quota.
 
-    # Check if the request count has reached the limit
-    if request_count >= request_limit:
+    `is_exhausted()` only reads in-memory state: the last (count, limit) pair
+    fetched from `backend`, plus a local counter of requests sent since that
+    fetch. Once the cached value is older than `ttl` seconds a refresh is
+    started on a background thread, and at most one refresh is in flight at
+    a time; ``refresh(wait=True)`` waits for the one already running. `backend` is any callable returning ``(request_count,
+    request_limit)`` or ``(None, None)`` when usage can't be retrieved.
+    """
+
+    def __init__(self, backend=None, ttl=60.0, clock=time.monotonic):
+        self.backend = backend or ScraperApiAccountBackend()
+        self.ttl = ttl
+        self.clock = clock
+        self.request_count = None
+        self.request_limit = None
+        self.local_requests = 0
+        self.fetched_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        # Set whenever no refresh is in flight.
+        self._refreshed = threading.Event()
+        self._refreshed.set()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Build a tracker from settings. With SCRAPER_API_ASYNC_CLIENT the quota
+        is fetched through `AsyncAccountClient` on the reactor, otherwise
+        through a pooled `AccountClient` on a helper thread.
+        """
+        if settings.getbool('SCRAPER_API_ASYNC_CLIENT', False):
+            backend_cls, client = AsyncScraperApiAccountBackend, AsyncAccountClient.from_settings(settings)
+        else:
+            backend_cls, client = ScraperApiAccountBackend, AccountClient.from_settings(settings)
+        backend = backend_cls(
+            api_key=settings.get('SCRAPER_API_KEY') or SCRAPER_API_KEY,
+            account_url=settings.get('SCRAPER_API_ACCOUNT_URL', SCRAPER_API_ACCOUNT_URL),
+            client=client,
+        )
+        return cls(backend=backend, ttl=settings.getfloat('SCRAPER_API_QUOTA_TTL', 60.0))
+
+    def is_stale(self):
+        return self.fetched_at is None or self.clock() - self.fetched_at >= self.ttl
+
+    def remaining(self):
+        """Requests left by the latest estimate, or None if usage is unknown."""
+        if self.is_stale():
+            self.refresh()
+        if self.request_count is None or self.request_limit is None:
+            return None
+        return self.request_limit - self.request_count - self.local_requests
+
+    def is_exhausted(self):
+        """Return True once the quota is used up. Unknown usage counts as available."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def record_request(self, count=1):
+        """Count requests sent through the provider since the last refresh."""
+        with self._lock:
+            self.local_requests += count
+
+    def refresh(self, wait=False):
+        """
+        Start a refresh unless one is already running. Blocking backends run
+        on a background thread, or in the calling thread with `wait`; async
+        backends are started on the reactor. Returns False if a refresh was
+        already in flight; with `wait` and a blocking backend, once it is done.
+        """
+        is_async = getattr(self.backend, 'is_async', False)
+        with self._lock:
+            in_flight = self._refreshing
+            if not in_flight:
+                self._refreshing = True
+                self._refreshed.clear()
+                counted = self.local_requests
+        if in_flight:
+            # An async refresh completes on the reactor, which waiting would block.
+            if wait and not is_async:
+                self._refreshed.wait()
+            return False
+        if is_async:
+            d = self.backend()
+            d.addBoth(self._store_usage, counted)
+        elif wait:
+            self._refresh(counted)
+        else:
+            threading.Thread(target=self._refresh, args=(counted,), name="quota-refresh", daemon=True).start()
+        return True
+
+    def _refresh(self, counted):
+        try:
+            usage = self.backend()
+        except Exception as e:
+            logging.warning(f"Quota refresh failed: {e}")
+            usage = None
+        self._store_usage(usage, counted)
+
+    def _store_usage(self, usage, counted):
+        request_count, request_limit = usage if isinstance(usage, tuple) else (None, None)
+        with self._lock:
+            if request_count is not None and request_limit is not None:
+                self.request_count = request_count
+                self.request_limit = request_limit
+                # Requests sent while the fetch was in flight are not part of it.
+                self.local_requests -= counted
+            # A failed fetch is not retried before the TTL expires either.
+            self.fetched_at = self.clock()
+            self._refreshing = False
+            self._refreshed.set()
+
+
+# Statuses that count against a proxy provider rather than the target site.
+PROVIDER_FAILURE_STATUSES = frozenset({403, 407, 429, 500, 502, 503, 504})
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+
+class ProxyProvider:
+    """
+    One proxy provider with its rolling health statistics.
+
+    Keeps the last `window` outcomes and download latencies, an optional
+    `QuotaTracker`, and a circuit breaker: after `failure_threshold`
+    consecutive failures the provider is taken out of rotation for
+    `cooldown` seconds, then a single trial request decides whether it
+    comes back.
+    """
+
+    def __init__(self, name, proxy_url, weight=1.0, quota=None, window=100, failure_threshold=5,
+                 cooldown=30.0, latency_reference=2.0, score_ttl=1.0, clock=time.monotonic):
+        self.name = name
+        self.proxy_url = proxy_url
+        self.weight = weight
+        self.quota = quota
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.latency_reference = latency_reference
+        self.score_ttl = score_ttl
+        self.clock = clock
+
+        self.outcomes = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.circuit = CIRCUIT_CLOSED
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._score = None
+        self._scored_at = None
+
+    def record(self, success, latency=None):
+        """Record the outcome of one request sent through this provider."""
+        self.outcomes.append(success)
+        if latency is not None:
+            self.latencies.append(latency)
+        if self.quota is not None:
+            self.quota.record_request()
+        self._score = None
+
+        if success:
+            self.consecutive_failures = 0
+            if self.circuit != CIRCUIT_CLOSED:
+                logging.info(f"Proxy provider '{self.name}' recovered, closing circuit.")
+            self.circuit = CIRCUIT_CLOSED
+        else:
+            self.consecutive_failures += 1
+            if self.circuit == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.circuit != CIRCUIT_OPEN:
+                    logging.warning(f"Proxy provider '{self.name}' keeps failing, opening circuit.")
+                self.circuit = CIRCUIT_OPEN
+                self.opened_at = self.clock()
+        self._trial_in_flight = False
+
+    def available(self):
+        """Whether requests may be routed here right now."""
+        if self.circuit == CIRCUIT_OPEN:
+            if self.clock() - self.opened_at < self.cooldown:
+                return False
+            self.circuit = CIRCUIT_HALF_OPEN
+        if self.circuit == CIRCUIT_HALF_OPEN and self._trial_in_flight:
+            return False
+        if self.quota is not None and self.quota.is_exhausted():
+            return False
         return True
 
-    return False
+    def mark_selected(self):
+        if self.circuit == CIRCUIT_HALF_OPEN:
+            self._trial_in_flight = True
+
+    @property
+    def success_rate(self):
+        # Smoothed so a provider with no history starts at 0.5 instead of 0 or 1.
+        return (sum(self.outcomes) + 1) / (len(self.outcomes) + 2)
+
+    def latency_percentile(self, percentile):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def score(self):
+        """
+        Routing weight: configured weight times smoothed success rate,
+        discounted by p95 latency relative to `latency_reference`. Cached for
+        `score_ttl` seconds so routing stays an in-memory lookup.
+        """
+        now = self.clock()
+        if self._score is None or now - self._scored_at >= self.score_ttl:
+            p95 = self.latency_percentile(95) or 0.0
+            self._score = self.weight * self.success_rate / (1.0 + p95 / self.latency_reference)
+            self._scored_at = now
+        return self._score
+
+    def stats(self):
+        remaining = self.quota.remaining() if self.quota is not None else None
+        return {
+            "circuit": self.circuit,
+            "success_rate": round(self.success_rate, 4),
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "quota_remaining": remaining,
+            "score": round(self.score(), 4),
+        }
+
+
+class ProxyRouter:
+    """
+    Picks a proxy provider per request by weighted random choice over the
+    providers' health scores, skipping providers whose circuit is open or
+    whose quota is used up.
+    """
+
+    def __init__(self, providers, rng=None):
+        self.providers = {provider.name: provider for provider in providers}
+        self.rng = rng or random.Random()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        Build the router from the PROXY_PROVIDERS setting, a dict of
+        ``name -> options`` where options are ``proxy_url`` (a template that
+        may use ``{api_key}``), ``api_key`` or ``api_key_env``, ``weight``
+        and, to track quota, ``account_url``.
+        """
+        providers = []
+        options = {
+            "window": settings.getint("PROXY_ROUTER_WINDOW", 100),
+            "failure_threshold": settings.getint("PROXY_CIRCUIT_FAILURES", 5),
+            "cooldown": settings.getfloat("PROXY_CIRCUIT_COOLDOWN", 30.0),
+            "latency_reference": settings.getfloat("PROXY_LATENCY_REFERENCE", 2.0),
+        }
+        client = None
+        for name, conf in settings.getdict("PROXY_PROVIDERS").items():
+            api_key = conf.get("api_key") or os.getenv(conf.get("api_key_env", ""), "")
+            quota = None
+            if conf.get("account_url"):
+                client = client or AccountClient.from_settings(settings)
+                quota = QuotaTracker(
+                    ScraperApiAccountBackend(api_key, conf["account_url"], client),
+                    ttl=settings.getfloat("SCRAPER_API_QUOTA_TTL", 60.0),
+                )
+            providers.append(ProxyProvider(
+                name,
+                conf["proxy_url"].format(api_key=api_key),
+                weight=float(conf.get("weight", 1.0)),
+                quota=quota,
+                **options,
+            ))
+        return cls(providers)
+
+    def choose(self, exclude=(), prefer=()):
+        """
+        Return the provider to use for the next request, or None if there are
+        none. When any provider named in `prefer` is available, the choice is
+        made among those.
+        """
+        candidates = [
+            provider for name, provider in self.providers.items()
+            if name not in exclude and provider.available()
+        ]
+        if prefer:
+            preferred = [provider for provider in candidates if provider.name in prefer]
+            if preferred:
+                candidates = preferred
+        if not candidates:
+            # Everything is tripped: use the provider that has been resting longest.
+            candidates = [p for name, p in self.providers.items() if name not in exclude]
+            if not candidates:
+                return None
+            provider = min(candidates, key=lambda p: p.opened_at or 0)
+        elif len(candidates) == 1:
+            provider = candidates[0]
+        else:
+            # Zero-score providers (weight 0, or scores driven to 0) are never picked
+            # by weight; if every candidate scores 0 the choice is uniform.
+            weights = [max(0.0, p.score()) for p in candidates]
+            if any(weights):
+                provider = self.rng.choices(candidates, weights=weights)[0]
+            else:
+                provider = self.rng.choice(candidates)
+        provider.mark_selected()
+        return provider
+
+    def record(self, name, success, latency=None):
+        provider = self.providers.get(name)
+        if provider is not None:
+            provider.record(success, latency)
+
+    def record_response(self, name, status, latency=None):
+        self.record(name, status not in PROVIDER_FAILURE_STATUSES, latency)
+
+    def stats(self):
+        return {name: provider.stats() for name, provider in self.providers.items()}
+
+
+quota_tracker = QuotaTracker()
+
+# Function to decide whether to switch to Scraper Ops
+def should_switch():
+    return quota_tracker.is_exhausted()
 
 # Main proxy operation function
 def perform_proxy_operation():
-    request_count, request_limit = get_api_usage()
+    quota_tracker.refresh(wait=True)
+    request_count, request_limit = quota_tracker.request_count, quota_tracker.request_limit
     
     if request_count is None or request_limit is None:
-        print("Error fetching usage data, cannot perform proxy operation.")
+        logging.error("Error fetching usage data, cannot perform proxy operation.")
         return
 
     # Display the current request count and limit
-    print(f"Current API Usage: {request_count} / {request_limit} requests.")
+    logging.info(f"Current API Usage: {request_count} / {request_limit} requests.")
     
     if should_switch():
-        print("Scraper API limit reached. Switching to Scraper Ops.")
+        logging.warning("Scraper API limit reached. Switching to Scraper Ops.")
         # Switch to Scraper Ops or implement any fallback logic here
         # Example: You could switch your proxy manager to use Scraper Ops API key
         # SCRAPER_API_KEY = SCRAPER_OPS_KEY  # Or however you'd implement the switch
     else:
-        print("Scraper API is still active.")
+        logging.info("Scraper API is still active.")
         # Proceed with your regular proxy operations here
 
 
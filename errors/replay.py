@@ -0,0 +1,65 @@
+import logging
+
+from errors.checkpoint import read_failed_urls
+
+logger = logging.getLogger(__name__)
+
+# Request failures: generic, HTTP error responses and network errors.
+DEFAULT_REPLAY_CODES = (1001, 1002, 1003)
+
+
+class FailedUrlReplay:
+    """
+    Streams the failed URLs of a crawl back out of its crawl checkpoint
+    (CRAWL_CHECKPOINT_FILE, see `errors.checkpoint`), filtered by code,
+    spider and time of failure. The checkpoint holds every failed URL once,
+    with the code it failed with, whatever the error log aggregated; it is
+    only read, and is kept until the next crawl starts a new one.
+
+    Each URL comes with the request meta to replay it with: ``replay_code``
+    and, from REPLAY_PROXY_PROVIDERS, ``proxy_prefer``, the providers to try
+    for that kind of failure. The replay crawl checkpoints itself in
+    REPLAY_CHECKPOINT_FILE, so its own failures don't touch the crawl's.
+    """
+
+    def __init__(self, checkpoint_file, codes=DEFAULT_REPLAY_CODES, spider=None, since=None, until=None, providers=None):
+        self.checkpoint_file = checkpoint_file
+        self.codes = list(codes) if codes else None
+        self.spider = spider
+        self.since = since
+        self.until = until
+        self.providers = {int(code): list(names) for code, names in (providers or {}).items()}
+        self.urls = 0
+        self._failed = None
+
+    @classmethod
+    def from_settings(cls, settings, codes=None, spider=None, since=None, until=None):
+        checkpoint_file = settings.get("CRAWL_CHECKPOINT_FILE")
+        if not checkpoint_file:
+            raise ValueError("Replay reads the failed URLs of CRAWL_CHECKPOINT_FILE, which is disabled")
+        return cls(
+            checkpoint_file,
+            codes=codes or [int(code) for code in settings.getlist("REPLAY_CODES", DEFAULT_REPLAY_CODES)],
+            spider=spider,
+            since=since,
+            until=until,
+            providers=settings.getdict("REPLAY_PROXY_PROVIDERS"),
+        )
+
+    def __iter__(self):
+        """``(url, meta)`` for each failed URL to replay."""
+        self._failed = read_failed_urls(self.checkpoint_file, codes=self.codes, spider=self.spider,
+                                        since=self.since, until=self.until)
+        for url, code, status in self._failed:
+            self.urls += 1
+            meta = {"replay_code": code}
+            providers = self.providers.get(code)
+            if providers:
+                meta["proxy_prefer"] = providers
+            yield url, meta
+        logger.info("Replaying %d failed URLs from %s", self.urls, self.checkpoint_file)
+
+    def close(self):
+        # Closes the checkpoint connection of a replay stopped before it read every URL.
+        if self._failed is not None:
+            self._failed.close()
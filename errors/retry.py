@@ -0,0 +1,243 @@
+import random
+import logging
+from urllib.parse import urlparse
+
+from scrapy import signals
+from scrapy.downloadermiddlewares.retry import get_retry_request
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.utils.misc import load_object
+from scrapy.utils.response import response_status_message
+
+from logs.error_codes import ErrorRegistry
+from logs.error_handler import ErrorManager
+
+logger = logging.getLogger(__name__)
+
+
+class RetryScheduled(IgnoreRequest):
+    """The request is retried after its backoff: not a failure, errbacks should ignore it."""
+
+
+class RetryBudget:
+    """
+    Global cap on retries as a fraction of traffic. Every first attempt that
+    completes adds `ratio` tokens (up to `max_tokens`) and every retry spends
+    one, so under widespread failure retries stay around `ratio` of requests
+    instead of multiplying the load.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max(max_tokens, min_tokens)
+        self.tokens = float(min_tokens)
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def refund(self):
+        """Give back a token withdrawn for a retry that didn't happen."""
+        self.tokens = min(self.max_tokens, self.tokens + 1)
+
+
+class DomainBackoff:
+    """Per-domain exponential backoff with jitter, reset by the next success."""
+
+    def __init__(self, base_delay=1.0, max_delay=60.0, rng=None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+        self.failures = {}
+
+    def failure(self, domain):
+        """Record a failure and return the delay before the retry."""
+        failures = self.failures.get(domain, 0) + 1
+        self.failures[domain] = failures
+        delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        # "Equal jitter": at least half the delay, so retries of one domain still spread out.
+        return delay / 2 + self.rng.uniform(0, delay / 2)
+
+    def success(self, domain):
+        self.failures.pop(domain, None)
+
+
+class AdaptiveRetryMiddleware:
+    """
+    Downloader middleware replacing Scrapy's RetryMiddleware with decisions
+    based on the error taxonomy:
+
+    - permanent failures (404, 410...) are never retried
+    - retryable responses and the network errors of RETRY_EXCEPTIONS are
+      retried after a per-domain exponential backoff with jitter, honouring
+      Retry-After; other exceptions (IgnoreRequest, offsite drops,
+      NotSupported...) are left to the rest of the chain
+    - on 403/429 the retry excludes the proxy provider that served it, so the
+      proxy middleware picks another one
+    - a global `RetryBudget` bounds the total number of retries
+
+    A retry leaves the downloader at once and is put back in the scheduler
+    when its backoff is over, so waiting retries don't hold download slots;
+    the request itself ends with `RetryScheduled`, and the spider is kept
+    open until its pending retries are scheduled.
+
+    Each decision is recorded with `ErrorManager.log_event` (the spider's
+    manager if it has one) and counted in the crawl stats under
+    ``retry/adaptive/``.
+    """
+
+    def __init__(self, crawler, error_manager=None, max_retry_times=3, backoff=None, budget=None,
+                 retry_codes=(), permanent_codes=(), switch_provider_codes=(), exceptions_to_retry=(), registry=None):
+        self.crawler = crawler
+        # Classifies statuses and exceptions into error codes for the event log.
+        self.registry = registry or ErrorRegistry()
+        self.stats = crawler.stats
+        self.error_manager = error_manager
+        self.max_retry_times = max_retry_times
+        self.backoff = backoff or DomainBackoff()
+        self.budget = budget or RetryBudget()
+        self.retry_codes = set(retry_codes)
+        self.permanent_codes = set(permanent_codes)
+        self.switch_provider_codes = set(switch_provider_codes)
+        self.exceptions_to_retry = tuple(exceptions_to_retry)
+        self.max_delay = self.backoff.max_delay
+        # The reactor, unless a test clock replaces it.
+        self.clock = None
+        self.pending = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_RETRY_ENABLED", True):
+            raise NotConfigured
+        middleware = cls(
+            crawler,
+            max_retry_times=settings.getint("ADAPTIVE_RETRY_TIMES", 3),
+            backoff=DomainBackoff(
+                base_delay=settings.getfloat("ADAPTIVE_RETRY_BASE_DELAY", 1.0),
+                max_delay=settings.getfloat("ADAPTIVE_RETRY_MAX_DELAY", 60.0),
+            ),
+            budget=RetryBudget(
+                ratio=settings.getfloat("ADAPTIVE_RETRY_BUDGET_RATIO", 0.2),
+                min_tokens=settings.getint("ADAPTIVE_RETRY_BUDGET_MIN", 10),
+                max_tokens=settings.getint("ADAPTIVE_RETRY_BUDGET_MAX", 100),
+            ),
+            retry_codes=settings.getlist("ADAPTIVE_RETRY_HTTP_CODES", [408, 429, 500, 502, 503, 504, 522, 524, 403]),
+            permanent_codes=settings.getlist("ADAPTIVE_RETRY_PERMANENT_HTTP_CODES", [400, 401, 404, 405, 410, 451]),
+            switch_provider_codes=settings.getlist("ADAPTIVE_RETRY_SWITCH_PROVIDER_CODES", [403, 429]),
+            exceptions_to_retry=[load_object(path) if isinstance(path, str) else path
+                                 for path in settings.getlist("RETRY_EXCEPTIONS")],
+            registry=ErrorRegistry.from_settings(settings),
+        )
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def manager(self, spider):
+        manager = getattr(spider, "error_manager", None)
+        if manager is not None:
+            return manager
+        if self.error_manager is None:
+            self.error_manager = ErrorManager.from_settings(self.crawler.settings)
+        return self.error_manager
+
+    def spider_idle(self, spider):
+        if self.pending:
+            raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        for call in self.pending:
+            if call.active():
+                call.cancel()
+        self.pending.clear()
+        if self.error_manager is not None:
+            self.error_manager.close()
+
+    def process_response(self, request, response, spider):
+        status = response.status
+        if not request.meta.get("retry_times"):
+            self.budget.deposit()
+        if status not in self.retry_codes or request.meta.get("dont_retry", False):
+            if status < 400:
+                self.backoff.success(urlparse(request.url).hostname)
+            if status in self.permanent_codes:
+                self.record(spider, "give_up", request, self.registry.for_status(status).code, status, reason="permanent")
+            return response
+        retry_after = self.retry_after(response)
+        self.retry(request, spider, self.registry.for_status(status).code, status, response_status_message(status),
+                   switch_provider=status in self.switch_provider_codes, retry_after=retry_after)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, self.exceptions_to_retry):
+            return None
+        if not request.meta.get("retry_times"):
+            self.budget.deposit()
+        if request.meta.get("dont_retry", False):
+            return None
+        code = self.registry.for_exception(type(exception)).code
+        self.retry(request, spider, code, type(exception).__name__, exception)
+        return None
+
+    def retry(self, request, spider, code, cause, reason, switch_provider=False, retry_after=None):
+        """
+        Schedule the retry request after its backoff and raise RetryScheduled,
+        or return None to give up.
+        """
+        if not self.budget.withdraw():
+            self.record(spider, "give_up", request, code, cause, reason="budget_exhausted")
+            return None
+        max_retry_times = request.meta.get("max_retry_times", self.max_retry_times)
+        retry_request = get_retry_request(request, spider=spider, reason=reason,
+                                          max_retry_times=max_retry_times, stats_base_key="retry/adaptive")
+        if retry_request is None:
+            # Not retried after all: give the token back.
+            self.budget.refund()
+            self.record(spider, "give_up", request, code, cause, reason="max_retries")
+            return None
+
+        provider = request.meta.get("proxy_provider")
+        if switch_provider and provider:
+            retry_request.meta["proxy_exclude"] = list(request.meta.get("proxy_exclude", ())) + [provider]
+        delay = self.backoff.failure(urlparse(request.url).hostname)
+        if retry_after is not None:
+            delay = min(max(delay, retry_after), self.max_delay)
+        self.record(spider, "retry", retry_request, code, cause, delay=round(delay, 3),
+                    excluded_providers=retry_request.meta.get("proxy_exclude"))
+
+        clock = self.clock
+        if clock is None:
+            from twisted.internet import reactor as clock
+        call = clock.callLater(delay, self.schedule, retry_request)
+        self.pending.add(call)
+        raise RetryScheduled(f"Retrying in {delay:.3f}s")
+
+    def schedule(self, request):
+        self.pending.difference_update([call for call in self.pending if not call.active()])
+        self.crawler.engine.crawl(request)
+
+    @staticmethod
+    def retry_after(response):
+        """Seconds from a numeric Retry-After header, if any."""
+        value = response.headers.get(b"Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def record(self, spider, decision, request, code, cause, **fields):
+        self.stats.inc_value(f"retry/adaptive/{decision}")
+        self.manager(spider).log_event(
+            decision, spider.name, request.url,
+            error_code=code,
+            cause=cause,
+            retry_times=request.meta.get("retry_times", 0),
+            proxy_provider=request.meta.get("proxy_provider"),
+            **fields,
+        )
@@ -0,0 +1,199 @@
+import os
+import json
+import zlib
+import filecmp
+import datetime
+from collections import Counter
+from urllib.parse import urlparse
+
+from logs.error_store import entry_count, entry_domain
+from logs.error_handler import store_from_settings
+
+URLS_FILE = "urls.txt"
+STATS_FILE = "stats.json"
+SUMMARY_FILE = "summary.json"
+# Per shard: how many of its error entries are already in the main store.
+MERGED_FILE = "merged.json"
+MERGE_BATCH_SIZE = 1000
+
+# Per-shard output files, relative to the shard directory.
+SHARD_FILE_SETTINGS = {
+    "ERROR_LOG_FILE": "errors.jsonl",
+    "ERROR_SQLITE_FILE": "errors.db",
+    "ERROR_LOG_LEGACY_FILE": "errors.json",
+    "SIGNAL_LOG_FILE": "signals.log",
+    "EVENT_LOG_FILE": "events.jsonl",
+    "METRICS_SNAPSHOT_FILE": "metrics.json",
+    "URL_SOURCE_CHECKPOINT_FILE": "url_source.checkpoint.json",
+    "CRAWL_CHECKPOINT_FILE": "crawl.checkpoint.db",
+    "REPLAY_CHECKPOINT_FILE": "replay.checkpoint.db",
+    "LOG_FILE": "scrapy.log",
+    # None: keep the configured file name (its extension picks the export format).
+    "ITEM_EXPORT_FILE": None,
+}
+# Settings left unset when they are empty (the output is disabled).
+OPTIONAL_FILE_SETTINGS = ("LOG_FILE", "ITEM_EXPORT_FILE", "CRAWL_CHECKPOINT_FILE", "REPLAY_CHECKPOINT_FILE")
+
+
+def shard_for(url, shards):
+    """Shard index of `url`, by a stable hash of its domain so a domain is never split."""
+    domain = (urlparse(url).hostname or "").lower()
+    return zlib.crc32(domain.encode("utf-8")) % shards
+
+
+def shard_dirs(run_dir, shards):
+    return [os.path.join(run_dir, f"shard-{index:02d}") for index in range(shards)]
+
+
+def split_urls(urls, shards, run_dir):
+    """
+    Stream `urls` into one URL file per shard under `run_dir`. Returns the
+    shard directories and the number of URLs written to each.
+
+    A shard file whose content is unchanged (a resumed run) is left as it
+    is, so the shard's URL source checkpoint still matches it.
+    """
+    dirs = shard_dirs(run_dir, shards)
+    counts = [0] * shards
+    files = []
+    try:
+        for shard_dir in dirs:
+            os.makedirs(shard_dir, exist_ok=True)
+            files.append(open(os.path.join(shard_dir, URLS_FILE + ".tmp"), "w", encoding="utf-8"))
+        for url in urls:
+            index = shard_for(url, shards)
+            files[index].write(url + "\n")
+            counts[index] += 1
+    finally:
+        for f in files:
+            f.close()
+    for shard_dir in dirs:
+        path = os.path.join(shard_dir, URLS_FILE)
+        if os.path.exists(path) and filecmp.cmp(path + ".tmp", path, shallow=False):
+            os.remove(path + ".tmp")
+        else:
+            os.replace(path + ".tmp", path)
+    return dirs, counts
+
+
+def shard_file_settings(settings, shard_dir):
+    """Every per-run output file of `settings`, moved into `shard_dir`."""
+    files = {}
+    for name, filename in SHARD_FILE_SETTINGS.items():
+        if name in OPTIONAL_FILE_SETTINGS and not settings.get(name):
+            continue
+        files[name] = os.path.join(shard_dir, filename or os.path.basename(settings.get(name)))
+    return files
+
+
+def apply_shard_settings(settings, shard_dir):
+    """Point every per-run output file of `settings` into `shard_dir`."""
+    for name, path in shard_file_settings(settings, shard_dir).items():
+        settings.set(name, path, priority="cmdline")
+
+
+def write_stats(path, stats):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, default=str)
+
+
+def merge_stats(all_stats):
+    """
+    Combine crawler stats from several shards: counters are summed, start
+    times take the earliest value, and finish times, durations and
+    maximums (memory, depth) the largest.
+    """
+    merged = {}
+    for stats in all_stats:
+        for key, value in stats.items():
+            if key not in merged:
+                merged[key] = value
+            elif key == "start_time":
+                merged[key] = min(merged[key], value)
+            elif key in ("finish_time", "elapsed_time_seconds") or key.endswith("max") or key.startswith("memusage/"):
+                merged[key] = max(merged[key], value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] += value
+    return merged
+
+
+def read_merged(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("entries", 0)
+
+
+def write_merged(path, entries):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"entries": entries}, f)
+    os.replace(tmp_path, path)
+
+
+def merge_shards(dirs, settings, exit_codes=None, url_counts=None):
+    """
+    Append every shard's error entries to the store configured in
+    `settings` and build one summary of errors and crawl stats for the run.
+
+    Each shard's MERGED_FILE records how many of its entries were appended,
+    so merging again after a resumed run only appends the new ones; the
+    summary still counts them all.
+    """
+    target = store_from_settings(settings)
+    by_code, by_domain = Counter(), Counter()
+    shards, all_stats = [], []
+    try:
+        for index, shard_dir in enumerate(dirs):
+            shard_settings = settings.copy()
+            apply_shard_settings(shard_settings, shard_dir)
+            store = store_from_settings(shard_settings)
+            merged_path = os.path.join(shard_dir, MERGED_FILE)
+            merged = read_merged(merged_path)
+            errors, entries, batch = 0, 0, []
+            try:
+                for entry in store.iter_entries():
+                    count = entry_count(entry)
+                    errors += count
+                    by_code[str(entry.get("error_code"))] += count
+                    by_domain[entry_domain(entry) or "unknown"] += count
+                    entries += 1
+                    if entries <= merged:
+                        continue
+                    batch.append(entry)
+                    if len(batch) >= MERGE_BATCH_SIZE:
+                        target.append_many(batch)
+                        batch = []
+                target.append_many(batch)
+            finally:
+                store.close()
+            write_merged(merged_path, entries)
+
+            stats_path = os.path.join(shard_dir, STATS_FILE)
+            stats = {}
+            if os.path.exists(stats_path):
+                with open(stats_path, encoding="utf-8") as f:
+                    stats = json.load(f)
+                all_stats.append(stats)
+            shards.append({
+                "shard": index,
+                "dir": shard_dir,
+                "urls": url_counts[index] if url_counts else None,
+                "exit_code": exit_codes[index] if exit_codes else None,
+                "errors": errors,
+                "items": stats.get("item_scraped_count", 0),
+                "finish_reason": stats.get("finish_reason"),
+            })
+    finally:
+        target.close()
+
+    return {
+        "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "shards": shards,
+        "errors": {
+            "total": sum(by_code.values()),
+            "by_code": dict(by_code.most_common()),
+            "by_domain": dict(by_domain.most_common(50)),
+        },
+        "stats": merge_stats(all_stats),
+    }
@@ -1,19 +1,131 @@
 import scrapy
+from parsel import Selector
+from scrapy.settings import Settings
 from scrapy.exceptions import CloseSpider
+from errors.checkpoint import CrawlCheckpoint
 from errors.items import ErrorsItem
+from errors.extraction import CardExtractor, PageExtractor
+from errors.parse_pool import ParsePool
+from errors.replay import FailedUrlReplay
+from errors.retry import RetryScheduled
+from errors.url_source import UrlSource
 from logs.error_handler import ErrorManager 
 
+# Selectors are compiled once at import time and reused for every page.
+PRODUCT_CARDS = CardExtractor(".puis-card-border", {
+    "name": ".a-color-base.a-text-normal>span::text",
+    "price": ".a-price-whole::text",
+    "stars": ".a-icon-star-small .a-icon-alt::text",
+    "No_of_reviews": ".a-size-base.s-underline-text::text",
+})
+PAGINATION = PageExtractor({
+    "next_page": ".s-pagination-next::attr(href)",
+    "last_page": ".s-pagination-next[aria-disabled='true']",
+})
+REQUIRED_FIELDS = ("name", "price", "stars")
+
+
+def extract_page(root):
+    """
+    Card extraction, required-field validation and pagination for one search
+    page. Returns only plain data so it can run in a parse worker process.
+    """
+    products, missing = [], 0
+    for fields in PRODUCT_CARDS.extract(root):
+        if not all(fields[name] for name in REQUIRED_FIELDS):
+            missing += 1
+            continue
+        products.append(fields)
+    next_page = PAGINATION.get(root, "next_page")
+    return {
+        "products": products,
+        "missing": missing,
+        "next_page": next_page,
+        "last_page": not next_page and PAGINATION.get(root, "last_page") is not None,
+    }
+
+
+def extract_page_text(text):
+    """`extract_page` for a decoded HTML body; the entry point used by parse workers."""
+    return extract_page(Selector(text=text, type="html"))
+
+
 class ErrorSpider(scrapy.Spider):
     name = "error"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, error_manager=None, parse_pool=None, checkpoint=None, **kwargs):
         super(ErrorSpider, self).__init__(*args, **kwargs)
-        self.error_manager = ErrorManager()
-        
+        self.error_manager = error_manager or ErrorManager()
+        self.parse_pool = parse_pool
+        self.checkpoint = checkpoint
+        self.url_source = None
+        self.replay_source = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        kwargs.setdefault('error_manager', ErrorManager.from_settings(crawler.settings))
+        kwargs.setdefault('parse_pool', ParsePool.from_settings(crawler.settings))
+        # A replay keeps its own checkpoint, so it neither resumes nor resets the crawl's.
+        path_setting = 'REPLAY_CHECKPOINT_FILE' if kwargs.get('replay') else 'CRAWL_CHECKPOINT_FILE'
+        kwargs.setdefault('checkpoint', CrawlCheckpoint.from_settings(crawler.settings, path_setting))
+        return super(ErrorSpider, cls).from_crawler(crawler, *args, **kwargs)
+
+    def closed(self, reason):
+        """Stop parse workers, checkpoint the URL source and the crawl, and flush queued error entries."""
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+        if self.url_source is not None:
+            # Kept for a resumed crawl; a finished one starts the source over next time.
+            self.url_source.close(finished=reason == 'finished')
+        if self.replay_source is not None:
+            self.replay_source.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close(reason)
+        self.error_manager.close()
+
     def start_requests(self):
-    # Check if the spider has been passed a 'urls' parameter.
-    # If so, assume it's a comma-separated string of URLs.
-        if hasattr(self, 'urls') and self.urls:
+        """
+        Start URLs come from the 'url_file' argument or from 'urls', a
+        comma-separated string. A URL file (plain, JSONL, .gz or '-' for
+        stdin) is read lazily as Scrapy asks for start requests, with
+        duplicates dropped and the position checkpointed (URL_SOURCE_*).
+
+        With the 'replay' argument, the start URLs are instead the failed
+        URLs in the crawl checkpoint (see `errors.replay`); it may be a dict of
+        filters (codes, spider, since, until), by default this spider's
+        failures with the REPLAY_CODES codes.
+
+        When resuming an interrupted crawl (CRAWL_CHECKPOINT_*), its pending
+        pages and retryable failures come first, and start URLs it already
+        handled are skipped.
+        """
+        resuming = self.checkpoint is not None and self.checkpoint.resuming
+        if self.checkpoint is not None:
+            # Lets a replay tell whose failures the checkpoint holds.
+            self.checkpoint.set_meta('spider', self.name)
+        if resuming:
+            resume_urls = self.checkpoint.resume_urls()
+            self.logger.info("Re-queuing %d unfinished URLs from the crawl checkpoint", len(resume_urls))
+            for url, pagination in resume_urls:
+                yield self.make_request(url, pagination)
+
+        settings = getattr(self, 'settings', None) or Settings()
+        if getattr(self, 'replay', None):
+            filters = dict(self.replay) if isinstance(self.replay, dict) else {}
+            filters.setdefault('spider', self.name)
+            self.replay_source = FailedUrlReplay.from_settings(settings, **filters)
+            for url, meta in self.replay_source:
+                if not (resuming and self.checkpoint.seen(url)):
+                    yield self.make_request(url, meta=meta)
+            return
+
+        if getattr(self, 'url_file', None):
+            self.url_source = UrlSource.from_settings(self.url_file, settings)
+            if self.checkpoint is not None:
+                # The crawl checkpoint must hold every URL read before the source's position is saved.
+                self.url_source.on_checkpoint = self.checkpoint.flush
+            urls = self.url_source
+        elif hasattr(self, 'urls') and self.urls:
             urls = self.urls.split(',')
         else:
             # Fallback to a default list (currently empty or any hardcoded values)
@@ -22,65 +134,92 @@ class ErrorSpider(scrapy.Spider):
             ]
         
         for url in urls:
-            yield scrapy.Request(
-                url=url,
-                callback=self.parse,                
-                errback=lambda failure: self.error_manager.handle_request_failure(failure, self.name),
-                meta={'proxy': proxy} 
-            )
+            if resuming and self.checkpoint.seen(url):
+                continue
+            yield self.make_request(url)
+
+    def make_request(self, url, pagination=False, meta=None):
+        """A request for a start URL or a next page, recorded as pending in the crawl checkpoint."""
+        if self.checkpoint is not None:
+            self.checkpoint.queued(url, pagination)
+        # The proxy is chosen per request by the proxy middleware.
+        meta = dict(meta or (), checkpoint_url=url)
+        if pagination:
+            meta['pagination'] = True  # Mark this as a pagination request
+        return scrapy.Request(url=url, callback=self.parse, errback=self.request_failed, meta=meta)
+
+    def request_failed(self, failure):
+        if failure.check(RetryScheduled):
+            # Not failed: the retry middleware schedules it again after its backoff.
+            return
+        error_type = self.error_manager.handle_request_failure(failure, self.name)
+        if self.checkpoint is not None:
+            response = getattr(failure.value, 'response', None)
+            self.checkpoint.failed(self.checkpoint_url(failure.request), error_type.code,
+                                   response.status if response is not None else None)
+
+    @staticmethod
+    def checkpoint_url(request):
+        # The URL as first requested, which redirects don't change.
+        return request.meta.get('checkpoint_url', request.url)
 
 
     def parse(self, response):
-        """Parses the response and extracts product details."""
-        self.logger.info('IP address: %s' % response.text)
+        """
+        Parses the response and extracts product details. With a parse pool
+        the extraction runs in a worker process and this returns a Deferred
+        that fires with the items and requests.
+        """
+        self.logger.debug('Response from %s (%d bytes)', response.url, len(response.body))
         if not self.error_manager.check_response_status(response, self.name):
+            if self.checkpoint is not None:
+                self.checkpoint.failed(self.checkpoint_url(response.request),
+                                       self.error_manager.registry.for_status(response.status).code, response.status)
             raise CloseSpider(f"{response.status} Response")
-        
+        self.logger.info(f"Crawling: {response.url}")
+
+        if self.parse_pool is not None:
+            d = self.parse_pool.submit(extract_page_text, response.text)
+            # handle_page is iterated by Scrapy, so the page is marked done after its items are exported.
+            d.addCallbacks(
+                lambda page: self.handle_page(response, page),
+                lambda failure: self.handle_page_failure(response, failure.value),
+            )
+            return d
+
         try:
-            self.logger.info(f"Crawling: {response.url}")
-            items_found = False
-            for sel in response.css(".puis-card-border"):
-                item = ErrorsItem()
-                name = sel.css(".a-color-base.a-text-normal>span::text").get()
-                price = sel.css(".a-price-whole::text").get()
-                stars = sel.css(".a-icon-star-small .a-icon-alt::text").get()
-                No_of_reviews = sel.css(".a-size-base.s-underline-text::text").get()
-                if not name or not price or not stars:
-                    
-                    self.error_manager.log_missing_required_data(response, self.name)
-                    continue  
-                item['name'] = name
-                item['price'] = price
-                item['stars'] = stars
-                item['No_of_reviews'] = No_of_reviews
-                items_found = True
-                yield item
-
-            if not items_found:
-               
-                self.error_manager.log_no_items_found(response, self.name)
+            page = extract_page(response)
         except Exception as e:
-            self.error_manager.log_parsing_error(
-                response,
-                 {str(e)},
-                self.name
-            )
+            return self.handle_page_failure(response, e)
+        return self.handle_page(response, page)
+
+    def handle_page(self, response, page):
+        """Logs validation errors and yields the items and next-page request of an extracted page."""
+        for _ in range(page["missing"]):
+            self.error_manager.log_missing_required_data(response, self.name)
+        for fields in page["products"]:
+            yield ErrorsItem(fields, url=response.url)
+        if not page["products"]:
+            self.error_manager.log_no_items_found(response, self.name)
 
         # Pagination Handling
-        next_page = response.css(".s-pagination-next::attr(href)").get()
+        next_page = page["next_page"]
         if next_page:
             try:
                 next_page_url = response.urljoin(next_page)
-                yield scrapy.Request(
-                    url=next_page_url,
-                    callback=self.parse,
-                    errback=lambda failure: self.error_manager.handle_request_failure(failure, self.name),
-                    meta={'pagination': True}  # Mark this as a pagination request
-                )
+                yield self.make_request(next_page_url, pagination=True)
             except Exception as e:
                 self.error_manager.log_pagination_error(response,self.name)
-        else:
-               
-            is_last_page = response.css(".s-pagination-next[aria-disabled='true']")
-            if not is_last_page:
-                self.error_manager.log_pagination_error_1(response,self.name)
+        elif not page["last_page"]:
+            self.error_manager.log_pagination_error_1(response,self.name)
+        # Done only once the next page is in the frontier.
+        self.page_done(response)
+
+    def handle_page_failure(self, response, error):
+        self.error_manager.log_parsing_error(response, str(error), self.name)
+        self.page_done(response)
+        return []
+
+    def page_done(self, response):
+        if self.checkpoint is not None:
+            self.checkpoint.done(self.checkpoint_url(response.request))
@@ -0,0 +1,209 @@
+import logging
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.signalmanager import SignalManager
+from twisted.internet import task
+
+from logs.error_handler import ErrorManager
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean "slow down": server errors and rate limiting.
+THROTTLE_ERROR_STATUSES = frozenset({429, 500, 502, 503, 504, 520, 521, 522, 523, 524})
+
+
+class DomainThrottle:
+    """
+    Closed-loop concurrency and delay for one download slot (normally one
+    domain), adjusted once per window from the window's error rate and
+    latency, AIMD style:
+
+    - error rate above `high_error_rate` (5xx, 429, network failures):
+      halve concurrency and double the delay
+    - error rate below `low_error_rate` and latency within
+      `latency_tolerance` of the best seen: first remove the delay step by
+      step, then add one concurrent request
+    - anything in between: hold
+    """
+
+    def __init__(self, concurrency, delay, min_concurrency=1, max_concurrency=32, min_delay=0.0, max_delay=60.0,
+                 high_error_rate=0.1, low_error_rate=0.02, latency_tolerance=2.0, min_samples=10):
+        self.concurrency = concurrency
+        self.delay = delay
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.high_error_rate = high_error_rate
+        self.low_error_rate = low_error_rate
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.baseline_latency = None
+        self.reset_window()
+
+    def reset_window(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+    def record(self, error, latency=None):
+        self.requests += 1
+        if error:
+            self.errors += 1
+        if latency is not None:
+            self.latency_total += latency
+            self.latency_count += 1
+
+    def adjust(self):
+        """
+        Close the current window and update concurrency and delay. Returns
+        ``(decision, error_rate, latency)`` where decision is ``decrease``,
+        ``increase``, ``hold`` or None when the window had too few samples.
+        """
+        if self.requests < self.min_samples:
+            return None, None, None
+        error_rate = self.errors / self.requests
+        latency = self.latency_total / self.latency_count if self.latency_count else None
+        self.reset_window()
+
+        if error_rate > self.high_error_rate:
+            self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay, 0.25))
+            return "decrease", error_rate, latency
+
+        if latency is not None and error_rate <= self.low_error_rate:
+            if self.baseline_latency is None or latency < self.baseline_latency:
+                self.baseline_latency = latency
+        # No baseline yet (no quiet window so far): latency can't be judged.
+        latency_ok = latency is None or self.baseline_latency is None or latency <= self.baseline_latency * self.latency_tolerance
+        if error_rate <= self.low_error_rate and latency_ok:
+            if self.delay > self.min_delay:
+                self.delay = max(self.min_delay, self.delay / 2 if self.delay > 0.25 else 0.0)
+                return "increase", error_rate, latency
+            if self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                return "increase", error_rate, latency
+        return "hold", error_rate, latency
+
+
+class AdaptiveThrottleExtension:
+    """
+    Tunes per-domain download concurrency and delay from the crawl's own
+    error signals, in place of Scrapy's AutoThrottle.
+
+    Like ErrorLoggingExtension it listens to the crawler's signals: every
+    downloaded response and every request that leaves the downloader
+    without one (a network failure) is counted against its download slot.
+    Every ADAPTIVE_THROTTLE_INTERVAL seconds each slot's `DomainThrottle`
+    is adjusted and the result applied to the downloader slot. Changes are
+    recorded as ``throttle`` events in the event log.
+    """
+
+    def __init__(self, crawler, interval=5.0, throttle_options=None):
+        self.crawler = crawler
+        self.interval = interval
+        self.throttle_options = throttle_options or {}
+        self.start_concurrency = crawler.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN", 8)
+        self.start_delay = crawler.settings.getfloat("DOWNLOAD_DELAY", 0.0)
+        self.throttles = {}
+        self.error_manager = None
+        self.own_error_manager = None
+        self.adjust_task = None
+        # Requests that got a response, until they leave the downloader.
+        self._responded = set()
+        self.connect_signals()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_THROTTLE_ENABLED", False):
+            raise NotConfigured
+        if settings.getbool("AUTOTHROTTLE_ENABLED"):
+            logger.warning("AUTOTHROTTLE_ENABLED is set; AutoThrottle and ADAPTIVE_THROTTLE will fight over download delays")
+        start_delay = settings.getfloat("DOWNLOAD_DELAY", 0.0)
+        return cls(
+            crawler,
+            interval=settings.getfloat("ADAPTIVE_THROTTLE_INTERVAL", 5.0),
+            throttle_options={
+                "min_concurrency": settings.getint("ADAPTIVE_THROTTLE_MIN_CONCURRENCY", 1),
+                "max_concurrency": settings.getint("ADAPTIVE_THROTTLE_MAX_CONCURRENCY", 32),
+                "min_delay": settings.getfloat("ADAPTIVE_THROTTLE_MIN_DELAY", start_delay),
+                "max_delay": settings.getfloat("ADAPTIVE_THROTTLE_MAX_DELAY", 60.0),
+                "high_error_rate": settings.getfloat("ADAPTIVE_THROTTLE_HIGH_ERROR_RATE", 0.1),
+                "low_error_rate": settings.getfloat("ADAPTIVE_THROTTLE_LOW_ERROR_RATE", 0.02),
+                "latency_tolerance": settings.getfloat("ADAPTIVE_THROTTLE_LATENCY_TOLERANCE", 2.0),
+                "min_samples": settings.getint("ADAPTIVE_THROTTLE_MIN_SAMPLES", 10),
+            },
+        )
+
+    def connect_signals(self):
+        signal_manager = SignalManager(self.crawler)
+        signal_manager.connect(self.spider_opened_handler, signal=signals.spider_opened)
+        signal_manager.connect(self.spider_closed_handler, signal=signals.spider_closed)
+        signal_manager.connect(self.response_downloaded_handler, signal=signals.response_downloaded)
+        signal_manager.connect(self.request_left_downloader_handler, signal=signals.request_left_downloader)
+
+    def spider_opened_handler(self, spider):
+        self.error_manager = getattr(spider, "error_manager", None)
+        if self.error_manager is None:
+            self.error_manager = self.own_error_manager = ErrorManager.from_settings(self.crawler.settings)
+        self.adjust_task = task.LoopingCall(self.adjust, spider)
+        self.adjust_task.start(self.interval, now=False)
+
+    def spider_closed_handler(self, spider, reason):
+        if self.adjust_task is not None and self.adjust_task.running:
+            self.adjust_task.stop()
+        if self.own_error_manager is not None:
+            self.own_error_manager.close()
+
+    def throttle_for(self, key):
+        throttle = self.throttles.get(key)
+        if throttle is None:
+            throttle = self.throttles[key] = DomainThrottle(self.start_concurrency, self.start_delay,
+                                                            **self.throttle_options)
+        return throttle
+
+    def response_downloaded_handler(self, response, request, spider):
+        self._responded.add(id(request))
+        key = request.meta.get("download_slot")
+        if key is None:
+            return
+        throttle = self.throttle_for(key)
+        throttle.record(response.status in THROTTLE_ERROR_STATUSES, request.meta.get("download_latency"))
+        self.apply(key, throttle)
+
+    def request_left_downloader_handler(self, request, spider):
+        if id(request) in self._responded:
+            self._responded.discard(id(request))
+            return
+        key = request.meta.get("download_slot")
+        if key is not None:
+            self.throttle_for(key).record(True)
+
+    def apply(self, key, throttle):
+        """Push the slot's target values to the downloader (slots are recreated after idling)."""
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None and (slot.concurrency != throttle.concurrency or slot.delay != throttle.delay):
+            slot.concurrency = throttle.concurrency
+            slot.delay = throttle.delay
+
+    def adjust(self, spider):
+        """Close the window of every slot and apply the new limits."""
+        for key, throttle in self.throttles.items():
+            before = (throttle.concurrency, throttle.delay)
+            decision, error_rate, latency = throttle.adjust()
+            if decision is None or (throttle.concurrency, throttle.delay) == before:
+                continue
+            self.apply(key, throttle)
+            self.crawler.stats.inc_value(f"throttle/{decision}")
+            self.error_manager.log_event(
+                "throttle", spider.name, None,
+                slot=key,
+                decision=decision,
+                error_rate=round(error_rate, 4),
+                latency=round(latency, 4) if latency is not None else None,
+                concurrency=throttle.concurrency,
+                delay=round(throttle.delay, 3),
+            )
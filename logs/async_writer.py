@@ -0,0 +1,150 @@
+import random
+import logging
+import threading
+from collections import deque
+
+from logs.rotation import RotatingFile
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_SAMPLE = "sample"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_SAMPLE)
+
+
+class BatchWriter:
+    """
+    Bounded in-memory queue drained by a background writer thread.
+
+    Producers call `put()` from the reactor thread and return immediately;
+    the writer thread hands items to `write_batch` in lists of up to
+    `batch_size`, as soon as a full batch is queued or `flush_interval`
+    seconds have passed. When the queue is full the overflow policy decides
+    what happens to new items:
+
+    - ``block``: wait for the writer to make room (nothing is lost)
+    - ``drop-oldest``: discard the oldest queued item
+    - ``sample``: keep roughly `sample_rate` of new items, each replacing
+      the oldest queued one, and discard the rest
+    """
+
+    def __init__(self, write_batch, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 overflow=OVERFLOW_BLOCK, sample_rate=0.1, name="batch-writer"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        self.write_batch = write_batch
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.dropped = 0
+
+        self._queue = deque()
+        self._pending = 0  # queued or being written
+        self._closing = False
+        self._flush_requested = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        """Queue an item for writing, applying the overflow policy if full."""
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("BatchWriter is closed")
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == OVERFLOW_BLOCK:
+                    while len(self._queue) >= self.max_queue and not self._closing:
+                        self._cond.wait()
+                    if self._closing:
+                        raise RuntimeError("BatchWriter is closed")
+                elif self.overflow == OVERFLOW_SAMPLE and random.random() >= self.sample_rate:
+                    self.dropped += 1
+                    return
+                else:
+                    self._queue.popleft()
+                    self._pending -= 1
+                    self.dropped += 1
+            self._queue.append(item)
+            self._pending += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self, timeout=None):
+        """Flush the queue and stop the writer thread."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self._queue) >= self.batch_size or self._flush_requested or self._closing,
+                timeout=self.flush_interval,
+            )
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not self._queue:
+                self._flush_requested = False
+            # Producers blocked on a full queue can continue now.
+            self._cond.notify_all()
+            return batch, self._closing and not self._queue
+
+    def _run(self):
+        while True:
+            batch, done = self._next_batch()
+            if batch:
+                try:
+                    self.write_batch(batch)
+                except Exception:
+                    logger.exception("Failed to write a batch of %d entries", len(batch))
+                with self._cond:
+                    self._pending -= len(batch)
+                    self._cond.notify_all()
+            if done:
+                return
+
+
+class BatchingFileHandler(logging.Handler):
+    """
+    Logging handler that formats records in the caller's thread and leaves
+    the file writes to a `BatchWriter`. The file rotates according to the
+    `rotation` options (see `logs.rotation.RotatingFile`).
+    """
+
+    def __init__(self, filename, rotation=None, **writer_kwargs):
+        super().__init__()
+        self.baseFilename = filename
+        self._stream = RotatingFile.for_path(filename, **(rotation or {}))
+        writer_kwargs.setdefault("name", "signal-log-writer")
+        self.writer = BatchWriter(self._write_lines, **writer_kwargs)
+
+    def _write_lines(self, lines):
+        self._stream.write("".join(lines))
+
+    def emit(self, record):
+        try:
+            self.writer.put(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        try:
+            self.writer.close()
+            self._stream.close()
+        finally:
+            super().close()
@@ -0,0 +1,194 @@
+"""
+The error taxonomy: every error type the project logs, defined once, and
+the tables that classify failures into them.
+
+An error type has a name (``request_failure``, ``no_items_found``...), a
+category, a subcategory, a numeric code and a message template. The
+subcategory and message are `str.format` templates filled from the values
+passed when the error is logged (``url``, ``status``, ``reason``,
+``spider``...).
+
+Failures are classified by dict lookups: exception class -> type name and
+HTTP status -> type name. An exception class not in the table is resolved
+once through its MRO and remembered, so each class costs one lookup
+after its first occurrence.
+
+Spiders add or override types, exception classes and statuses from
+settings, without touching this module::
+
+    ERROR_TYPES = {
+        'captcha': {'category': 'Crawling Error', 'subcategory': 'Captcha',
+                    'code': 1004, 'message': 'Captcha served for {url}'},
+    }
+    ERROR_EXCEPTION_TYPES = {'myproject.exceptions.CaptchaError': 'captcha'}
+    ERROR_STATUS_TYPES = {429: 'captcha'}
+"""
+import enum
+
+from scrapy.utils.misc import load_object
+
+
+class ErrorCategory(str, enum.Enum):
+    CRAWLING = "Crawling Error"
+    PARSING = "Parsing Error"
+    SYSTEM = "System Failure"
+
+    def __str__(self):
+        return self.value
+
+
+class ErrorCode(enum.IntEnum):
+    REQUEST_FAILURE = 1001
+    RESPONSE_ERROR = 1002
+    NETWORK_ERROR = 1003
+    MISSING_REQUIRED_DATA = 2001
+    NO_ITEMS_FOUND = 2002
+    PARSING_ERROR = 2003
+    INVALID_ITEM_DATA = 2004
+    SPIDER_ERROR = 3002
+    ITEM_DROPPED = 3003
+
+
+# name -> (category, subcategory, code, message)
+DEFAULT_ERROR_TYPES = {
+    "request_failure": (ErrorCategory.CRAWLING, "Request Failure", ErrorCode.REQUEST_FAILURE,
+                        "Request failed for {url}: {reason}"),
+    "response_error": (ErrorCategory.CRAWLING, "{status} Response Error", ErrorCode.RESPONSE_ERROR,
+                       "{status} response received from {url}"),
+    "bad_status": (ErrorCategory.CRAWLING, "{status} Response", ErrorCode.RESPONSE_ERROR,
+                   "{status} response received from {url}"),
+    "network_error": (ErrorCategory.CRAWLING, "RequestFailed - Network Error", ErrorCode.NETWORK_ERROR,
+                      "Request failed: {url}, Error: {reason}"),
+    "spider_not_found": (ErrorCategory.CRAWLING, "SpiderNotFound", ErrorCode.NETWORK_ERROR, "{reason}"),
+    "missing_required_data": (ErrorCategory.PARSING, "Missing Required Data", ErrorCode.MISSING_REQUIRED_DATA,
+                              "Missing required item data for URL: {url}"),
+    "no_items_found": (ErrorCategory.PARSING, "No Items Found", ErrorCode.NO_ITEMS_FOUND,
+                       "No items found on page: {url}"),
+    "parsing_error": (ErrorCategory.PARSING, "Unexpected Parsing Error", ErrorCode.PARSING_ERROR,
+                      "Error occurred while parsing: {reason}"),
+    "pagination_error": (ErrorCategory.PARSING, "Pagination Error", ErrorCode.PARSING_ERROR,
+                         "Failed to extract next page."),
+    "pagination_missing": (ErrorCategory.PARSING, "Missing Required Data - Pagination", ErrorCode.PARSING_ERROR,
+                           "Pagination element is missing but expected."),
+    "invalid_item_data": (ErrorCategory.PARSING, "Invalid Item Data", ErrorCode.INVALID_ITEM_DATA,
+                          "Invalid item data: {reason}"),
+    "spider_error": (ErrorCategory.SYSTEM, "SpiderError - Runtime Error", ErrorCode.SPIDER_ERROR,
+                     "Spider error in '{spider}': {reason}"),
+    "item_dropped": (ErrorCategory.SYSTEM, "ItemDropped - Validation Error", ErrorCode.ITEM_DROPPED,
+                     "Item dropped: {reason}. URL: {url}"),
+}
+
+# Exception classes (import paths, so settings can name them too) -> type name.
+# Anything else, network errors included, is a "request_failure" (1001).
+DEFAULT_EXCEPTION_TYPES = {
+    "scrapy.spidermiddlewares.httperror.HttpError": "response_error",
+}
+
+# Status -> type name; statuses not listed are "response_error".
+DEFAULT_STATUS_TYPES = {}
+
+
+class ErrorType:
+    """One entry of the taxonomy."""
+
+    __slots__ = ("name", "category", "subcategory", "code", "message")
+
+    def __init__(self, name, category, subcategory, code, message):
+        self.name = name
+        self.category = category
+        self.subcategory = subcategory
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return f"ErrorType({self.name!r}, {self.code})"
+
+    def format(self, values):
+        """``(subcategory, message)`` with the templates filled from `values`."""
+        values = _Values(values)
+        return self.subcategory.format_map(values), self.message.format_map(values)
+
+
+class _Values(dict):
+    # Fields a caller didn't supply stay visible in the output instead of raising.
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class ErrorRegistry:
+    """
+    The error types by name and the classification tables. Built from the
+    defaults above plus ERROR_TYPES, ERROR_EXCEPTION_TYPES and
+    ERROR_STATUS_TYPES (see `from_settings`).
+    """
+
+    def __init__(self, types=None, exception_types=None, status_types=None):
+        self.types = {}
+        for name, spec in DEFAULT_ERROR_TYPES.items():
+            self.types[name] = ErrorType(name, *spec)
+        for name, spec in (types or {}).items():
+            self.add_type(name, spec)
+
+        self.exceptions = {}
+        for path, name in {**DEFAULT_EXCEPTION_TYPES, **(exception_types or {})}.items():
+            self.exceptions[load_object(path) if isinstance(path, str) else path] = self[name]
+        self.statuses = {int(status): self[name] for status, name in {**DEFAULT_STATUS_TYPES, **(status_types or {})}.items()}
+        # Exception classes resolved through their MRO (or not at all), by class.
+        self._resolved = dict(self.exceptions)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            types=settings.getdict("ERROR_TYPES"),
+            exception_types=settings.getdict("ERROR_EXCEPTION_TYPES"),
+            status_types=settings.getdict("ERROR_STATUS_TYPES"),
+        )
+
+    def add_type(self, name, spec):
+        """Add or replace a type; `spec` is a dict (missing keys come from the type it replaces) or a tuple."""
+        if isinstance(spec, dict):
+            base = self.types.get(name)
+            fields = {key: getattr(base, key) for key in ErrorType.__slots__[1:]} if base else {}
+            fields.update(spec)
+            missing = {"category", "subcategory", "code", "message"} - fields.keys()
+            if missing:
+                raise ValueError(f"Error type {name!r} is missing {', '.join(sorted(missing))}")
+            spec = (fields["category"], fields["subcategory"], fields["code"], fields["message"])
+        category, subcategory, code, message = spec
+        self.types[name] = ErrorType(name, category, subcategory, int(code), message)
+
+    def __getitem__(self, name):
+        try:
+            return self.types[name]
+        except KeyError:
+            raise ValueError(f"Unknown error type {name!r}") from None
+
+    def __contains__(self, name):
+        return name in self.types
+
+    def for_exception(self, exception_class, default="request_failure"):
+        """The error type of an exception class (or of its closest registered base class)."""
+        error_type = self._resolved.get(exception_class, False)
+        if error_type is False:
+            error_type = next((self.exceptions[base] for base in exception_class.__mro__[1:]
+                               if base in self.exceptions), None)
+            self._resolved[exception_class] = error_type
+        return error_type or self.types[default]
+
+    def for_status(self, status):
+        """The error type of an HTTP error status."""
+        return self.statuses.get(status) or self.types["response_error"]
+
+    def classify_failure(self, failure, default="request_failure"):
+        """
+        ``(error_type, values)`` for a Twisted failure or an exception. HTTP
+        errors (exceptions carrying a response) are classified by status.
+        """
+        exception = getattr(failure, "value", failure)
+        error_type = self.for_exception(type(exception), default)
+        values = {"reason": failure.getErrorMessage() if hasattr(failure, "getErrorMessage") else str(exception)}
+        response = getattr(exception, "response", None) if error_type.code == ErrorCode.RESPONSE_ERROR else None
+        if response is not None:
+            error_type = self.for_status(response.status)
+            values.update(status=response.status, url=response.url)
+        return error_type, values
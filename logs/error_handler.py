@@ -1,167 +1,359 @@
-from http.client import HTTPResponse
-import os
-import json
+import time
+import random
 import logging
-import datetime
-from errors.proxy_manager import perform_proxy_operation
-from urllib import response
-import pytz # type: ignore
+from urllib.parse import urlparse
+from logs.error_codes import ErrorRegistry
+from logs.error_store import DEFAULT_TIMEZONE, ErrorStore, migrate_legacy_log, zone_converter
+from logs.records import ErrorRecord
+from logs.sqlite_store import SqliteErrorStore
+from logs.async_writer import BatchWriter, BatchingFileHandler
+from logs.rotation import SegmentedFileHandler, rotation_options
+
+
+class ErrorAggregator:
+    """
+    Collapses bursts of near-identical errors into summary records.
+
+    Errors are grouped by (category, subcategory, code, spider, domain)
+    within a time window. When the window closes, a group seen only once
+    is emitted as its original entry; larger groups become one summary
+    record with a count, first/last seen timestamps and a reservoir sample
+    of at most `sample_size` URLs. Memory is bounded by the number of
+    distinct groups, and the window is closed early once `max_groups` is
+    reached.
+    """
+
+    def __init__(self, window=60.0, sample_size=10, max_groups=10000, clock=time.monotonic, rng=None):
+        self.window = window
+        self.sample_size = sample_size
+        self.max_groups = max_groups
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.groups = {}
+        self.window_start = clock()
+
+    def add(self, entry):
+        """Add an entry; returns the records to write now (those of a window that just closed)."""
+        closed = []
+        if self.clock() - self.window_start >= self.window or len(self.groups) >= self.max_groups:
+            closed = self.drain()
+
+        url = entry.get("url")
+        key = (
+            entry.get("error_category"),
+            entry.get("error_subcategory"),
+            entry.get("error_code"),
+            entry.get("spider"),
+            urlparse(url).hostname if url else None,
+        )
+        group = self.groups.get(key)
+        if group is None:
+            self.groups[key] = {
+                "entry": entry,
+                "count": 1,
+                "first_seen": entry.get("timestamp"),
+                "last_seen": entry.get("timestamp"),
+                "sample_urls": [url],
+            }
+            return closed
+
+        group["count"] += 1
+        group["last_seen"] = entry.get("timestamp")
+        # Reservoir sampling keeps a uniform sample of the group's URLs.
+        samples = group["sample_urls"]
+        if len(samples) < self.sample_size:
+            samples.append(url)
+        else:
+            slot = self.rng.randrange(group["count"])
+            if slot < self.sample_size:
+                samples[slot] = url
+        return closed
+
+    def drain(self):
+        """Close the current window and return its records."""
+        records = []
+        for (category, subcategory, code, spider, domain), group in self.groups.items():
+            if group["count"] == 1:
+                records.append(group["entry"])
+                continue
+            records.append({
+                "record_type": "summary",
+                "error_category": category,
+                "error_subcategory": subcategory,
+                "error_code": code,
+                "error_message": group["entry"].get("error_message"),
+                "spider": spider,
+                "domain": domain,
+                "count": group["count"],
+                "first_seen": group["first_seen"],
+                "last_seen": group["last_seen"],
+                "sample_urls": group["sample_urls"],
+                "timestamp": group["last_seen"],
+            })
+        self.groups = {}
+        self.window_start = self.clock()
+        return records
+
+
+def now_timestamp():
+    """
+    Current time as integer epoch milliseconds, the error log's timestamp
+    format. Time zones only come in when entries are displayed or exported
+    (see `logs.error_store.format_epoch`).
+    """
+    return time.time_ns() // 1_000_000
+
+
+def store_from_settings(settings):
+    """The error store selected by ERROR_STORE_BACKEND, at its configured path."""
+    if settings.get('ERROR_STORE_BACKEND', 'jsonl') == 'sqlite':
+        return SqliteErrorStore(settings.get('ERROR_SQLITE_FILE', 'logs/errors.db'))
+    return ErrorStore(settings.get('ERROR_LOG_FILE', 'logs/errors.jsonl'), rotation_options(settings))
+
 
 class ErrorManager:
     """Centralizes error management, including logging and error checking."""
     
-    def __init__(self, log_file="logs/errors.json",signal_log_file="logs/signals.log"):
+    def __init__(self, log_file="logs/errors.jsonl",signal_log_file="logs/signals.log",
+                 legacy_log_file="logs/errors.json", async_writes=False, writer_options=None,
+                 aggregator=None, store=None, rotation=None, event_log_file="logs/events.jsonl",
+                 timezone=DEFAULT_TIMEZONE, registry=None):
         self.log_file = log_file
-        self.ensure_error_log_file()
+        # Error types and failure classification (see logs.error_codes).
+        self.registry = registry or ErrorRegistry()
+        # Display zone of the signal log; error entries store zone-free epoch times.
+        self.timezone = timezone
+        self.rotation = rotation or {}
+        self.store = store or ErrorStore(self.log_file, self.rotation)
+        migrate_legacy_log(legacy_log_file, self.store)
         self.signal_log_file = signal_log_file
+        self.aggregator = aggregator
+        # Structured decision events (retries, give-ups...) are kept apart from errors.
+        self.event_store = ErrorStore(event_log_file, self.rotation)
+
+        # With async_writes, entries are queued and written in batches by a
+        # background thread instead of hitting the disk in the reactor thread.
+        writer_options = writer_options or {}
+        self.error_writer = None
+        self.event_writer = None
+        if async_writes:
+            self.error_writer = BatchWriter(self.store.append_many, name="error-log-writer", **writer_options)
+            self.event_writer = BatchWriter(self.event_store.append_many, name="event-log-writer", **writer_options)
         
         self.signal_logger = logging.getLogger("signals.log")
         self.signal_logger.setLevel(logging.INFO)
-        if not self.signal_logger.handlers:
-            signal_handler = logging.FileHandler(self.signal_log_file)
-            signal_handler.setLevel(logging.INFO)
-            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            signal_handler.setFormatter(self.get_log_formatter())
-            self.signal_logger.addHandler(signal_handler)
+        self.install_signal_handler(async_writes, writer_options)
 
+    def install_signal_handler(self, async_writes, writer_options):
+        """
+        Attach the file handler for the shared signal logger. An async
+        manager replaces the synchronous handler installed by an earlier,
+        synchronous ErrorManager.
+        """
+        handlers = self.signal_logger.handlers
+        if async_writes:
+            if any(isinstance(h, BatchingFileHandler) for h in handlers):
+                return
+            for handler in list(handlers):
+                self.signal_logger.removeHandler(handler)
+                handler.close()
+            signal_handler = BatchingFileHandler(self.signal_log_file, self.rotation, **writer_options)
+        elif handlers:
+            return
+        else:
+            signal_handler = SegmentedFileHandler(self.signal_log_file, **self.rotation)
+        signal_handler.setLevel(logging.INFO)
+        signal_handler.setFormatter(self.get_log_formatter())
+        self.signal_logger.addHandler(signal_handler)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build an ErrorManager configured from Scrapy settings."""
+        aggregator = None
+        if settings.getfloat('ERROR_AGGREGATION_WINDOW', 0) > 0:
+            aggregator = ErrorAggregator(
+                window=settings.getfloat('ERROR_AGGREGATION_WINDOW'),
+                sample_size=settings.getint('ERROR_AGGREGATION_SAMPLE_SIZE', 10),
+                max_groups=settings.getint('ERROR_AGGREGATION_MAX_GROUPS', 10000),
+            )
+        return cls(
+            store=store_from_settings(settings),
+            log_file=settings.get('ERROR_LOG_FILE', 'logs/errors.jsonl'),
+            signal_log_file=settings.get('SIGNAL_LOG_FILE', 'logs/signals.log'),
+            legacy_log_file=settings.get('ERROR_LOG_LEGACY_FILE', 'logs/errors.json'),
+            event_log_file=settings.get('EVENT_LOG_FILE', 'logs/events.jsonl'),
+            async_writes=settings.getbool('ERROR_LOG_ASYNC', False),
+            writer_options={
+                'max_queue': settings.getint('ERROR_LOG_QUEUE_SIZE', 10000),
+                'batch_size': settings.getint('ERROR_LOG_BATCH_SIZE', 500),
+                'flush_interval': settings.getfloat('ERROR_LOG_FLUSH_INTERVAL', 1.0),
+                'overflow': settings.get('ERROR_LOG_OVERFLOW', 'block'),
+                'sample_rate': settings.getfloat('ERROR_LOG_SAMPLE_RATE', 0.1),
+            },
+            aggregator=aggregator,
+            rotation=rotation_options(settings),
+            timezone=settings.get('ERROR_LOG_TIMEZONE', DEFAULT_TIMEZONE),
+            registry=ErrorRegistry.from_settings(settings),
+        )
 
     def log_signal(self, message):
         """Logs general Scrapy process signals."""
         self.signal_logger.info(message)       
     
-    def ensure_error_log_file(self):
-        """Ensure the error log file exists."""
-        dir_name = os.path.dirname(self.log_file)
-        if not os.path.exists(dir_name):
-            os.makedirs(dir_name)
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, "w") as f:
-                json.dump([], f, indent=4)
-    
     def read_errors(self):
-        """Read the existing errors from the file."""
-        try:
-            with open(self.log_file, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
+        """Stream the logged errors without loading the whole file."""
+        return self.store.iter_entries()
+
+    def flush(self):
+        """Write out aggregated groups, queued error entries and signal log lines."""
+        if self.aggregator is not None:
+            self.write_entries(self.aggregator.drain())
+        if self.error_writer is not None:
+            self.error_writer.flush()
+        if self.event_writer is not None:
+            self.event_writer.flush()
+        for handler in self.signal_logger.handlers:
+            handler.flush()
+
+    def close(self):
+        """Flush pending writes and close the underlying error store."""
+        self.flush()
+        if self.error_writer is not None:
+            self.error_writer.close()
+            self.error_writer = None
+        if self.event_writer is not None:
+            self.event_writer.close()
+            self.event_writer = None
+        self.store.close()
+        self.event_store.close()
         
     def get_log_formatter(self):
-        """Custom formatter that uses Asia/Kolkata time zone."""
+        """Formatter showing record times, to the millisecond, in the manager's display time zone."""
         formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s', 
+            '%(asctime)s.%(msecs)03d - %(levelname)s - %(message)s', 
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
-        # Override the default time format to use Asia/Kolkata timezone
-        def custom_time(*args, **kwargs):
-            # Return the time in Asia/Kolkata time zone
-            return datetime.datetime.now(pytz.timezone('Asia/Kolkata')).timetuple()
-
-        # Set custom time function to the formatter
-        formatter.converter = custom_time
+        # The record's own creation time, shifted by an offset cached per hour
+        formatter.converter = zone_converter(self.timezone)
         return formatter    
     
+    def error_entry(self, category, subcategory, code, message, spider, url):
+        """Builds an error entry without writing it (see `log_errors`)."""
+        if not (url is None or isinstance(url, str)):
+            url = getattr(url, "url", str(url))
+        return ErrorRecord(category, subcategory, code, message, spider, url, now_timestamp())
+
+    def error_type_entry(self, name, spider, url=None, message=None, **values):
+        """
+        Builds the entry of a registered error type, its subcategory and
+        message filled from `values` (plus ``spider`` and ``url``). A given
+        `message` replaces the type's template.
+        """
+        if not (url is None or isinstance(url, str)):
+            url = getattr(url, "url", str(url))
+        error_type = self.registry[name]
+        subcategory, template_message = error_type.format({"spider": spider, "url": url, **values})
+        return ErrorRecord(error_type.category, subcategory, error_type.code, message or template_message,
+                           spider, url, now_timestamp())
+
+    def log_error_type(self, name, spider, url=None, message=None, **values):
+        """Logs an error of a registered type (see `error_type_entry`)."""
+        error_entry = self.error_type_entry(name, spider, url, message, **values)
+        if self.aggregator is not None:
+            self.write_entries(self.aggregator.add(error_entry))
+        else:
+            self.write_entries((error_entry,))
+
     def log_error(self, category, subcategory, code, message, spider, url):
-        """Logs an error to both a JSON file and a log file."""
-        error_entry = {
-            "error_category": category,
-            "error_subcategory": subcategory,
-            "error_code": code,
-            "error_message": message,
+        """Appends an error entry to the JSONL error store."""
+        error_entry = self.error_entry(category, subcategory, code, message, spider, url)
+        if self.aggregator is not None:
+            self.write_entries(self.aggregator.add(error_entry))
+        else:
+            self.write_entries((error_entry,))
+
+    def log_errors(self, entries):
+        """Writes a batch of entries built with `error_entry`."""
+        if self.aggregator is not None:
+            closed = []
+            for entry in entries:
+                closed.extend(self.aggregator.add(entry))
+            self.write_entries(closed)
+        else:
+            self.write_entries(entries)
+
+    def log_event(self, event, spider, url, **fields):
+        """Appends a structured event (e.g. a retry decision) to the event log."""
+        entry = {
+            "event": event,
             "spider": spider,
-            "url": url if isinstance(response, HTTPResponse) else str(response),
-            "timestamp": datetime.datetime.now(pytz.timezone('Asia/Kolkata')).strftime("%Y-%m-%d %H:%M:%S")
+            "url": url,
+            **fields,
+            "timestamp": now_timestamp(),
         }
-        errors = self.read_errors()
-        errors.append(error_entry)
-        with open(self.log_file, "a") as f:
-            
-            json.dump(error_entry, f, indent=4)
-            f.write("\n")  # Add newline for readability
-            
-        
+        if self.event_writer is not None:
+            self.event_writer.put(entry)
+        else:
+            self.event_store.append(entry)
+
+    def write_entries(self, entries):
+        """Hands finished records to the background writer, or appends them directly."""
+        if self.error_writer is not None:
+            for entry in entries:
+                self.error_writer.put(entry)
+        elif entries:
+            self.store.append_many(entries)
     
     def check_response_status(self, response, spider):
         """Checks if the response status is 200; if not, logs an error and returns False."""
         if response.status != 200:
-            category = "Crawling Error"
-            subcategory = f"{response.status} Response"
-            code = 1002
-            message = f"{response.status} response received from {response.url}"
-            self.log_error(category, subcategory, code, message, spider, response.url)
+            self.log_error_type("bad_status", spider, response.url, status=response.status)
             return False
         return True
     
-    def log_parsing_error(self, response, message, spider, code=2003, subcategory="Unexpected Parsing Error"):
+    def log_parsing_error(self, response, message, spider, code=None, subcategory=None):
         """Logs a parsing error."""
-        category = "Parsing Error"
-        message = f"Error occurred while parsing: {str(e)}"
-        self.log_error(category, subcategory, code, message, spider, response.url)
+        if code is None and subcategory is None:
+            self.log_error_type("parsing_error", spider, response.url, reason=message)
+            return
+        error_type = self.registry["parsing_error"]
+        _, message = error_type.format({"reason": message})
+        self.log_error(error_type.category, subcategory or error_type.subcategory, code or error_type.code,
+                       message, spider, response.url)
     
     def handle_request_failure(self, failure, spider):
-        """Handles request failures (HTTP errors, network errors) dynamically."""
-        request = failure.request
-        response = getattr(failure.value, 'response', None)
-        if response:
-            category = "Crawling Error"
-            subcategory = f"{response.status} Response Error"
-            code = 1002
-            message = f"{response.status} response received from {response.url}"
-        else:
-            category = "Crawling Error"
-            subcategory = "Request Failure"
-            code = 1001
-            message = f"Request failed for {request.url}: {failure.getErrorMessage()}"
-        self.log_error(category, subcategory, code, message, spider, request.url)
+        """
+        Handles request failures (HTTP errors, network errors), classified by
+        the error registry. Returns the error type.
+        """
+        error_type, values = self.registry.classify_failure(failure)
+        values.setdefault("url", failure.request.url)
+        self.log_error_type(error_type.name, spider, **values)
+        return error_type
 
     def log_pagination_error(self, response, spider):
         """
         Logs a pagination error using dynamic values from the configuration.
         The spider doesn't need to supply any message or error code.
         """
-        category = "Parsing Error"
-        subcategory = "Pagination Error"
-        code =  2003
-        message =  "Failed to extract next page."
-        self.log_error(category, subcategory, code, message, spider, response.url)
+        self.log_error_type("pagination_error", spider, response.url)
 
     def log_pagination_error_1(self, response, spider):
         """
         Logs a pagination error using dynamic values from the configuration.
         The spider doesn't need to supply any message or error code.
         """
-        category = "Parsing Error"
-        subcategory = "Missing Required Data - Pagination"
-        code = 2003
-        message = "Pagination element is missing but expected."
-        
-        self.log_error(category, subcategory, code, message, spider, response)
+        self.log_error_type("pagination_missing", spider, response.url)
 
     def log_missing_required_data(self, response, spider):
         """
         Logs an error for missing required data dynamically.
         """
-        category = "Parsing Error"
-        subcategory = "Missing Required Data"
-        code =  2001 
-        message = f"Missing required item data for URL: {response.url}"
-        self.log_error(category, subcategory, code, message, spider, response.url)
+        self.log_error_type("missing_required_data", spider, response.url)
     
     def log_no_items_found(self, response, spider):
         """
         Logs an error when no items are found on the page.
         """
-        category = "Parsing Error"
-        subcategory = "No Items Found"
-        code =  2002
-        message =  f"No items found on page: {response.url}"
-        self.log_error(category, subcategory, code, message, spider, response.url)    
-
-    # logs/error_handler.py
-
-
-   
-    def handle_request_failure(self, failure, spider_name):
-        # Simply call the proxy operation dynamically
-        perform_proxy_operation()
+        self.log_error_type("no_items_found", spider, response.url)
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import logging
+import datetime
+import functools
+from urllib.parse import urlparse
+
+import pytz # type: ignore
+
+from logs.records import dumps_entry
+from logs.rotation import RotatingFile, all_paths, open_segment, segment_paths
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Zone of the string timestamps written by older versions, and the default display zone.
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+TIMESTAMP_TIMEZONE = pytz.timezone(DEFAULT_TIMEZONE)
+EPOCH = datetime.datetime(1970, 1, 1)
+# Numeric timestamps from this value up are epoch milliseconds (what ErrorManager
+# writes); smaller ones are epoch seconds. 1e11 ms is 1973, 1e11 s the year 5138.
+EPOCH_MS_THRESHOLD = 10 ** 11
+# Imported entries go in a segment named like a rotated one, sorting before all of them.
+IMPORT_SEGMENT_STAMP = "00000000-000000"
+LEGACY_IMPORT_NAME = "legacy"
+
+
+@functools.lru_cache(maxsize=4096)
+def _utc_offset(hour):
+    """UTC offset in seconds of a local ``YYYY-MM-DD HH`` hour; cached since localize() is slow."""
+    naive = datetime.datetime.strptime(hour, "%Y-%m-%d %H")
+    return TIMESTAMP_TIMEZONE.localize(naive).utcoffset().total_seconds()
+
+
+@functools.lru_cache(maxsize=4096)
+def _zone_offset(zone, utc_hour):
+    """UTC offset in seconds of time zone `zone` during an hour counted from the epoch."""
+    return datetime.datetime.fromtimestamp(utc_hour * 3600, pytz.timezone(zone)).utcoffset().total_seconds()
+
+
+def format_epoch(epoch, zone=DEFAULT_TIMEZONE, fmt=TIMESTAMP_FORMAT, millis=True):
+    """Render epoch seconds as local time in `zone`, with milliseconds unless `millis` is false."""
+    local = EPOCH + datetime.timedelta(seconds=epoch + _zone_offset(zone, int(epoch // 3600)))
+    text = local.strftime(fmt)
+    return f"{text}.{local.microsecond // 1000:03d}" if millis else text
+
+
+def zone_converter(zone=DEFAULT_TIMEZONE):
+    """
+    A `logging.Formatter.converter` showing record times in `zone`. The
+    zone's offset is looked up once per hour instead of per record.
+    """
+    def converter(seconds):
+        return time.gmtime(seconds + _zone_offset(zone, int(seconds // 3600)))
+    return converter
+
+
+def entry_epoch(entry):
+    """
+    Epoch seconds of an entry's `timestamp`, or None if it has none.
+    Accepts epoch milliseconds, epoch seconds and the local
+    ``YYYY-MM-DD HH:MM:SS`` strings of older logs.
+    """
+    value = entry.get("timestamp")
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value >= EPOCH_MS_THRESHOLD else float(value)
+    try:
+        # Fixed-width "%Y-%m-%d %H:%M:%S"; slicing is much cheaper than strptime.
+        naive = datetime.datetime(
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        )
+        return (naive - EPOCH).total_seconds() - _utc_offset(value[:13])
+    except (ValueError, TypeError):
+        return None
+
+
+def entry_domain(entry):
+    url = entry.get("url")
+    return entry.get("domain") or (urlparse(url).hostname if url else None)
+
+
+def entry_count(entry):
+    """Number of errors an entry stands for (summary records carry a count)."""
+    return entry.get("count", 1)
+
+
+def filter_entries(entries, codes=None, spider=None, domain=None, since=None, until=None):
+    """Yield entries matching all given filters; `since`/`until` are epoch seconds."""
+    codes = set(codes) if codes else None
+    for entry in entries:
+        if codes is not None and entry.get("error_code") not in codes:
+            continue
+        if spider is not None and entry.get("spider") != spider:
+            continue
+        if domain is not None and entry_domain(entry) != domain:
+            continue
+        if since is not None or until is not None:
+            ts = entry_epoch(entry)
+            if ts is None or (since is not None and ts < since) or (until is not None and ts >= until):
+                continue
+        yield entry
+
+
+def histogram_entries(entries, bucket_seconds):
+    """Sorted ``(bucket_start, count)`` pairs over the given entries."""
+    buckets = {}
+    for entry in entries:
+        ts = entry_epoch(entry)
+        if ts is None:
+            continue
+        start = int(ts // bucket_seconds * bucket_seconds)
+        buckets[start] = buckets.get(start, 0) + entry_count(entry)
+    return sorted(buckets.items())
+
+
+class ErrorStore:
+    """
+    Append-only error store backed by a newline-delimited JSON file.
+
+    Every entry is serialized to a single line and appended to a file handle
+    that stays open for the lifetime of the store, so logging an error costs
+    the same whether the log holds ten entries or ten million. With
+    `rotation` options (see `logs.rotation.RotatingFile`) the file rolls
+    over into compressed segments, which reads and queries still cover.
+    """
+
+    def __init__(self, path, rotation=None):
+        self.path = path
+        self.file = RotatingFile.for_path(path, **(rotation or {}))
+
+    def append(self, entry):
+        """Append a single entry as one JSON line."""
+        self.file.write(dumps_entry(entry) + "\n")
+
+    def append_many(self, entries):
+        """Append several entries with a single write."""
+        lines = "".join(dumps_entry(entry) + "\n" for entry in entries)
+        if lines:
+            self.file.write(lines)
+
+    def import_entries(self, entries, name):
+        """
+        Add `entries` as a segment older than any rotated one, written to a
+        temporary file and renamed into place, so the import is all or
+        nothing. Returns the number of entries, or None if `name` was
+        already imported.
+        """
+        segment = f"{self.path}.{IMPORT_SEGMENT_STAMP}-{name}"
+        if any(path.startswith(segment) for path in segment_paths(self.path)):
+            return None
+        tmp_path = segment + ".tmp"
+        imported = 0
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(dumps_entry(entry) + "\n")
+                imported += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, segment)
+        return imported
+
+    def iter_entries(self):
+        """Stream the stored entries without loading the whole file."""
+        return iter_errors(self.path)
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def query(self, limit=None, **filters):
+        """Stream entries matching `filters` (see `filter_entries`). Scans the whole log."""
+        for index, entry in enumerate(filter_entries(self.iter_entries(), **filters)):
+            if limit is not None and index >= limit:
+                return
+            yield entry
+
+    def count(self, **filters):
+        return sum(entry_count(entry) for entry in self.query(**filters))
+
+    def histogram(self, bucket_seconds=3600, **filters):
+        return histogram_entries(self.query(**filters), bucket_seconds)
+
+    def close(self):
+        self.file.close()
+
+
+def iter_errors(path):
+    """
+    Yield entries from a JSONL error store one line at a time, oldest
+    rotated segment first (compressed segments included), then the live
+    file.
+
+    Blank lines are skipped, and so is a truncated final line left behind by a
+    crash mid-write.
+    """
+    for segment in all_paths(path):
+        try:
+            f = open_segment(segment)
+        except FileNotFoundError:
+            # Compressed and removed by the rotation worker in the meantime.
+            continue
+        with f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping malformed error entry at %s:%d", segment, line_no)
+
+
+def is_legacy_log(path):
+    """Return True if `path` holds the old `[]`-headed, pretty-printed format."""
+    if not os.path.exists(path):
+        return False
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            char = f.read(1)
+            if not char:
+                return False
+            if not char.isspace():
+                return char == "["
+
+
+def iter_legacy_errors(path):
+    """
+    Yield entries from a legacy `errors.json` file.
+
+    The old writer dumped an empty JSON array and then appended indented
+    objects after it, so the file is a stream of concatenated JSON values
+    rather than one document. Values are decoded incrementally in chunks;
+    entries found inside the array header are yielded as well.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    with open(path, "r", encoding="utf-8") as f:
+        eof = False
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,[]")
+            if not buffer:
+                if eof:
+                    return
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer = chunk
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    logger.warning("Discarding undecodable tail of legacy log %s", path)
+                    return
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+            if isinstance(value, dict):
+                yield value
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, dict):
+                        yield item
+
+
+def migrate_legacy_log(legacy_path, store):
+    """
+    One-time migration of a legacy `errors.json` file into `store`.
+
+    The entries are added with the store's all-or-nothing `import_entries`,
+    so a crash mid-migration leaves the store untouched, and one after it
+    doesn't import the file twice. The legacy file is then renamed to
+    `<name>.migrated`. Returns the number of migrated entries.
+    """
+    if not is_legacy_log(legacy_path):
+        return 0
+    migrated = store.import_entries(iter_legacy_errors(legacy_path), LEGACY_IMPORT_NAME)
+    os.replace(legacy_path, legacy_path + ".migrated")
+    if migrated is None:
+        logger.info("%s was already migrated to %s", legacy_path, store.path)
+        return 0
+    logger.info("Migrated %d entries from %s to %s", migrated, legacy_path, store.path)
+    return migrated
@@ -0,0 +1,134 @@
+"""
+Query the error store from the command line.
+
+    python -m logs.query count --code 2001 --spider error --domain www.amazon.com --since 1d
+    python -m logs.query list --code 1001 --code 1002 --limit 20
+    python -m logs.query histogram --bucket 3600 --since 2025-02-01 --until 2025-02-02 --tz UTC
+
+`--store` defaults to logs/errors.db if it exists, else logs/errors.jsonl.
+Paths ending in .db/.sqlite/.sqlite3 are opened as SQLite stores (indexed);
+anything else is scanned as a JSONL store.
+
+Entries store epoch-millisecond timestamps; `--tz` (default Asia/Kolkata)
+is the zone dates are read and shown in. `list` adds the local time to
+each entry as ``time``.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+
+import pytz # type: ignore
+
+from logs.error_store import DEFAULT_TIMEZONE, ErrorStore, TIMESTAMP_FORMAT, entry_epoch, format_epoch
+from logs.sqlite_store import SqliteErrorStore
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+RELATIVE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def open_store(path):
+    """Open an existing error store, picking the backend from the file name."""
+    if path.endswith(SQLITE_SUFFIXES):
+        return SqliteErrorStore(path)
+    return ErrorStore(path)
+
+
+def default_store_path():
+    for path in ("logs/errors.db", "logs/errors.jsonl"):
+        if os.path.exists(path):
+            return path
+    return "logs/errors.jsonl"
+
+
+def parse_time(value, now=None, zone=DEFAULT_TIMEZONE):
+    """
+    Parse a time filter into epoch seconds: an epoch number, a relative age
+    such as ``30m``, ``24h`` or ``7d``, or a ``YYYY-MM-DD[ HH:MM:SS]`` local
+    time in time zone `zone`.
+    """
+    value = value.strip()
+    if value[-1:] in RELATIVE_UNITS and value[:-1].replace(".", "", 1).isdigit():
+        return (now or time.time()) - float(value[:-1]) * RELATIVE_UNITS[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for fmt in (TIMESTAMP_FORMAT, "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            naive = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return pytz.timezone(zone).localize(naive).timestamp()
+    raise argparse.ArgumentTypeError(f"Unrecognised time: {value!r}")
+
+
+def format_time(epoch, zone=DEFAULT_TIMEZONE):
+    return format_epoch(epoch, zone, millis=False)
+
+
+def with_local_time(entry, zone=DEFAULT_TIMEZONE):
+    """The entry with its timestamp also rendered as local time in `zone`."""
+    epoch = entry_epoch(entry)
+    if epoch is None:
+        return entry
+    return {**entry, "time": format_epoch(epoch, zone)}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m logs.query", description="Filter, count and bucket logged errors.")
+    parser.add_argument("--store", default=None, help="Error store path (.jsonl or .db)")
+    parser.add_argument("--tz", default=DEFAULT_TIMEZONE, help=f"Time zone of dates shown and given (default: {DEFAULT_TIMEZONE})")
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--code", type=int, action="append", dest="codes", help="Error code (repeatable)")
+    filters.add_argument("--spider")
+    filters.add_argument("--domain")
+    filters.add_argument("--since", help="Start time (inclusive)")
+    filters.add_argument("--until", help="End time (exclusive)")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_cmd = commands.add_parser("list", parents=[filters], help="Print matching entries as JSON lines")
+    list_cmd.add_argument("--limit", type=int)
+    commands.add_parser("count", parents=[filters], help="Count matching errors")
+    histogram_cmd = commands.add_parser("histogram", parents=[filters], help="Count matching errors per time bucket")
+    histogram_cmd.add_argument("--bucket", type=int, default=3600, help="Bucket size in seconds (default: 3600)")
+    return parser
+
+
+def main(argv=None, out=sys.stdout):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        pytz.timezone(args.tz)
+        # Dates are parsed after --tz is known.
+        since = parse_time(args.since, zone=args.tz) if args.since else None
+        until = parse_time(args.until, zone=args.tz) if args.until else None
+    except (argparse.ArgumentTypeError, pytz.UnknownTimeZoneError) as e:
+        parser.error(str(e))
+    store = open_store(args.store or default_store_path())
+    filters = {
+        "codes": args.codes,
+        "spider": args.spider,
+        "domain": args.domain,
+        "since": since,
+        "until": until,
+    }
+    try:
+        if args.command == "list":
+            for entry in store.query(limit=args.limit, **filters):
+                out.write(json.dumps(with_local_time(entry, args.tz), ensure_ascii=False) + "\n")
+        elif args.command == "count":
+            out.write(f"{store.count(**filters)}\n")
+        else:
+            for bucket_start, count in store.histogram(args.bucket, **filters):
+                out.write(f"{format_time(bucket_start, args.tz)}\t{count}\n")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
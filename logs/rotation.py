@@ -0,0 +1,292 @@
+import io
+import os
+import glob
+import gzip
+import time
+import shutil
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard # type: ignore
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# The options of `rotation_options`, which writers of one file may set independently.
+ROTATION_OPTIONS = ("max_bytes", "daily", "compress", "retention_segments", "retention_days")
+
+# One background worker compresses rotated segments for every file in the process.
+_compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+
+
+def rotation_options(settings):
+    """Rotation options shared by the error store, signal log and Scrapy log."""
+    return {
+        "max_bytes": settings.getint("LOG_ROTATE_MAX_BYTES", 0),
+        "daily": settings.getbool("LOG_ROTATE_DAILY", False),
+        "compress": settings.get("LOG_ROTATE_COMPRESS") or None,
+        "retention_segments": settings.getint("LOG_RETENTION_SEGMENTS", 0),
+        "retention_days": settings.getfloat("LOG_RETENTION_DAYS", 0),
+    }
+
+
+def segment_paths(path):
+    """
+    Rotated segments of `path`, oldest first. While a segment is being
+    compressed both copies may exist; the uncompressed one wins.
+    """
+    prefix = path + "."
+    segments = {}
+    for candidate in glob.glob(glob.escape(path) + ".*"):
+        if candidate.endswith(".tmp"):
+            continue
+        suffix = candidate[len(prefix):]
+        base = suffix
+        for ext in COMPRESSED_SUFFIXES:
+            if suffix.endswith(ext):
+                base = suffix[:-len(ext)]
+                break
+        if not base[:8].isdigit():
+            continue
+        if base not in segments or base == suffix:
+            segments[base] = candidate
+    return [segments[base] for base in sorted(segments)]
+
+
+def all_paths(path):
+    """Rotated segments followed by the live file, in write order."""
+    paths = segment_paths(path)
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def open_segment(path, encoding="utf-8"):
+    """Open a live, rotated or compressed segment for text reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding=encoding)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), encoding=encoding)
+    return open(path, "r", encoding=encoding)
+
+
+def compress_segment(path, method):
+    """Compress a rotated segment next to itself and remove the original."""
+    ext = ".zst" if method == "zstd" else ".gz"
+    tmp_path = path + ext + ".tmp"
+    with open(path, "rb") as src:
+        if method == "zstd":
+            with open(tmp_path, "wb") as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+        else:
+            with gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path + ext)
+    os.remove(path)
+
+
+def apply_retention(path, retention_segments=0, retention_days=0, clock=time.time):
+    """Delete the oldest segments beyond the configured count or age."""
+    segments = segment_paths(path)
+    expired = []
+    if retention_segments and len(segments) > retention_segments:
+        expired = segments[:len(segments) - retention_segments]
+        segments = segments[len(expired):]
+    if retention_days:
+        cutoff = clock() - retention_days * 86400
+        expired += [segment for segment in segments if os.path.getmtime(segment) < cutoff]
+    for segment in expired:
+        try:
+            os.remove(segment)
+        except OSError:
+            pass
+
+
+class RotatingFile:
+    """
+    Append-only text file that rolls over by size and/or calendar day.
+
+    A rotated file is renamed to ``<path>.<YYYYmmdd-HHMMSS>`` and, if
+    `compress` is ``gzip`` or ``zstd``, compressed on a background thread,
+    after which the retention policy is applied. Use `for_path` so that all
+    writers of one file in the process share a single instance (and thus a
+    single rollover).
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path, max_bytes=0, daily=False, compress=None, retention_segments=0,
+                 retention_days=0, encoding="utf-8", clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.daily = daily
+        self.compress = self._compression(compress)
+        self.retention_segments = retention_segments
+        self.retention_days = retention_days
+        self.encoding = encoding
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._stream = None
+        self._size = 0
+        self._day = None
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+
+    def _compression(self, compress):
+        if compress == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; compressing %s segments with gzip instead", self.path)
+            return "gzip"
+        return compress
+
+    @classmethod
+    def for_path(cls, path, **options):
+        """
+        Shared instance for `path`. Rotation options given when it already
+        exists are merged in (see `merge_options`), so a writer created
+        without options doesn't leave the file unrotated.
+        """
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is None:
+                instance = cls._instances[key] = cls(path, **options)
+            else:
+                instance.merge_options(options)
+            return instance
+
+    def merge_options(self, options):
+        """
+        Apply the rotation options this file doesn't have yet. An option
+        already set to a different value is kept, with a warning; other
+        options (encoding, clock) only apply on creation.
+        """
+        with self._lock:
+            for name in ROTATION_OPTIONS:
+                value = options.get(name)
+                if not value:
+                    continue
+                if name == "compress":
+                    value = self._compression(value)
+                current = getattr(self, name)
+                if not current:
+                    setattr(self, name, value)
+                elif current != value:
+                    logger.warning("%s already rotates with %s=%r; ignoring %s=%r", self.path, name, current, name, value)
+
+    def _open(self):
+        if self._stream is None:
+            self._stream = open(self.path, "a", encoding=self.encoding)
+            self._size = self._stream.tell()
+            mtime = os.path.getmtime(self.path) if self._size else self.clock()
+            self._day = datetime.date.fromtimestamp(mtime)
+        return self._stream
+
+    def _should_rollover(self, incoming):
+        if not self._size:
+            return False
+        if self.max_bytes and self._size + incoming > self.max_bytes:
+            return True
+        return self.daily and datetime.date.fromtimestamp(self.clock()) != self._day
+
+    def write(self, data):
+        with self._lock:
+            self._open()
+            # Size is tracked in characters, which is exact for ASCII logs and close enough otherwise.
+            if self._should_rollover(len(data)):
+                self.rollover()
+                self._open()
+            self._stream.write(data)
+            self._stream.flush()
+            self._size += len(data)
+
+    def rollover(self):
+        """Rename the live file to a timestamped segment and queue its compression."""
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+            if not os.path.exists(self.path):
+                return
+            stamp = datetime.datetime.fromtimestamp(self.clock()).strftime("%Y%m%d-%H%M%S")
+            segment = f"{self.path}.{stamp}"
+            counter = 0
+            while glob.glob(glob.escape(segment) + "*"):
+                counter += 1
+                segment = f"{self.path}.{stamp}-{counter}"
+            os.replace(self.path, segment)
+            _compressor.submit(self._finish_segment, segment)
+
+    def _finish_segment(self, segment):
+        try:
+            if self.compress:
+                compress_segment(segment, self.compress)
+            apply_retention(self.path, self.retention_segments, self.retention_days, self.clock)
+        except Exception:
+            logger.exception("Failed to compress or expire %s", segment)
+
+    def flush(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.flush()
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = None
+
+
+class SegmentedFileHandler(logging.Handler):
+    """Synchronous logging handler writing through a shared `RotatingFile`."""
+
+    def __init__(self, filename, **rotation):
+        super().__init__()
+        self.baseFilename = filename
+        self.file = RotatingFile.for_path(filename, **rotation)
+
+    def emit(self, record):
+        try:
+            self.file.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        try:
+            self.file.close()
+        finally:
+            super().close()
+
+
+def install_scrapy_log_handler(settings):
+    """
+    Install a rotating root handler for Scrapy's LOG_FILE, equivalent to the
+    handler Scrapy installs itself. Use with
+    ``CrawlerProcess(settings, install_root_handler=False)``.
+    """
+    from scrapy.utils.log import TopLevelFormatter
+
+    filename = settings.get("LOG_FILE")
+    if not filename or not settings.getbool("LOG_ENABLED", True):
+        return None
+    handler = SegmentedFileHandler(filename, **rotation_options(settings))
+    handler.setFormatter(logging.Formatter(fmt=settings.get("LOG_FORMAT"), datefmt=settings.get("LOG_DATEFORMAT")))
+    handler.setLevel(settings.get("LOG_LEVEL"))
+    if settings.getbool("LOG_SHORT_NAMES"):
+        handler.addFilter(TopLevelFormatter(["scrapy"]))
+    logging.root.setLevel(logging.NOTSET)
+    logging.root.addHandler(handler)
+    return handler
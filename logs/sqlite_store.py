@@ -0,0 +1,172 @@
+import os
+import json
+import sqlite3
+import threading
+
+from logs.error_store import entry_count, entry_domain, entry_epoch
+from logs.records import dumps_entry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    ts REAL,
+    error_code INTEGER,
+    error_category TEXT,
+    error_subcategory TEXT,
+    spider TEXT,
+    domain TEXT,
+    url TEXT,
+    count INTEGER NOT NULL DEFAULT 1,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_errors_ts ON errors (ts);
+CREATE INDEX IF NOT EXISTS idx_errors_code_ts ON errors (error_code, ts);
+CREATE INDEX IF NOT EXISTS idx_errors_spider_ts ON errors (spider, ts);
+CREATE INDEX IF NOT EXISTS idx_errors_domain_ts ON errors (domain, ts);
+CREATE TABLE IF NOT EXISTS imports (
+    name TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL
+);
+"""
+
+INSERT = """
+INSERT INTO errors (ts, error_code, error_category, error_subcategory, spider, domain, url, count, entry)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+class SqliteErrorStore:
+    """
+    Error store backed by SQLite, with the same append/iterate interface as
+    `ErrorStore` plus indexed queries.
+
+    The database runs in WAL mode so readers (the query CLI) never block the
+    writer, and `append_many` inserts a whole batch in one transaction.
+    Besides the full JSON entry, the columns used for filtering (timestamp,
+    code, spider, domain) are stored and indexed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        # Written from the background writer thread, read from the caller's.
+        self._lock = threading.Lock()
+        self.conn = None
+        self._connect()
+
+    def _connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    @staticmethod
+    def _row(entry):
+        return (
+            entry_epoch(entry),
+            entry.get("error_code"),
+            entry.get("error_category"),
+            entry.get("error_subcategory"),
+            entry.get("spider"),
+            entry_domain(entry),
+            entry.get("url"),
+            entry_count(entry),
+            dumps_entry(entry),
+        )
+
+    def append(self, entry):
+        self.append_many((entry,))
+
+    def append_many(self, entries):
+        """Insert a batch of entries in a single transaction."""
+        rows = [self._row(entry) for entry in entries]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(INSERT, rows)
+
+    def import_entries(self, entries, name):
+        """
+        Insert `entries` in one transaction recorded as import `name`.
+        Returns the number of entries, or None if `name` was already imported.
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if conn.execute("SELECT 1 FROM imports WHERE name = ?", (name,)).fetchone():
+                    return None
+                imported = conn.executemany(INSERT, (self._row(entry) for entry in entries)).rowcount
+                conn.execute("INSERT INTO imports (name, entries) VALUES (?, ?)", (name, imported))
+        return imported
+
+    def iter_entries(self):
+        return self.query()
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    @staticmethod
+    def _where(codes=None, spider=None, domain=None, since=None, until=None):
+        clauses, params = [], []
+        if codes:
+            codes = list(codes)
+            clauses.append(f"error_code IN ({','.join('?' * len(codes))})")
+            params.extend(codes)
+        if spider is not None:
+            clauses.append("spider = ?")
+            params.append(spider)
+        if domain is not None:
+            clauses.append("domain = ?")
+            params.append(domain)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _fetchall(self, sql, params):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def query(self, limit=None, **filters):
+        """Stream entries matching `filters`, oldest first."""
+        where, params = self._where(**filters)
+        sql = f"SELECT entry FROM errors{where} ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        # A separate cursor lets the caller stream rows without holding the lock.
+        cursor = sqlite3.connect(self.path).execute(sql, params)
+        try:
+            for (entry,) in cursor:
+                yield json.loads(entry)
+        finally:
+            cursor.connection.close()
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        return self._fetchall(f"SELECT COALESCE(SUM(count), 0) FROM errors{where}", params)[0][0]
+
+    def histogram(self, bucket_seconds=3600, **filters):
+        """Sorted ``(bucket_start, count)`` pairs, bucketed by timestamp in SQL."""
+        where, params = self._where(**filters)
+        where = where + (" AND " if where else " WHERE ") + "ts IS NOT NULL"
+        sql = (
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, SUM(count) FROM errors{where} "
+            "GROUP BY bucket ORDER BY bucket"
+        )
+        return [tuple(row) for row in self._fetchall(sql, [bucket_seconds, bucket_seconds] + params)]
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
@@ -1,20 +1,72 @@
 
+import os
 import sys
+import json
+import time
+import argparse
+import multiprocessing
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from logs.error_handler import ErrorManager
 from scrapy.spiderloader import SpiderLoader
 from scrapy.utils.conf import init_env
+from logs.error_store import DEFAULT_TIMEZONE
+from logs.query import parse_time
+from logs.rotation import install_scrapy_log_handler
+from errors.url_source import iter_urls
+from errors.sharding import (
+    STATS_FILE, SUMMARY_FILE, URLS_FILE, apply_shard_settings, merge_shards, split_urls, write_stats,
+)
 
 # Initialize environment
 init_env()
 
-# Initialize error handler
-error_handler = ErrorManager()
 
-def run_spider(spider_name, urls=None):
+def log_spider_not_found(settings, spider_name, reason):
+    """
+    Log a missing spider to the error store. The manager is built from the
+    run's settings when needed, not at import, so the log files it shares
+    with the crawl get their configured rotation.
+    """
+    error_handler = ErrorManager.from_settings(settings)
+    try:
+        error_handler.log_error_type("spider_not_found", spider_name, url="N/A", reason=reason)
+    finally:
+        error_handler.close()
+
+def crawler_process(settings):
+    """
+    A CrawlerProcess whose LOG_FILE gets a rotating handler instead of
+    Scrapy's plain FileHandler. Without a LOG_FILE, Scrapy installs its own
+    (console) handler.
+    """
+    rotating = settings.getbool("LOG_ENABLED", True) and bool(settings.get("LOG_FILE"))
+    process = CrawlerProcess(settings, install_root_handler=not rotating)
+    if rotating:
+        install_scrapy_log_handler(settings)
+    return process
+
+def apply_overrides(settings, overrides):
+    """Apply NAME=VALUE pairs from the command line, as `scrapy crawl -s` does."""
+    for override in overrides or ():
+        name, _, value = override.partition("=")
+        settings.set(name.strip(), value, priority="cmdline")
+
+
+def apply_replay_settings(settings):
+    """Concurrency limits of a replay crawl, below any -s override."""
+    per_domain = settings.getint("REPLAY_CONCURRENT_REQUESTS_PER_DOMAIN", 2)
+    settings.set("CONCURRENT_REQUESTS", settings.getint("REPLAY_CONCURRENT_REQUESTS", 8), priority="spider")
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", per_domain, priority="spider")
+    settings.set("ADAPTIVE_THROTTLE_MAX_CONCURRENCY", per_domain, priority="spider")
+
+
+def run_spider(spider_name, urls=None, url_file=None, overrides=None, replay=None):
    
     settings = get_project_settings()
+    apply_overrides(settings, overrides)
+    if replay is not None:
+        apply_replay_settings(settings)
     
     try:
         # Load available spiders
@@ -22,10 +74,16 @@ def run_spider(spider_name, urls=None):
         if spider_name not in spider_loader.list():
             raise KeyError(f"Spider not found: {spider_name}")
 
-        # Start Scrapy process if the spider exists
-        process = CrawlerProcess(settings)
+        # Start Scrapy process if the spider exists.
+        process = crawler_process(settings)
         
-        if urls:
+        if replay is not None:
+            print(f"Starting spider '{spider_name}' replaying failed URLs from the crawl checkpoint")
+            process.crawl(spider_name, replay=replay)
+        elif url_file:
+            print(f"Starting spider '{spider_name}' with URLs from: {url_file}")
+            process.crawl(spider_name, url_file=url_file)
+        elif urls:
             # Pass the URLs as a spider argument.
             # Your spider should be coded to accept and process this argument.
             urls_arg = ','.join(urls)
@@ -39,17 +97,121 @@ def run_spider(spider_name, urls=None):
 
     except KeyError as e:
         print(f"❌ ERROR: {e}")  # Console output
-        error_handler.log_error("Crawling Error", "SpiderNotFound", 1003, str(e), spider_name, url="N/A")
+        log_spider_not_found(settings, spider_name, str(e))
         sys.exit(1)  # Exit with error code
 
-if __name__ == "__main__":
-    # Expect at least one argument: the spider name.
-    if len(sys.argv) < 2:
-        print("Usage: python run_spider.py <spider_name> [url1 url2 ...]")
+def run_shard(spider_name, shard_dir, overrides=None):
+    """Crawl one shard's URL file in this process, keeping every output file inside `shard_dir`."""
+    settings = get_project_settings()
+    apply_overrides(settings, overrides)
+    apply_shard_settings(settings, shard_dir)
+    process = crawler_process(settings)
+    crawler = process.create_crawler(spider_name)
+    process.crawl(crawler, url_file=os.path.join(shard_dir, URLS_FILE))
+    process.start()
+    write_stats(os.path.join(shard_dir, STATS_FILE), crawler.stats.get_stats())
+
+
+def run_sharded(spider_name, source, shards, run_dir=None, overrides=None):
+    """
+    Split the URLs of `source` across `shards` worker processes by domain
+    hash, run the spider in each, then merge the shards' error stores into
+    the main store and write one summary for the run.
+    """
+    settings = get_project_settings()
+    apply_overrides(settings, overrides)
+    if spider_name not in SpiderLoader(settings).list():
+        print(f"❌ ERROR: Spider not found: {spider_name}")
+        log_spider_not_found(settings, spider_name, f"Spider not found: {spider_name}")
         sys.exit(1)
 
-    spider_name = sys.argv[1]
-    # If additional arguments are provided, treat them as URLs.
-    urls = sys.argv[2:] if len(sys.argv) > 2 else None
+    run_dir = run_dir or os.path.join("logs", "runs", time.strftime("%Y%m%d-%H%M%S"))
+    dirs, counts = split_urls(iter_urls(source), shards, run_dir)
+    print(f"Starting spider '{spider_name}' in {shards} shards ({sum(counts)} URLs), output in {run_dir}")
+
+    # Each shard runs its own reactor, so workers are started fresh rather than forked.
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for index, (shard_dir, count) in enumerate(zip(dirs, counts)):
+        worker = None
+        if count:
+            worker = context.Process(target=run_shard, args=(spider_name, shard_dir, overrides), name=f"shard-{index:02d}")
+            worker.start()
+        workers.append(worker)
+    exit_codes = []
+    for worker in workers:
+        if worker is not None:
+            worker.join()
+        exit_codes.append(worker.exitcode if worker is not None else None)
+
+    summary = merge_shards(dirs, settings, exit_codes, counts)
+    with open(os.path.join(run_dir, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+    for shard in summary["shards"]:
+        print(f"  shard {shard['shard']:02d}: {shard['urls']} URLs, {shard['items']} items, "
+              f"{shard['errors']} errors, exit code {shard['exit_code']}")
+    print(f"Total: {summary['stats'].get('item_scraped_count', 0)} items, {summary['errors']['total']} errors")
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run a spider on URLs given as arguments or read from a file, optionally sharded across processes.",
+    )
+    parser.add_argument("spider_name")
+    parser.add_argument("urls", nargs="*", help="Start URLs")
+    parser.add_argument("--urls-from", metavar="SOURCE",
+                        help="Read start URLs from a file (one per line or JSONL with a 'url' key), or '-' for stdin")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Number of worker processes for --urls-from, split by domain (0: one per CPU)")
+    parser.add_argument("--run-dir", help="Directory for per-shard output and the run summary")
+    parser.add_argument("-s", "--set", dest="overrides", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a setting (may be repeated); dict settings take JSON")
+
+    replay = parser.add_argument_group("replay", "Crawl the failed URLs of the last crawl again (--replay)")
+    replay.add_argument("--replay", action="store_true", help="Use the failed URLs in CRAWL_CHECKPOINT_FILE as the start URLs")
+    replay.add_argument("--code", type=int, action="append", dest="codes",
+                        help="Error code to replay (repeatable, default REPLAY_CODES)")
+    replay.add_argument("--from-spider", help="Replay failures of this spider (default: the spider run)")
+    replay.add_argument("--since", help="Start time: epoch, age such as 6h, or YYYY-MM-DD[ HH:MM:SS]")
+    replay.add_argument("--until", help="End time (exclusive, default: now)")
+    replay.add_argument("--tz", default=DEFAULT_TIMEZONE, help=f"Time zone of --since/--until dates (default: {DEFAULT_TIMEZONE})")
+    replay.add_argument("--concurrency", type=int, help="Concurrent requests (default REPLAY_CONCURRENT_REQUESTS)")
+    replay.add_argument("--per-domain", type=int,
+                        help="Concurrent requests per domain (default REPLAY_CONCURRENT_REQUESTS_PER_DOMAIN)")
+    return parser
+
+
+def replay_options(args):
+    """The spider's replay filters and the extra setting overrides for a --replay run."""
+    filters = {
+        "codes": args.codes,
+        "spider": args.from_spider or args.spider_name,
+        "since": parse_time(args.since, zone=args.tz) if args.since else None,
+        "until": parse_time(args.until, zone=args.tz) if args.until else None,
+    }
+    overrides = []
+    if args.concurrency:
+        overrides.append(f"REPLAY_CONCURRENT_REQUESTS={args.concurrency}")
+    if args.per_domain:
+        overrides.append(f"REPLAY_CONCURRENT_REQUESTS_PER_DOMAIN={args.per_domain}")
+    return filters, overrides
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    args = parser.parse_args()
+    shards = args.shards or os.cpu_count() or 1
 
-    run_spider(spider_name, urls)
+    if args.replay:
+        if args.urls or args.urls_from:
+            parser.error("--replay takes its URLs from the crawl checkpoint, not from arguments or --urls-from")
+        try:
+            filters, replay_overrides = replay_options(args)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+        run_spider(args.spider_name, overrides=replay_overrides + args.overrides, replay=filters)
+    elif args.urls_from and shards > 1:
+        run_sharded(args.spider_name, args.urls_from, shards, args.run_dir, args.overrides)
+    else:
+        run_spider(args.spider_name, args.urls or None, url_file=args.urls_from, overrides=args.overrides)
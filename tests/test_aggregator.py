@@ -0,0 +1,97 @@
+import random
+
+from logs.error_handler import ErrorAggregator
+from logs.records import ErrorRecord
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def entry(i, domain="shop.test", code=1001):
+    return ErrorRecord("Crawling Error", "Request Failure", code, "Request failed",
+                       "error", f"https://{domain}/p/{i}", 1_000 + i)
+
+
+def make_aggregator(**kwargs):
+    clock = FakeClock()
+    return ErrorAggregator(clock=clock, rng=random.Random(0), **kwargs), clock
+
+
+def test_single_error_is_emitted_as_is():
+    aggregator, _ = make_aggregator()
+    first = entry(0)
+    assert aggregator.add(first) == []
+    assert aggregator.drain() == [first]
+
+
+def test_burst_becomes_one_summary_with_bounded_sample():
+    aggregator, _ = make_aggregator(sample_size=5)
+    for i in range(100):
+        aggregator.add(entry(i))
+    [summary] = aggregator.drain()
+    assert summary["record_type"] == "summary"
+    assert summary["count"] == 100
+    assert summary["domain"] == "shop.test"
+    assert (summary["first_seen"], summary["last_seen"]) == (1_000, 1_099)
+    assert len(summary["sample_urls"]) == 5
+    assert len(set(summary["sample_urls"])) == 5
+    assert all(url.startswith("https://shop.test/p/") for url in summary["sample_urls"])
+
+
+def test_reservoir_sample_is_roughly_uniform():
+    hits = [0] * 20
+    for seed in range(500):
+        aggregator = ErrorAggregator(sample_size=2, clock=FakeClock(), rng=random.Random(seed))
+        for i in range(20):
+            aggregator.add(entry(i))
+        for url in aggregator.drain()[0]["sample_urls"]:
+            hits[int(url.rsplit("/", 1)[1])] += 1
+    # Each URL is kept with probability 2/20, so about 50 times in 500 runs.
+    assert min(hits) > 20 and max(hits) < 90
+
+
+def test_groups_split_by_domain_and_code():
+    aggregator, _ = make_aggregator()
+    for i in range(3):
+        aggregator.add(entry(i, "a.test"))
+        aggregator.add(entry(i, "b.test"))
+        aggregator.add(entry(i, "a.test", code=1002))
+    records = aggregator.drain()
+    assert sorted((r["domain"], r["error_code"], r["count"]) for r in records) == [
+        ("a.test", 1001, 3), ("a.test", 1002, 3), ("b.test", 1001, 3),
+    ]
+
+
+def test_window_close_returns_previous_window():
+    aggregator, clock = make_aggregator(window=60)
+    aggregator.add(entry(0))
+    aggregator.add(entry(1))
+    clock.now = 61
+    closed = aggregator.add(entry(2))
+    assert [r["count"] for r in closed] == [2]
+    assert aggregator.drain() == [entry(2)]
+
+
+def test_max_groups_closes_window_early():
+    aggregator, _ = make_aggregator(max_groups=2)
+    aggregator.add(entry(0, "a.test"))
+    aggregator.add(entry(0, "b.test"))
+    closed = aggregator.add(entry(0, "c.test"))
+    assert len(closed) == 2
+    assert len(aggregator.groups) == 1
+
+
+
+def test_memory_stays_bounded_for_large_bursts():
+    aggregator, _ = make_aggregator(sample_size=10)
+    for i in range(10_000):
+        aggregator.add(entry(i))
+    [summary] = aggregator.drain()
+    assert summary["count"] == 10_000
+    assert len(summary["sample_urls"]) == 10
+    assert "urls" not in summary
@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from logs.async_writer import BatchWriter
+
+
+class GatedWrites:
+    """write_batch that records batches, holding each one until released."""
+
+    def __init__(self, fail_first=False):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail_first = fail_first
+
+    def __call__(self, batch):
+        self.started.set()
+        assert self.release.wait(5)
+        if self.fail_first and not self.batches:
+            self.batches.append(None)
+            raise OSError("disk full")
+        self.batches.append(batch)
+
+    @property
+    def items(self):
+        return [item for batch in self.batches if batch for item in batch]
+
+
+def busy_writer(overflow, **kwargs):
+    """A writer with a queue of two, whose thread is stuck writing item 0."""
+    writes = GatedWrites()
+    writer = BatchWriter(writes, max_queue=2, batch_size=1, flush_interval=0.01, overflow=overflow, **kwargs)
+    writer.put(0)
+    assert writes.started.wait(5)
+    writer.put(1)
+    writer.put(2)
+    return writer, writes
+
+
+def test_block_waits_for_room_and_loses_nothing():
+    writer, writes = busy_writer("block")
+    producer = threading.Thread(target=writer.put, args=(3,))
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive()
+    writes.release.set()
+    producer.join(5)
+    writer.close(5)
+    assert writes.items == [0, 1, 2, 3]
+    assert writer.dropped == 0
+
+
+def test_drop_oldest_discards_the_oldest_queued_item():
+    writer, writes = busy_writer("drop-oldest")
+    writer.put(3)
+    writer.put(4)
+    writes.release.set()
+    writer.close(5)
+    assert writes.items == [0, 3, 4]
+    assert writer.dropped == 2
+
+
+def test_sample_keeps_a_fraction_of_new_items(monkeypatch):
+    draws = iter([0.9, 0.1, 0.7])
+    monkeypatch.setattr("logs.async_writer.random.random", lambda: next(draws))
+    writer, writes = busy_writer("sample", sample_rate=0.5)
+    for item in (3, 4, 5):
+        writer.put(item)
+    writes.release.set()
+    writer.close(5)
+    # 3 and 5 are discarded; 4 replaces 1, the oldest queued item.
+    assert writes.items == [0, 2, 4]
+    assert writer.dropped == 3
+
+
+def test_close_drains_the_queue():
+    written = []
+    writer = BatchWriter(written.extend, batch_size=100, flush_interval=60)
+    for item in range(10):
+        writer.put(item)
+    writer.close(5)
+    assert written == list(range(10))
+    with pytest.raises(RuntimeError):
+        writer.put(10)
+
+
+def test_failed_batch_is_logged_and_the_writer_goes_on(caplog):
+    writes = GatedWrites(fail_first=True)
+    writes.release.set()
+    writer = BatchWriter(writes, batch_size=2, flush_interval=60)
+    writer.put(0)
+    writer.put(1)
+    assert writer.flush(5)
+    writer.put(2)
+    writer.close(5)
+    assert writes.items == [2]
+    assert "Failed to write a batch of 2 entries" in caplog.text
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BatchWriter(list.append, overflow="drop-newest")
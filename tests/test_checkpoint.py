@@ -0,0 +1,186 @@
+import gzip
+import json
+
+import pytest
+
+from errors.checkpoint import CrawlCheckpoint
+from errors.pipelines import ItemExportPipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_checkpoint(tmp_path, **kwargs):
+    kwargs.setdefault("retry_http_codes", [503])
+    return CrawlCheckpoint(str(tmp_path / "crawl.db"), **kwargs)
+
+
+def test_new_checkpoint_is_not_resuming(tmp_path):
+    checkpoint = open_checkpoint(tmp_path)
+    assert not checkpoint.resuming
+    assert checkpoint.resume_urls() == []
+    checkpoint.close()
+
+
+def test_interrupted_crawl_resumes_pending_and_retryable_failures(tmp_path):
+    checkpoint = open_checkpoint(tmp_path)
+    for url in ("https://a.test/1", "https://a.test/2", "https://a.test/3", "https://a.test/4", "https://a.test/5"):
+        checkpoint.queued(url)
+    checkpoint.queued("https://a.test/next", pagination=True)
+    checkpoint.done("https://a.test/1")
+    checkpoint.failed("https://a.test/2", error_code=1001)
+    checkpoint.failed("https://a.test/3", status=503)
+    checkpoint.failed("https://a.test/4", status=404)
+    checkpoint.close("shutdown")
+
+    resumed = open_checkpoint(tmp_path)
+    assert resumed.resuming
+    assert sorted(resumed.resume_urls()) == [
+        ("https://a.test/2", False), ("https://a.test/3", False),
+        ("https://a.test/5", False), ("https://a.test/next", True),
+    ]
+    assert resumed.seen("https://a.test/1") and resumed.seen("https://a.test/4")
+    assert not resumed.seen("https://a.test/6")
+    resumed.close()
+
+
+def test_queuing_again_does_not_reset_a_finished_url(tmp_path):
+    checkpoint = open_checkpoint(tmp_path)
+    checkpoint.queued("https://a.test/1", pagination=True)
+    checkpoint.done("https://a.test/1")
+    checkpoint.queued("https://a.test/1")
+    checkpoint.flush()
+    checkpoint.queued("https://a.test/1")
+    checkpoint.close("shutdown")
+    assert open_checkpoint(tmp_path).resume_urls() == []
+
+
+def test_finished_crawl_starts_over(tmp_path):
+    checkpoint = open_checkpoint(tmp_path)
+    checkpoint.queued("https://a.test/1")
+    checkpoint.set_meta("export_position", 10)
+    checkpoint.close("finished")
+    fresh = open_checkpoint(tmp_path)
+    assert not fresh.resuming
+    assert not fresh.seen("https://a.test/1")
+    assert fresh.get_meta("export_position") is None
+    fresh.close()
+
+
+def test_changes_are_written_in_batches(tmp_path):
+    clock = FakeClock()
+    checkpoint = open_checkpoint(tmp_path, batch_size=3, flush_interval=10, clock=clock)
+    flushes = []
+    checkpoint.on_flush = lambda: flushes.append(len(checkpoint.changes))
+    checkpoint.queued("https://a.test/1")
+    checkpoint.queued("https://a.test/2")
+    assert flushes == []
+    checkpoint.queued("https://a.test/3")
+    assert flushes == [3]
+    clock.now = 11
+    checkpoint.done("https://a.test/1")
+    assert flushes == [3, 1]
+    checkpoint.close()
+
+
+class Spider:
+    name = "test"
+
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+
+
+def crawl(tmp_path, export_path, urls, reason, kill=False):
+    """One run: each URL yields one item and is marked done, as ErrorSpider.handle_page does."""
+    checkpoint = open_checkpoint(tmp_path, batch_size=2)
+    spider = Spider(checkpoint)
+    pipeline = ItemExportPipeline(export_path, batch_size=3)
+    pipeline.open_spider(spider)
+    for url in urls:
+        if checkpoint.seen(url) and url not in dict(checkpoint.resume_urls()):
+            continue
+        checkpoint.queued(url)
+        pipeline.process_item({"url": url}, spider)
+        checkpoint.done(url)
+    if kill:
+        # Rows written after the last checkpoint write are past the recorded position.
+        pipeline.exporter.flush()
+        pipeline.exporter.writer.close()
+        checkpoint.conn.close()
+        return
+    pipeline.close_spider(spider)
+    pipeline.spider_closed(spider, reason)
+    checkpoint.close(reason)
+
+
+def read_export(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line)["url"] for line in f]
+
+
+@pytest.mark.parametrize("name", ["items.jsonl", "items.jsonl.gz"])
+def test_interrupt_resume_export_keeps_every_item(tmp_path, name):
+    export_path = str(tmp_path / name)
+    urls = [f"https://a.test/{i}" for i in range(20)]
+    crawl(tmp_path, export_path, urls[:8], "shutdown")
+    assert not (tmp_path / name).exists()
+    assert (tmp_path / (name + ".part")).exists()
+
+    crawl(tmp_path, export_path, urls, "finished")
+    assert read_export(export_path) == urls
+    assert not (tmp_path / (name + ".part")).exists()
+
+
+@pytest.mark.parametrize("name", ["items.jsonl", "items.jsonl.gz"])
+def test_killed_crawl_export_is_cut_back_to_the_checkpoint(tmp_path, name):
+    export_path = str(tmp_path / name)
+    urls = [f"https://a.test/{i}" for i in range(20)]
+    crawl(tmp_path, export_path, urls[:7], None, kill=True)
+    crawl(tmp_path, export_path, urls, "finished")
+    # Pages done but not yet checkpointed are fetched again; their first rows were cut.
+    assert sorted(read_export(export_path)) == sorted(urls)
+
+
+def test_resumed_crawl_without_new_items_publishes_the_export(tmp_path):
+    export_path = str(tmp_path / "items.jsonl")
+    urls = [f"https://a.test/{i}" for i in range(5)]
+    crawl(tmp_path, export_path, urls, "shutdown")
+    crawl(tmp_path, export_path, urls, "finished")
+    assert read_export(export_path) == urls
+
+
+def test_export_without_checkpoint_is_published_on_close(tmp_path):
+    export_path = str(tmp_path / "items.jsonl")
+    pipeline = ItemExportPipeline(export_path, batch_size=2)
+    spider = Spider(None)
+    pipeline.open_spider(spider)
+    for i in range(3):
+        pipeline.process_item({"url": f"https://a.test/{i}"}, spider)
+    pipeline.close_spider(spider)
+    pipeline.spider_closed(spider, "shutdown")
+    assert len(read_export(export_path)) == 3
+
+
+def test_checkpoint_without_failure_times_is_upgraded(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "crawl.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE urls (url TEXT PRIMARY KEY, state INTEGER NOT NULL, pagination INTEGER NOT NULL DEFAULT 0,
+                           error_code INTEGER, status INTEGER, retryable INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+        INSERT INTO urls VALUES ('https://a.test/1', 0, 0, NULL, NULL, 0);
+    """)
+    conn.close()
+    checkpoint = CrawlCheckpoint(path)
+    assert checkpoint.resuming
+    checkpoint.failed("https://a.test/1", 1001)
+    checkpoint.close()
+    assert open_checkpoint(tmp_path).resume_urls() == [("https://a.test/1", False)]
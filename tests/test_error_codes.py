@@ -0,0 +1,51 @@
+import pytest
+from scrapy import signals
+from scrapy.http import Request, Response
+from scrapy.spidermiddlewares.httperror import HttpError
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet.error import ConnectionRefusedError, DNSLookupError, TimeoutError
+from twisted.python.failure import Failure
+
+from errors.extension import ErrorLoggingExtension
+from logs.error_codes import ErrorRegistry
+
+
+@pytest.mark.parametrize("exception", [DNSLookupError(), ConnectionRefusedError(), TimeoutError(), ValueError("bad")])
+def test_request_failures_keep_code_1001(exception):
+    error_type, values = ErrorRegistry().classify_failure(Failure(exception))
+    assert (error_type.name, error_type.code) == ("request_failure", 1001)
+    assert values["reason"]
+
+
+def test_http_errors_are_classified_by_status():
+    registry = ErrorRegistry(status_types={429: "bad_status"})
+    response = Response("https://shop.test/", status=503)
+    error_type, values = registry.classify_failure(Failure(HttpError(response)))
+    assert (error_type.name, error_type.code, values["status"]) == ("response_error", 1002, 503)
+    response = Response("https://shop.test/", status=429)
+    assert registry.classify_failure(Failure(HttpError(response)))[0].name == "bad_status"
+
+
+def test_exception_types_from_settings_resolve_subclasses():
+    registry = ErrorRegistry(exception_types={"twisted.internet.error.ConnectError": "network_error"})
+    assert registry.for_exception(ConnectionRefusedError).code == 1003
+    assert registry.for_exception(KeyError).code == 1001
+
+
+def test_request_dropped_is_logged(tmp_path):
+    crawler = get_crawler(Spider, {
+        "ERROR_LOGGING_ENABLED": True,
+        "ERROR_LOG_FILE": str(tmp_path / "errors.jsonl"),
+        "ERROR_LOG_LEGACY_FILE": str(tmp_path / "errors.json"),
+        "SIGNAL_LOG_FILE": str(tmp_path / "signals.log"),
+        "EVENT_LOG_FILE": str(tmp_path / "events.jsonl"),
+        "METRICS_SNAPSHOT_FILE": "",
+    })
+    extension = ErrorLoggingExtension.from_crawler(crawler)
+    spider = Spider.from_crawler(crawler, name="test")
+    results = crawler.signals.send_catch_log(signals.request_dropped, request=Request("https://shop.test/p/1"), spider=spider)
+    assert all(not isinstance(result, Failure) for _, result in results)
+    extension.error_handler.close()
+    [entry] = list(extension.error_handler.read_errors())
+    assert (entry["error_code"], entry["url"]) == (1003, "https://shop.test/p/1")
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from logs.error_store import ErrorStore, is_legacy_log, iter_legacy_errors, migrate_legacy_log
+from logs.sqlite_store import SqliteErrorStore
+
+ENTRIES = [
+    {"timestamp": 1700000000000, "error_code": 1001, "spider": "error", "url": "https://shop.test/p/1"},
+    {"timestamp": 1700000001000, "error_code": 1002, "spider": "error", "url": "https://shop.test/p/2",
+     "details": {"status": 503, "message": "Service Unavailable"}},
+]
+
+
+def write_legacy_log(path, entries=ENTRIES):
+    # The old writer dumped an empty array, then appended each entry indented after it.
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([], f)
+        for entry in entries:
+            f.write("\n")
+            json.dump(entry, f, indent=4)
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "jsonl":
+        store = ErrorStore(str(tmp_path / "errors.jsonl"))
+    else:
+        store = SqliteErrorStore(str(tmp_path / "errors.db"))
+    yield store
+    store.close()
+
+
+def test_legacy_format_is_read(tmp_path):
+    path = str(tmp_path / "errors.json")
+    write_legacy_log(path)
+    assert is_legacy_log(path)
+    assert list(iter_legacy_errors(path)) == ENTRIES
+
+
+def test_migration_moves_entries_and_renames_the_legacy_log(store, tmp_path):
+    path = str(tmp_path / "errors.json")
+    write_legacy_log(path)
+    store.append({"timestamp": 1700000002000, "error_code": 1003, "url": "https://shop.test/p/3"})
+    assert migrate_legacy_log(path, store) == 2
+    assert not os.path.exists(path)
+    assert os.path.exists(path + ".migrated")
+    assert sorted(entry["url"] for entry in store.iter_entries()) == [
+        "https://shop.test/p/1", "https://shop.test/p/2", "https://shop.test/p/3"]
+    assert migrate_legacy_log(path, store) == 0
+
+
+def test_interrupted_migration_leaves_the_store_untouched(store, tmp_path, monkeypatch):
+    path = str(tmp_path / "errors.json")
+    write_legacy_log(path)
+
+    def crash(path):
+        yield ENTRIES[0]
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr("logs.error_store.iter_legacy_errors", crash)
+    with pytest.raises(KeyboardInterrupt):
+        migrate_legacy_log(path, store)
+    assert list(store.iter_entries()) == []
+    assert is_legacy_log(path)
+    monkeypatch.undo()
+    assert migrate_legacy_log(path, store) == 2
+    assert len(list(store.iter_entries())) == 2
+
+
+def test_migration_is_not_repeated_if_the_rename_was_lost(store, tmp_path):
+    path = str(tmp_path / "errors.json")
+    write_legacy_log(path)
+    migrate_legacy_log(path, store)
+    # As if the process died after the import, before renaming the legacy log.
+    os.replace(path + ".migrated", path)
+    assert migrate_legacy_log(path, store) == 0
+    assert len(list(store.iter_entries())) == 2
+    assert os.path.exists(path + ".migrated")
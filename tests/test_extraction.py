@@ -0,0 +1,136 @@
+import pytest
+from cssselect import SelectorSyntaxError
+from parsel import Selector
+
+from benchmarks.common import load_response
+from errors.extraction import CardExtractor, WalkSelector
+from errors.spiders.error import PAGINATION, PRODUCT_CARDS
+
+FIXTURES = ("search_page.html", "search_page_last.html")
+
+CARDS = """
+<div class="results">
+  <div class="card" data-index="1">
+    <h2><a class="title link" href="/p/1"><span>First product</span></a></h2>
+    <span class="price"><span class="whole">19</span>.99</span>
+    <div class="rating"><i class="star small"><span class="alt">4.5 out of 5</span></i></div>
+    <p class="note"><!-- sponsored -->after the comment<b>bold</b>after bold</p>
+    <p class="mixed"><b>lead</b>tail text</p>
+    <span class="a b">two classes</span>
+    <img class="thumb" src="/1.jpg" alt="">
+    <br class="sep">
+  </div>
+  <div class="card" data-index="2">
+    <h2><span class="title"><span>Not a link</span></span></h2>
+    <span class="price"><span class="other">5</span></span>
+    <div class="rating"><i class="star"><span class="alt">3 out of 5</span></i></div>
+    <a class="next" aria-disabled="true">Next</a>
+    <span class="b a">reversed classes</span>
+  </div>
+  <div class="card" data-index="3">
+    <div class="outer"><div class="outer">nested</div>outer tail</div>
+    <a class="next" href="/page/2" aria-disabled="false">Next</a>
+    <p class="note">  </p>
+  </div>
+</div>
+"""
+
+SELECTORS = [
+    ".title>span::text",
+    ".title > span::text",
+    "a.title>span::text",
+    "h2 > a > span::text",
+    ".price .whole::text",
+    ".price>.whole::text",
+    ".price::text",
+    ".rating .star.small .alt::text",
+    ".star .alt::text",
+    ".note::text",
+    ".mixed::text",
+    ".a.b::text",
+    ".outer::text",
+    ".next::attr(href)",
+    "a::attr(href)",
+    ".thumb::attr(alt)",
+    "[aria-disabled='true']",
+    "a[aria-disabled='true']::text",
+    "a[aria-disabled=\"false\"]::attr(href)",
+    "[aria-disabled]::attr(aria-disabled)",
+    "[data-index='3'] .outer::text",
+    "[data-index=\"2\"] .b.a::text",
+    ".sep",
+    ".thumb",
+    ".price",
+    ".missing::text",
+    ".missing::attr(href)",
+    ".card .missing > span::text",
+]
+
+# Outside the walk's subset: evaluated through parsel's XPath translation.
+UNSUPPORTED = [
+    ".note ::text",
+    ".mixed > ::text",
+    "h2 *::text",
+    "span:not(.whole)::text",
+    ".price + .rating .alt::text",
+    "span:first-child::text",
+]
+
+
+def parsel_fields(sel, card_css, fields):
+    return [{name: card.css(css).get() for name, css in fields.items()} for card in sel.css(card_css)]
+
+
+@pytest.mark.parametrize("css", SELECTORS)
+def test_walk_matches_parsel(css):
+    extractor = CardExtractor(".card", {"field": css})
+    assert extractor._xpath_fields == []
+    sel = Selector(text=CARDS)
+    assert list(extractor.extract(sel)) == parsel_fields(sel, ".card", {"field": css})
+
+
+@pytest.mark.parametrize("css", UNSUPPORTED)
+def test_unsupported_selectors_fall_back_to_parsel(css):
+    with pytest.raises(ValueError):
+        WalkSelector.parse(css)
+    extractor = CardExtractor(".card", {"field": css})
+    sel = Selector(text=CARDS)
+    assert list(extractor.extract(sel)) == parsel_fields(sel, ".card", {"field": css})
+
+
+def test_invalid_css_is_rejected_like_parsel():
+    # An unquoted attribute value must be an identifier.
+    with pytest.raises(ValueError):
+        WalkSelector.parse("[data-index=3]")
+    with pytest.raises(SelectorSyntaxError):
+        CardExtractor(".card", {"field": "[data-index=3]"})
+    with pytest.raises(SelectorSyntaxError):
+        Selector(text=CARDS).css("[data-index=3]")
+
+
+def test_fields_are_matched_together():
+    fields = {f"f{index}": css for index, css in enumerate(SELECTORS + UNSUPPORTED)}
+    sel = Selector(text=CARDS)
+    assert list(CardExtractor(".card", fields).extract(sel)) == parsel_fields(sel, ".card", fields)
+
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_product_cards_match_parsel_on_saved_pages(fixture):
+    response = load_response(fixture)
+    expected = parsel_fields(response, PRODUCT_CARDS.card_css, PRODUCT_CARDS.fields)
+    assert expected
+    assert list(PRODUCT_CARDS.extract(response)) == expected
+
+
+@pytest.mark.parametrize("fixture", FIXTURES)
+def test_pagination_matches_parsel_on_saved_pages(fixture):
+    response = load_response(fixture)
+    for name, css in PAGINATION.fields.items():
+        assert PAGINATION.get(response, name) == response.css(css).get()
+
+
+def test_pagination_matches_parsel_on_edge_cases():
+    sel = Selector(text=CARDS)
+    for css in ("a.next::attr(href)", "[aria-disabled='true']", ".missing::attr(href)", ".note ::text"):
+        page = type(PAGINATION)({"field": css})
+        assert page.get(sel, "field") == sel.css(css).get()
@@ -0,0 +1,151 @@
+import json
+
+import pytest
+from scrapy.utils.test import get_crawler
+
+from errors.checkpoint import CrawlCheckpoint
+from errors.items import ErrorsItem, clean_text, parse_count, parse_price, parse_stars
+from errors.pipelines import ErrorsPipeline, ItemExportPipeline, RejectedItem
+from logs.error_codes import ErrorCode, ErrorRegistry
+from logs.error_handler import ErrorManager
+
+PAGE = "https://www.amazon.com/s?k=mop&page=2"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("$1,299.99", 1299.99),
+    ("24", 24.0),
+    ("  7.", 7.0),
+    ("EUR 1,000", 1000.0),
+    (12, 12.0),
+    (3.5, 3.5),
+])
+def test_parse_price(value, expected):
+    assert parse_price(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("4.5 out of 5 stars", 4.5),
+    ("5.0 out of 5 stars", 5.0),
+    ("0", 0.0),
+    (3, 3.0),
+])
+def test_parse_stars(value, expected):
+    assert parse_stars(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1,234", 1234),
+    ("(2.1K)", 2100),
+    ("3m", 3_000_000),
+    ("  87 ratings", 87),
+    (42, 42),
+])
+def test_parse_count(value, expected):
+    assert parse_count(value) == expected
+
+
+@pytest.mark.parametrize("parse, value", [
+    (parse_price, "free"),
+    (parse_price, ""),
+    (parse_stars, "6 out of 5 stars"),
+    (parse_stars, "no rating"),
+    (parse_count, "none yet"),
+])
+def test_unparseable_values_raise_value_error(parse, value):
+    with pytest.raises(ValueError):
+        parse(value)
+
+
+def test_clean_text():
+    assert clean_text("  Spin   mop\n with bucket ") == "Spin mop with bucket"
+
+
+class FakeErrorManager(ErrorManager):
+    def __init__(self):
+        self.registry = ErrorRegistry()
+        self.logged = []
+
+    def log_errors(self, entries):
+        self.logged.extend(entries)
+
+
+class Spider:
+    name = "test"
+    checkpoint = None
+
+
+@pytest.fixture
+def pipeline():
+    crawler = get_crawler()
+    crawler.stats.open_spider(None)
+    return ErrorsPipeline(stats=crawler.stats, error_manager=FakeErrorManager(), reject_batch_size=1)
+
+
+def item(**fields):
+    return ErrorsItem({"name": " Mop ", "price": "$19.99", "stars": "4.5 out of 5 stars",
+                       "No_of_reviews": "(1.2K)", "url": PAGE, **fields})
+
+
+def test_valid_item_is_normalized(pipeline):
+    result = pipeline.process_item(item(), Spider())
+    assert dict(result) == {"name": "Mop", "price": 19.99, "stars": 4.5, "No_of_reviews": 1200, "url": PAGE}
+    assert pipeline.stats.get_value("item_pipeline/accepted") == 1
+
+
+@pytest.mark.parametrize("fields, code", [
+    ({"price": ""}, ErrorCode.MISSING_REQUIRED_DATA),
+    ({"stars": "9 out of 5 stars"}, ErrorCode.INVALID_ITEM_DATA),
+])
+def test_rejected_item_is_logged_with_its_page(pipeline, fields, code):
+    with pytest.raises(RejectedItem) as rejected:
+        pipeline.process_item(item(**fields), Spider())
+    assert rejected.value.code == code
+    [entry] = pipeline.error_manager.logged
+    assert entry.url == PAGE
+    assert int(entry.error_code) == code
+    assert pipeline.stats.get_value(f"item_pipeline/rejected/{int(code)}") == 1
+
+
+def test_rejected_item_without_a_page_has_no_url(pipeline):
+    with pytest.raises(RejectedItem):
+        pipeline.reject({"name": "Mop"}, Spider(), "missing_required_data", "Missing price")
+    assert pipeline.error_manager.logged[0].url is None
+
+
+def test_stale_part_file_is_replaced_without_a_resume(tmp_path):
+    export_path = tmp_path / "items.jsonl"
+    (tmp_path / "items.jsonl.part").write_text('{"url": "stale"}\n')
+    pipeline = ItemExportPipeline(str(export_path), batch_size=2)
+    pipeline.open_spider(Spider())
+    pipeline.process_item(dict(item()), Spider())
+    pipeline.close_spider(Spider())
+    pipeline.spider_closed(Spider(), "finished")
+    rows = [json.loads(line) for line in export_path.read_text().splitlines()]
+    assert [row["url"] for row in rows] == [PAGE]
+    assert not (tmp_path / "items.jsonl.part").exists()
+
+
+def test_part_file_is_resumed_with_typed_items(tmp_path):
+    export_path = tmp_path / "items.jsonl"
+    pages = [f"{PAGE}&n={n}" for n in range(6)]
+
+    def run(urls, reason):
+        spider = Spider()
+        spider.checkpoint = CrawlCheckpoint(str(tmp_path / "crawl.db"), batch_size=1)
+        pipeline = ItemExportPipeline(str(export_path), batch_size=4)
+        pipeline.open_spider(spider)
+        for url in urls:
+            spider.checkpoint.queued(url)
+            pipeline.process_item(item(url=url), spider)
+            spider.checkpoint.done(url)
+        pipeline.close_spider(spider)
+        pipeline.spider_closed(spider, reason)
+        spider.checkpoint.close(reason)
+
+    run(pages[:3], "shutdown")
+    assert not export_path.exists()
+    assert (tmp_path / "items.jsonl.part").exists()
+    run(pages[3:], "finished")
+    rows = [json.loads(line) for line in export_path.read_text().splitlines()]
+    assert [row["url"] for row in rows] == pages
@@ -0,0 +1,98 @@
+import random
+import threading
+
+import pytest
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Request
+from scrapy.spiders import Spider
+
+from errors.middlewares import ProxyDownloaderMiddleware
+from errors.proxy_manager import ProxyProvider, ProxyRouter, QuotaTracker
+
+
+def make_router(*weights):
+    providers = [ProxyProvider(f"p{index}", f"http://p{index}:8000", weight=weight) for index, weight in enumerate(weights)]
+    return ProxyRouter(providers, rng=random.Random(0))
+
+
+def test_choose_skips_zero_weight_providers():
+    router = make_router(0.0, 1.0)
+    assert {router.choose().name for _ in range(50)} == {"p1"}
+
+
+def test_choose_with_every_score_zero_is_uniform():
+    router = make_router(0.0, 0.0)
+    assert {router.choose().name for _ in range(50)} == {"p0", "p1"}
+
+
+def test_choose_prefers_named_providers_when_available():
+    router = make_router(1.0, 1.0)
+    assert {router.choose(prefer=["p1"]).name for _ in range(20)} == {"p1"}
+    router.providers["p1"].quota = type("Exhausted", (), {"is_exhausted": lambda self: True})()
+    assert router.choose(prefer=["p1"]).name == "p0"
+
+
+def test_choose_honours_exclusion():
+    router = make_router(1.0, 1.0)
+    assert {router.choose(exclude=["p0"]).name for _ in range(20)} == {"p1"}
+    assert router.choose(exclude=["p0", "p1"]) is None
+
+
+def test_middleware_routes_through_the_chosen_provider():
+    middleware = ProxyDownloaderMiddleware(make_router(1.0))
+    request = Request("https://shop.test/p/1")
+    middleware.process_request(request, Spider("test"))
+    assert request.meta["proxy_provider"] == "p0"
+    assert request.meta["proxy"] == "http://p0:8000"
+
+
+def test_middleware_drops_a_request_no_provider_can_take(caplog):
+    router = make_router(1.0)
+    router.choose = lambda exclude=(), prefer=(): None
+    request = Request("https://shop.test/p/1", meta={"proxy_exclude": ["p0"]})
+    with pytest.raises(IgnoreRequest):
+        ProxyDownloaderMiddleware(router).process_request(request, Spider("test"))
+    assert "proxy" not in request.meta
+    assert "No proxy provider available for https://shop.test/p/1" in caplog.text
+
+
+class BlockingBackend:
+    """Quota backend that answers once released."""
+
+    def __init__(self, usage=(10, 100)):
+        self.usage = usage
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.release.wait(5)
+        return self.usage
+
+
+def test_refresh_with_wait_waits_for_the_refresh_in_flight():
+    backend = BlockingBackend()
+    tracker = QuotaTracker(backend=backend)
+    assert tracker.refresh()
+    assert backend.started.wait(5)
+    waiter = threading.Thread(target=tracker.refresh, kwargs={"wait": True})
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    backend.release.set()
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert tracker.remaining() == 90
+
+
+def test_requests_sent_during_a_refresh_are_kept():
+    backend = BlockingBackend()
+    tracker = QuotaTracker(backend=backend)
+    tracker.record_request(3)
+    assert tracker.refresh()
+    assert backend.started.wait(5)
+    tracker.record_request(2)
+    backend.release.set()
+    assert tracker._refreshed.wait(5)
+    assert tracker.local_requests == 2
+    assert tracker.remaining() == 88
@@ -0,0 +1,103 @@
+import io
+import json
+
+import pytest
+
+from logs.error_store import ErrorStore
+from logs.query import main, parse_time
+from logs.sqlite_store import SqliteErrorStore
+
+# 2023-11-14 22:00:00 UTC
+T = 1699999200
+
+ENTRIES = [
+    {"timestamp": T * 1000, "error_code": 1001, "spider": "a", "url": "https://shop.test/p/1"},
+    {"timestamp": (T + 600) * 1000, "error_code": 1002, "spider": "b", "url": "https://other.test/p/2"},
+    {"timestamp": (T + 3600) * 1000, "error_code": 1001, "spider": "b", "url": "https://shop.test/p/3", "count": 5},
+    {"timestamp": (T + 7200) * 1000, "error_code": 1003, "spider": "a", "url": "https://shop.test/p/4"},
+]
+
+
+@pytest.fixture(params=["errors.jsonl", "errors.db"])
+def store_path(request, tmp_path):
+    path = str(tmp_path / request.param)
+    store = SqliteErrorStore(path) if path.endswith(".db") else ErrorStore(path)
+    store.append_many(ENTRIES)
+    store.close()
+    return path
+
+
+@pytest.fixture
+def store(store_path):
+    store = SqliteErrorStore(store_path) if store_path.endswith(".db") else ErrorStore(store_path)
+    yield store
+    store.close()
+
+
+def urls(store, **filters):
+    return [entry["url"].rsplit("/", 1)[1] for entry in store.query(**filters)]
+
+
+def test_filter_by_code(store):
+    assert urls(store, codes=[1001]) == ["1", "3"]
+    assert urls(store, codes=[1002, 1003]) == ["2", "4"]
+    assert store.count(codes=[1001]) == 6
+
+
+def test_filter_by_spider_and_domain(store):
+    assert urls(store, spider="b") == ["2", "3"]
+    assert urls(store, domain="other.test") == ["2"]
+    assert store.count(spider="b") == 6
+
+
+def test_filter_by_time_since_inclusive_until_exclusive(store):
+    assert urls(store, since=T + 600) == ["2", "3", "4"]
+    assert urls(store, until=T + 3600) == ["1", "2"]
+    assert urls(store, since=T + 600, until=T + 3600) == ["2"]
+
+
+def test_filters_combine(store):
+    assert urls(store, codes=[1001, 1003], spider="a", since=T + 1) == ["4"]
+    assert urls(store, codes=[1001], limit=1) == ["1"]
+    assert store.count(codes=[1002], spider="a") == 0
+
+
+def test_histogram(store):
+    assert store.histogram(3600) == [(T, 2), (T + 3600, 5), (T + 7200, 1)]
+    assert store.histogram(3600, since=T + 600) == [(T, 1), (T + 3600, 5), (T + 7200, 1)]
+
+
+def run(*argv):
+    out = io.StringIO()
+    assert main(list(argv), out=out) == 0
+    return out.getvalue()
+
+
+def test_cli_count(store_path):
+    assert run("--store", store_path, "count", "--code", "1001") == "6\n"
+    assert run("--store", store_path, "count", "--spider", "a", "--code", "1002") == "0\n"
+
+
+def test_cli_list_adds_the_local_time(store_path):
+    lines = run("--store", store_path, "--tz", "UTC", "list", "--spider", "a", "--limit", "1").splitlines()
+    assert [json.loads(line) for line in lines] == [dict(ENTRIES[0], time="2023-11-14 22:00:00.000")]
+    lines = run("--store", store_path, "--tz", "Asia/Kolkata", "list", "--code", "1003").splitlines()
+    assert json.loads(lines[0])["time"] == "2023-11-15 05:30:00.000"
+
+
+def test_cli_histogram_reads_dates_in_the_given_zone(store_path):
+    output = run("--store", store_path, "--tz", "UTC", "histogram", "--bucket", "3600",
+                 "--since", "2023-11-14 22:10:00", "--until", "2023-11-15")
+    assert output == "2023-11-14 22:00:00\t1\n2023-11-14 23:00:00\t5\n"
+
+
+def test_cli_rejects_bad_times(store_path, capsys):
+    with pytest.raises(SystemExit):
+        main(["--store", store_path, "count", "--since", "yesterday"])
+    assert "Unrecognised time" in capsys.readouterr().err
+
+
+def test_parse_time():
+    assert parse_time("2h", now=T) == T - 7200
+    assert parse_time(str(T)) == T
+    assert parse_time("2023-11-14", zone="UTC") == T - 22 * 3600
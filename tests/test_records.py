@@ -0,0 +1,51 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from logs import records
+from logs.error_store import ErrorStore
+from logs.records import ErrorRecord, dumps_entry
+
+
+def record(**fields):
+    values = dict(category="Crawling Error", subcategory="Request Failure", code=1001,
+                  message="TimeoutError", spider="error", url="https://shop.test/p/1", timestamp=1700000000000)
+    values.update(fields)
+    return ErrorRecord(**values)
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def serializer(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(records, "orjson", None)
+    elif records.orjson is None:
+        pytest.skip("orjson is not installed")
+
+
+def test_record_reads_like_its_dict():
+    entry = record()
+    assert entry == entry.to_dict()
+    assert entry["error_code"] == 1001
+    assert entry.get("missing", "default") == "default"
+    assert json.loads(dumps_entry(entry)) == entry.to_dict()
+
+
+def test_record_is_not_hashable():
+    with pytest.raises(TypeError):
+        hash(record())
+
+
+def test_non_json_values_are_written_as_text(serializer):
+    error = ValueError("bad price")
+    assert json.loads(dumps_entry({"event": "reject", "price": Decimal("19.99"), "cause": error, "codes": {503}})) == {
+        "event": "reject", "price": "19.99", "cause": "bad price", "codes": "{503}"}
+    assert json.loads(dumps_entry(record(message=error)))["error_message"] == "bad price"
+
+
+def test_one_odd_entry_does_not_lose_the_batch(tmp_path, serializer):
+    store = ErrorStore(str(tmp_path / "errors.jsonl"))
+    store.append_many([record(), {"event": "retry", "cause": object()}, record(url="https://shop.test/p/2")])
+    store.close()
+    assert [entry.get("url") for entry in ErrorStore(str(tmp_path / "errors.jsonl"))] == [
+        "https://shop.test/p/1", None, "https://shop.test/p/2"]
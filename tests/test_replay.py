@@ -0,0 +1,73 @@
+import time
+
+from scrapy.utils.test import get_crawler
+
+from errors.checkpoint import CrawlCheckpoint, read_failed_urls
+from errors.replay import FailedUrlReplay
+from errors.spiders.error import ErrorSpider
+
+
+def failed_crawl(path, spider="error"):
+    checkpoint = CrawlCheckpoint(path)
+    checkpoint.set_meta("spider", spider)
+    for i in range(20):
+        checkpoint.queued(f"https://a.test/{i}")
+        checkpoint.failed(f"https://a.test/{i}", 1001)
+    checkpoint.queued("https://b.test/")
+    checkpoint.failed("https://b.test/", 1002, 503)
+    checkpoint.queued("https://b.test/gone")
+    checkpoint.failed("https://b.test/gone", status=404)
+    checkpoint.queued("https://c.test/")
+    checkpoint.done("https://c.test/")
+    checkpoint.close("finished")
+
+
+def test_read_failed_urls_filters_by_code_spider_and_time(tmp_path):
+    path = str(tmp_path / "crawl.db")
+    start = time.time()
+    failed_crawl(path)
+    assert len(list(read_failed_urls(path))) == 22
+    assert list(read_failed_urls(path, codes=[1002])) == [("https://b.test/", 1002, 503), ("https://b.test/gone", 1002, 404)]
+    assert len(list(read_failed_urls(path, since=start - 1, until=time.time() + 1))) == 22
+    assert list(read_failed_urls(path, since=time.time() + 1)) == []
+    assert list(read_failed_urls(path, spider="other")) == []
+    assert list(read_failed_urls(str(tmp_path / "missing.db"))) == []
+
+
+def test_reading_does_not_change_a_finished_checkpoint(tmp_path):
+    path = str(tmp_path / "crawl.db")
+    failed_crawl(path)
+    list(read_failed_urls(path))
+    checkpoint = CrawlCheckpoint(path)
+    assert not checkpoint.resuming
+    checkpoint.close()
+
+
+def test_replay_yields_every_failure_with_its_providers(tmp_path):
+    path = str(tmp_path / "crawl.db")
+    failed_crawl(path)
+    replay = FailedUrlReplay(path, codes=[1001, 1002], spider="error", providers={"1001": ["scraperapi"]})
+    replayed = dict(replay)
+    assert len(replayed) == 22
+    assert replayed["https://a.test/0"] == {"replay_code": 1001, "proxy_prefer": ["scraperapi"]}
+    assert replayed["https://b.test/"] == {"replay_code": 1002}
+    replay.close()
+
+
+def test_replay_has_its_own_checkpoint(tmp_path):
+    settings = {
+        "CRAWL_CHECKPOINT_FILE": str(tmp_path / "crawl.db"),
+        "REPLAY_CHECKPOINT_FILE": str(tmp_path / "replay.db"),
+        "ERROR_LOG_FILE": str(tmp_path / "errors.jsonl"),
+        "ERROR_LOG_LEGACY_FILE": str(tmp_path / "errors.json"),
+        "SIGNAL_LOG_FILE": str(tmp_path / "signals.log"),
+        "EVENT_LOG_FILE": str(tmp_path / "events.jsonl"),
+    }
+    crawl = ErrorSpider.from_crawler(get_crawler(ErrorSpider, settings))
+    replay = ErrorSpider.from_crawler(get_crawler(ErrorSpider, settings), replay=True)
+    try:
+        assert crawl.checkpoint.path == settings["CRAWL_CHECKPOINT_FILE"]
+        assert replay.checkpoint.path == settings["REPLAY_CHECKPOINT_FILE"]
+    finally:
+        crawl.closed("shutdown")
+        replay.closed("shutdown")
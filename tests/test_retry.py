@@ -0,0 +1,156 @@
+import random
+
+import pytest
+from scrapy.exceptions import IgnoreRequest, NotSupported
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+from scrapy.exceptions import DontCloseSpider
+from twisted.internet.error import DNSLookupError, TimeoutError
+from twisted.internet.task import Clock
+
+from errors.retry import AdaptiveRetryMiddleware, DomainBackoff, RetryBudget, RetryScheduled
+
+
+class FakeManager:
+    def __init__(self):
+        self.events = []
+
+    def log_event(self, decision, spider, url, **fields):
+        self.events.append((decision, fields))
+
+
+@pytest.fixture
+def crawler():
+    crawler = get_crawler(Spider, {"ADAPTIVE_RETRY_BUDGET_MIN": 10})
+    crawler.stats.open_spider(None)
+    return crawler
+
+
+@pytest.fixture
+def spider(crawler):
+    spider = Spider.from_crawler(crawler, name="test")
+    spider.error_manager = FakeManager()
+    return spider
+
+
+class FakeEngine:
+    def __init__(self):
+        self.scheduled = []
+
+    def crawl(self, request):
+        self.scheduled.append(request)
+
+
+@pytest.fixture
+def middleware(crawler):
+    crawler.engine = FakeEngine()
+    middleware = AdaptiveRetryMiddleware.from_crawler(crawler)
+    middleware.clock = Clock()
+    return middleware
+
+
+def retried(middleware, method, *args):
+    """The retry request scheduled by a middleware call, after its backoff."""
+    with pytest.raises(RetryScheduled):
+        method(*args)
+    middleware.clock.advance(middleware.max_delay)
+    return middleware.crawler.engine.scheduled.pop()
+
+
+def test_budget_withdraw_until_empty():
+    budget = RetryBudget(ratio=0.5, min_tokens=2, max_tokens=5)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_budget_deposit_and_refund_are_capped():
+    budget = RetryBudget(ratio=1, min_tokens=5, max_tokens=5)
+    budget.deposit()
+    assert budget.tokens == 5
+    budget.refund()
+    assert budget.tokens == 5
+    budget.withdraw()
+    budget.refund()
+    assert budget.tokens == 5
+
+
+def test_backoff_grows_exponentially_with_jitter_and_resets():
+    backoff = DomainBackoff(base_delay=1.0, max_delay=8.0, rng=random.Random(0))
+    delays = [backoff.failure("a.test") for _ in range(6)]
+    for delay, full in zip(delays, [1, 2, 4, 8, 8, 8]):
+        assert full / 2 <= delay <= full
+    assert backoff.failure("b.test") <= 1
+    backoff.success("a.test")
+    assert backoff.failure("a.test") <= 1
+
+
+def test_network_error_is_retried(middleware, spider):
+    request = Request("https://shop.test/p/1")
+    retry = retried(middleware, middleware.process_exception, request, DNSLookupError(), spider)
+    assert isinstance(retry, Request)
+    assert retry.meta["retry_times"] == 1
+    assert spider.error_manager.events[0][0] == "retry"
+
+
+@pytest.mark.parametrize("exception", [IgnoreRequest(), NotSupported(), ValueError("offsite")])
+def test_other_exceptions_are_not_retried_and_cost_nothing(middleware, spider, exception):
+    tokens = middleware.budget.tokens
+    assert middleware.process_exception(Request("https://shop.test/p/1"), exception, spider) is None
+    assert middleware.budget.tokens == tokens
+    assert spider.error_manager.events == []
+
+
+def test_budget_exhaustion_gives_up(middleware, spider):
+    middleware.budget = RetryBudget(ratio=0, min_tokens=1, max_tokens=1)
+    retried(middleware, middleware.process_exception, Request("https://shop.test/p/1"), TimeoutError(), spider)
+    assert middleware.process_exception(Request("https://shop.test/p/2"), TimeoutError(), spider) is None
+    decision, fields = spider.error_manager.events[-1]
+    assert (decision, fields["reason"]) == ("give_up", "budget_exhausted")
+
+
+def test_max_retries_refunds_the_token(middleware, spider):
+    middleware.budget = RetryBudget(ratio=0, min_tokens=3, max_tokens=3)
+    request = Request("https://shop.test/p/1", meta={"retry_times": 3})
+    assert middleware.process_exception(request, TimeoutError(), spider) is None
+    assert middleware.budget.tokens == 3
+    assert spider.error_manager.events[-1][1]["reason"] == "max_retries"
+
+
+def test_permanent_status_is_not_retried(middleware, spider):
+    request = Request("https://shop.test/p/1")
+    response = Response(request.url, status=404, request=request)
+    assert middleware.process_response(request, response, spider) is response
+    assert spider.error_manager.events[-1][1]["reason"] == "permanent"
+
+
+def test_rate_limit_retry_excludes_the_provider(middleware, spider):
+    request = Request("https://shop.test/p/1", meta={"proxy_provider": "scraperapi"})
+    response = Response(request.url, status=429, request=request)
+    retry = retried(middleware, middleware.process_response, request, response, spider)
+    assert retry.meta["proxy_exclude"] == ["scraperapi"]
+
+
+def test_retry_waits_outside_the_downloader(middleware, spider):
+    request = Request("https://shop.test/p/1")
+    response = Response(request.url, status=503, request=request, headers={"Retry-After": "5"})
+    with pytest.raises(RetryScheduled):
+        middleware.process_response(request, response, spider)
+    with pytest.raises(DontCloseSpider):
+        middleware.spider_idle(spider)
+    middleware.clock.advance(4.9)
+    assert middleware.crawler.engine.scheduled == []
+    middleware.clock.advance(0.1)
+    assert [r.url for r in middleware.crawler.engine.scheduled] == [request.url]
+    middleware.spider_idle(spider)
+
+
+def test_pending_retries_are_cancelled_on_close(middleware, spider):
+    with pytest.raises(RetryScheduled):
+        middleware.process_exception(Request("https://shop.test/p/1"), TimeoutError(), spider)
+    middleware.spider_closed(spider)
+    middleware.clock.advance(middleware.max_delay)
+    assert middleware.crawler.engine.scheduled == []
@@ -0,0 +1,140 @@
+import os
+import sys
+import logging
+import importlib
+
+import pytest
+
+from logs import rotation
+from logs.rotation import RotatingFile, apply_retention, segment_paths
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def shared_files(monkeypatch):
+    monkeypatch.setattr(RotatingFile, "_instances", {})
+
+
+def wait_for_segments():
+    # Compression and retention run on the single background worker, in order.
+    rotation._compressor.submit(lambda: None).result()
+
+
+def test_rolls_over_by_size(tmp_path):
+    path = str(tmp_path / "app.log")
+    clock = FakeClock()
+    log = RotatingFile(path, max_bytes=10, clock=clock)
+    log.write("12345678\n")
+    clock.now += 1
+    log.write("abcdefgh\n")
+    log.close()
+    wait_for_segments()
+    [segment] = segment_paths(path)
+    assert open(segment).read() == "12345678\n"
+    assert open(path).read() == "abcdefgh\n"
+
+
+def test_rolls_over_daily_and_compresses(tmp_path):
+    path = str(tmp_path / "app.log")
+    clock = FakeClock()
+    log = RotatingFile(path, daily=True, compress="gzip", clock=clock)
+    log.write("day one\n")
+    clock.now += 86400
+    log.write("day two\n")
+    log.close()
+    wait_for_segments()
+    [segment] = segment_paths(path)
+    assert segment.endswith(".gz")
+    with rotation.open_segment(segment) as f:
+        assert f.read() == "day one\n"
+
+
+def test_retention_keeps_newest_segments(tmp_path):
+    path = str(tmp_path / "app.log")
+    clock = FakeClock()
+    log = RotatingFile(path, max_bytes=1, retention_segments=2, clock=clock)
+    for i in range(5):
+        log.write(f"{i}\n")
+        clock.now += 1
+    log.close()
+    wait_for_segments()
+    assert [open(segment).read() for segment in segment_paths(path)] == ["2\n", "3\n"]
+
+
+def test_retention_by_age(tmp_path):
+    path = str(tmp_path / "app.log")
+    old, new = f"{path}.20240101-000000", f"{path}.20240301-000000"
+    for segment in (old, new):
+        open(segment, "w").close()
+    now = 1_700_000_000
+    os.utime(old, (now - 10 * 86400, now - 10 * 86400))
+    os.utime(new, (now - 86400, now - 86400))
+    apply_retention(path, retention_days=7, clock=lambda: now)
+    assert segment_paths(path) == [new]
+
+
+def test_for_path_shares_one_instance_and_merges_options(tmp_path):
+    path = str(tmp_path / "errors.jsonl")
+    first = RotatingFile.for_path(path)
+    second = RotatingFile.for_path(path, max_bytes=100, daily=True, compress="gzip")
+    assert first is second
+    assert (first.max_bytes, first.daily, first.compress) == (100, True, "gzip")
+
+
+def test_for_path_keeps_first_value_on_conflict(tmp_path, caplog):
+    path = str(tmp_path / "errors.jsonl")
+    RotatingFile.for_path(path, max_bytes=100)
+    with caplog.at_level(logging.WARNING, logger="logs.rotation"):
+        shared = RotatingFile.for_path(path, max_bytes=200, retention_segments=3)
+    assert (shared.max_bytes, shared.retention_segments) == (100, 3)
+    assert "ignoring max_bytes=200" in caplog.text
+
+
+def test_rotation_is_active_after_importing_run_spider(tmp_path, monkeypatch):
+    from scrapy.utils.project import get_project_settings
+    from logs.error_handler import ErrorManager
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SCRAPY_SETTINGS_MODULE", "errors.settings")
+    monkeypatch.delitem(sys.modules, "run_spider", raising=False)
+    run_spider = importlib.import_module("run_spider")
+    settings = get_project_settings()
+    manager = ErrorManager.from_settings(settings)
+    try:
+        expected = rotation.rotation_options(settings)
+        assert expected["max_bytes"] and expected["retention_segments"]
+        for shared in (manager.store.file, manager.event_store.file):
+            assert {name: getattr(shared, name) for name in expected} == expected
+    finally:
+        manager.close()
+    assert not hasattr(run_spider, "error_handler")
+
+
+@pytest.mark.parametrize("log_file", ["", "scrapy.log"])
+def test_crawler_process_always_installs_a_log_handler(tmp_path, monkeypatch, log_file):
+    from scrapy.settings import Settings
+    from scrapy.utils.log import LogCounterHandler
+    import run_spider
+
+    monkeypatch.chdir(tmp_path)
+    handlers = list(logging.root.handlers)
+    try:
+        run_spider.crawler_process(Settings({"LOG_FILE": log_file, "LOG_LEVEL": "INFO"}))
+        added = [h for h in logging.root.handlers if h not in handlers and not isinstance(h, LogCounterHandler)]
+        assert len(added) == 1
+        if log_file:
+            assert isinstance(added[0], rotation.SegmentedFileHandler)
+        else:
+            assert isinstance(added[0], logging.StreamHandler)
+    finally:
+        for handler in logging.root.handlers[:]:
+            if handler not in handlers:
+                logging.root.removeHandler(handler)
+                handler.close()
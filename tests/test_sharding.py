@@ -0,0 +1,56 @@
+import os
+
+from scrapy.settings import Settings
+
+from errors.sharding import URLS_FILE, apply_shard_settings, merge_shards, split_urls
+from logs.error_handler import store_from_settings
+
+
+def test_resplitting_the_same_urls_leaves_shard_files_untouched(tmp_path):
+    urls = [f"https://shop-{i % 5}.test/p/{i}" for i in range(50)]
+    dirs, counts = split_urls(urls, 3, str(tmp_path))
+    assert sum(counts) == 50
+    paths = [os.path.join(shard_dir, URLS_FILE) for shard_dir in dirs]
+    for path in paths:
+        os.utime(path, (1_000_000, 1_000_000))
+
+    split_urls(urls, 3, str(tmp_path))
+    assert [os.stat(path).st_mtime for path in paths] == [1_000_000] * 3
+    assert not any(name.endswith(".tmp") for shard_dir in dirs for name in os.listdir(shard_dir))
+
+    split_urls(urls + ["https://shop-0.test/new"], 3, str(tmp_path))
+    changed = [path for path in paths if os.stat(path).st_mtime != 1_000_000]
+    assert len(changed) == 1
+    assert open(changed[0]).read().endswith("https://shop-0.test/new\n")
+
+
+def make_settings(tmp_path):
+    return Settings({"ERROR_LOG_FILE": str(tmp_path / "errors.jsonl")})
+
+
+def log_errors(settings, shard_dir, urls):
+    shard_settings = settings.copy()
+    apply_shard_settings(shard_settings, shard_dir)
+    store = store_from_settings(shard_settings)
+    store.append_many([{"error_code": 1001, "url": url, "timestamp": 0} for url in urls])
+    store.close()
+
+
+def test_merging_a_resumed_run_appends_only_new_entries(tmp_path):
+    settings = make_settings(tmp_path)
+    dirs = [str(tmp_path / "shard-00"), str(tmp_path / "shard-01")]
+    log_errors(settings, dirs[0], ["https://a.test/1", "https://a.test/2"])
+    log_errors(settings, dirs[1], ["https://b.test/1"])
+    assert merge_shards(dirs, settings)["errors"]["total"] == 3
+
+    # The resumed run adds one error to the first shard.
+    log_errors(settings, dirs[0], ["https://a.test/3"])
+    summary = merge_shards(dirs, settings)
+    assert summary["errors"]["total"] == 4
+    assert [shard["errors"] for shard in summary["shards"]] == [3, 1]
+
+    store = store_from_settings(settings)
+    assert sorted(entry["url"] for entry in store.iter_entries()) == [
+        "https://a.test/1", "https://a.test/2", "https://a.test/3", "https://b.test/1",
+    ]
+    store.close()
@@ -0,0 +1,57 @@
+from errors.throttle import DomainThrottle
+
+
+def window(throttle, requests=20, errors=0, latency=0.5):
+    for i in range(requests):
+        throttle.record(i < errors, latency)
+    return throttle.adjust()
+
+
+def test_too_few_samples_keeps_settings():
+    throttle = DomainThrottle(4, 1.0, min_samples=10)
+    assert window(throttle, requests=5, errors=5) == (None, None, None)
+    assert (throttle.concurrency, throttle.delay) == (4, 1.0)
+
+
+def test_errors_halve_concurrency_and_double_delay():
+    throttle = DomainThrottle(8, 0.0, max_delay=1.0)
+    assert window(throttle, errors=10)[0] == "decrease"
+    assert (throttle.concurrency, throttle.delay) == (4, 0.25)
+    for _ in range(5):
+        window(throttle, errors=10)
+    assert (throttle.concurrency, throttle.delay) == (1, 1.0)
+
+
+def test_quiet_windows_remove_delay_before_adding_concurrency():
+    throttle = DomainThrottle(2, 1.0, max_concurrency=4)
+    decisions = [(window(throttle)[0], throttle.concurrency, throttle.delay) for _ in range(6)]
+    assert decisions == [
+        ("increase", 2, 0.5), ("increase", 2, 0.25), ("increase", 2, 0.0),
+        ("increase", 3, 0.0), ("increase", 4, 0.0), ("hold", 4, 0.0),
+    ]
+
+
+def test_moderate_error_rate_holds():
+    throttle = DomainThrottle(4, 0.0)
+    assert window(throttle, requests=20, errors=1)[0] == "hold"
+    assert throttle.concurrency == 4
+
+
+def test_latency_above_baseline_holds():
+    throttle = DomainThrottle(4, 0.0, latency_tolerance=2.0)
+    assert window(throttle, latency=0.5)[0] == "increase"
+    assert throttle.baseline_latency == 0.5
+    assert window(throttle, latency=1.5)[0] == "hold"
+    assert window(throttle, latency=0.9)[0] == "increase"
+
+
+def test_first_window_with_errors_and_latency_has_no_baseline():
+    throttle = DomainThrottle(4, 0.0)
+    assert window(throttle, requests=20, errors=1, latency=2.0)[0] == "hold"
+    assert throttle.baseline_latency is None
+
+
+def test_windows_are_independent():
+    throttle = DomainThrottle(4, 0.0)
+    window(throttle, errors=20)
+    assert window(throttle)[0] == "increase"
@@ -0,0 +1,128 @@
+import os
+import gzip
+
+import pytest
+
+from errors.url_source import BloomFilter, UrlSource, iter_urls
+
+
+def write_urls(path, urls):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(url + "\n" for url in urls))
+
+
+def urls(n, start=0):
+    return [f"https://shop.test/p/{i}" for i in range(start, start + n)]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    items = urls(10_000)
+    assert all(bloom.add(item) for item in items[:100])
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert not bloom.add(items[0])
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for item in urls(10_000):
+        bloom.add(item)
+    false_positives = sum(item in bloom for item in urls(10_000, start=10_000))
+    assert false_positives < 250
+
+
+def test_bloom_filter_round_trip(tmp_path):
+    path = str(tmp_path / "urls.bloom")
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for item in urls(100):
+        bloom.add(item)
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert loaded.count == 100
+    assert all(item in loaded for item in urls(100))
+
+
+def test_bloom_filter_rejects_truncated_file(tmp_path):
+    path = str(tmp_path / "urls.bloom")
+    BloomFilter(capacity=1000).save(path)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+    with pytest.raises(ValueError):
+        BloomFilter.load(path)
+
+
+def test_iter_urls_reads_text_jsonl_and_gzip(tmp_path):
+    path = str(tmp_path / "urls.txt.gz")
+    with gzip.open(path, "wt") as f:
+        f.write('# comment\n\nhttps://a.test/\n{"url": "https://b.test/"}\n{"name": "no url"}\n')
+    assert list(iter_urls(path)) == ["https://a.test/", "https://b.test/"]
+
+
+def make_source(path, checkpoint_file, **kwargs):
+    return UrlSource(path, dedup=BloomFilter(capacity=1000), checkpoint_file=checkpoint_file, **kwargs)
+
+
+def test_source_drops_duplicates(tmp_path):
+    path = str(tmp_path / "urls.txt")
+    write_urls(path, urls(3) + urls(2))
+    source = make_source(path, None)
+    assert list(source) == urls(3)
+    assert (source.read, source.duplicates) == (5, 2)
+
+
+def test_source_resumes_after_interruption(tmp_path):
+    path, checkpoint = str(tmp_path / "urls.txt"), str(tmp_path / "source.json")
+    write_urls(path, urls(10) + urls(3))
+    source = make_source(path, checkpoint)
+    iterator = iter(source)
+    first = [next(iterator) for _ in range(4)]
+    source.close()
+
+    resumed = make_source(path, checkpoint)
+    assert first + list(resumed) == urls(10)
+    # Duplicates of URLs read before the interruption are still dropped.
+    assert resumed.duplicates == 3
+
+
+def test_finished_crawl_starts_source_over(tmp_path):
+    path, checkpoint = str(tmp_path / "urls.txt"), str(tmp_path / "source.json")
+    write_urls(path, urls(5))
+    source = make_source(path, checkpoint)
+    assert list(source) == urls(5)
+    source.close(finished=True)
+    assert not os.path.exists(checkpoint)
+    assert not os.path.exists(checkpoint + ".bloom")
+    assert list(make_source(path, checkpoint)) == urls(5)
+
+
+def test_source_read_completely_by_interrupted_crawl_is_not_read_again(tmp_path):
+    path, checkpoint = str(tmp_path / "urls.txt"), str(tmp_path / "source.json")
+    write_urls(path, urls(5))
+    source = make_source(path, checkpoint)
+    list(source)
+    source.close()
+    assert list(make_source(path, checkpoint)) == []
+
+
+def test_edited_source_starts_over(tmp_path):
+    path, checkpoint = str(tmp_path / "urls.txt"), str(tmp_path / "source.json")
+    write_urls(path, urls(5))
+    source = make_source(path, checkpoint)
+    list(source)
+    source.close()
+
+    write_urls(path, urls(5, start=100))
+    assert list(make_source(path, checkpoint)) == urls(5, start=100)
+
+
+def test_checkpoint_of_another_source_is_ignored(tmp_path):
+    first, second = str(tmp_path / "a.txt"), str(tmp_path / "b.txt")
+    checkpoint = str(tmp_path / "source.json")
+    write_urls(first, urls(3))
+    write_urls(second, urls(3, start=10))
+    source = make_source(first, checkpoint)
+    list(source)
+    source.close()
+    assert list(make_source(second, checkpoint)) == urls(3, start=10)